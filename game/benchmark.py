@@ -0,0 +1,296 @@
+"""
+Benchmark sin pantalla del juego: arranque, carga de fondos, cambios de estado, costo de draw por estado y
+golpes por segundo de las reglas (rules.py).
+
+Corre Game con SDL_VIDEODRIVER=dummy y SDL_AUDIODRIVER=dummy, imprime los resultados como JSON y los compara
+con una línea base guardada. Termina con código 1 si alguna métrica empeora más allá de los umbrales, para
+poder usarlo antes de subir un cambio a la máquina.
+
+Uso (desde la carpeta game/):
+    python benchmark.py                          # compara con benchmark_baseline.json si existe
+    python benchmark.py --save-baseline          # guarda los resultados como nueva línea base
+    python benchmark.py --threshold 0.10 --tolerance-ms 0.2
+    python benchmark.py --profile 540p --output resultados.json
+    python benchmark.py --backend renderer --renderer-driver software   # backend de texturas sin GPU
+
+Todas las métricas son "menor es mejor": tiempos en milisegundos (*_ms) y memoria en MB (*_mb). Con numpy
+instalado también se mide la cuantización a 8 bits de cada fondo (palette.*.quantize_ms, ver palette.py).
+"""
+import contextlib
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+BENCHMARK_VERSION = 1
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def peak_rss_mb():
+    # En Linux ru_maxrss viene en KB (en macOS en bytes)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def finish_match(game):
+    # Juega la partida hasta el final con el sensor de más puntaje, para que GameOver tenga ganadores
+    best_key = max(game.match.score_mapping, key=game.match.score_mapping.get)
+    while not game.match.finished:
+        game.match.hit(best_key)
+        game.match.next_turn()
+
+
+def bench_startup(metrics, start, profile=None, backend=None, renderer_driver=None):
+    import_start = time.perf_counter()
+    import pygame
+    import game as game_module
+    metrics['startup.import_ms'] = ms(time.perf_counter() - import_start)
+    # El benchmark no debe dejar una partida a medias para restaurar, ni ensuciar el historial o las sesiones grabadas
+    game_module.Config.MATCH_LOG = False
+    game_module.Config.MATCH_HISTORY = False
+    game_module.Config.SESSION_RECORD = False
+    if backend:
+        game_module.Config.RENDER_BACKEND = backend
+        game_module.Config.RENDERER_DRIVER = renderer_driver
+    if profile:
+        # Antes de crear Game, para que fuentes y fondos se carguen a esa resolución
+        game_module.Config.apply_render_profile(profile)
+
+    init_start = time.perf_counter()
+    game = game_module.Game()
+    metrics['startup.init_ms'] = ms(time.perf_counter() - init_start)
+
+    handler = game.current_state_handler
+    handler.update()
+    game.present(handler.draw(game.screen))
+    metrics['startup.first_frame_ms'] = ms(time.perf_counter() - start)
+    deferred_start = time.perf_counter()
+    game.finish_startup()
+    game.resources.wait_deferred()
+    metrics['startup.deferred_ms'] = ms(time.perf_counter() - deferred_start)
+    return pygame, game_module, game
+
+
+def bench_backgrounds(metrics, game, config, pygame_module=None, palette=None):
+    resources = game.resources
+    prefetcher, resources.prefetcher = resources.prefetcher, None
+    if prefetcher is not None:
+        prefetcher.wait()
+    for handler in game.states.values():
+        name = handler.background_name
+        resources.animated_backgrounds.clear()
+        start = time.perf_counter()
+        resources.load_animated_background(name, config.SCREEN_WIDTH, config.SCREEN_HEIGHT)
+        metrics[f'background.{name}.first_ms'] = ms(time.perf_counter() - start)
+        start = time.perf_counter()
+        frames = resources.load_animated_background(name, config.SCREEN_WIDTH, config.SCREEN_HEIGHT)
+        metrics[f'background.{name}.cached_ms'] = ms(time.perf_counter() - start)
+        if palette is not None and not config.PALETTE_BACKGROUNDS and isinstance(frames, list) and frames:
+            # Costo de cuantizar la secuencia a 8 bits (lo que paga Config.PALETTE_BACKGROUNDS sin paquete indexado)
+            start = time.perf_counter()
+            palette.quantize_sequence(pygame_module, frames)
+            metrics[f'palette.{name}.quantize_ms'] = ms(time.perf_counter() - start)
+    resources.animated_backgrounds.clear()
+    resources.prefetcher = prefetcher
+
+
+def bench_transitions(metrics, game, config, repeat):
+    # Entre repeticiones se deja terminar la precarga, como cuando el jugador tarda en presionar un botón
+    for source, targets in config.STATE_TRANSITIONS.items():
+        for target in targets:
+            samples = []
+            for _ in range(repeat):
+                game.set_state(source)
+                if game.match is None:
+                    game.reset_game()
+                if game.resources.prefetcher is not None:
+                    game.resources.prefetcher.wait()
+                start = time.perf_counter()
+                game.set_state(target)
+                samples.append(time.perf_counter() - start)
+            label = f"{type(game.states[source]).__name__}->{type(game.states[target]).__name__}"
+            metrics[f'transition.{label}.median_ms'] = ms(statistics.median(samples))
+            metrics[f'transition.{label}.max_ms'] = ms(max(samples))
+
+
+def bench_rules(metrics, rules, score_mapping, hits=300_000, repeat=5):
+    # Partidas simuladas sin pygame: tres golpes por turno con teclas de una semilla fija; se toma la mejor vuelta
+    rng = random.Random(0)
+    keys = list(score_mapping)
+    turns = [[rng.choice(keys) for _ in range(3)] for _ in range(hits // 3)]
+
+    def play(use_hit_many):
+        match = rules.Match(4, 3000, score_mapping)
+        start = time.perf_counter()
+        for turn in turns:
+            if use_hit_many:
+                match.hit_many(turn)
+            else:
+                for key in turn:
+                    match.hit(key)
+            match.next_turn()
+            if match.finished:
+                match = rules.Match(4, 3000, score_mapping)
+        return time.perf_counter() - start
+
+    for label, use_hit_many in (('hit', False), ('hit_many', True)):
+        best = min(play(use_hit_many) for _ in range(repeat))
+        metrics[f'rules.{label}_100k_ms'] = ms(best * 100_000 / (len(turns) * 3))
+
+
+def bench_draw(metrics, game, state, frames, label=None):
+    game.set_state(state)
+    if game.resources.prefetcher is not None:
+        game.resources.prefetcher.wait()
+    handler = game.current_state_handler
+    frame_count = len(handler.background_frames)
+    samples = []
+    for i in range(frames):
+        # Se recorre la animación completa en lugar de esperar al reloj, así cada cuadro cambia el fondo
+        if frame_count:
+            handler.current_frame_index = i % frame_count
+        start = time.perf_counter()
+        handler.draw(game.screen)
+        samples.append(time.perf_counter() - start)
+    # Peor caso: repintado completo en cada cuadro (primer cuadro del estado o DIRTY_RECT_RENDERING apagado)
+    full_samples = []
+    for i in range(frames):
+        handler.invalidate()
+        start = time.perf_counter()
+        handler.draw(game.screen)
+        full_samples.append(time.perf_counter() - start)
+    label = label or type(handler).__name__
+    metrics[f'draw.{label}.mean_ms'] = ms(statistics.fmean(samples))
+    metrics[f'draw.{label}.p95_ms'] = ms(percentile(samples, 0.95))
+    metrics[f'draw.{label}.p99_ms'] = ms(percentile(samples, 0.99))
+    metrics[f'draw.{label}.full_mean_ms'] = ms(statistics.fmean(full_samples))
+    metrics[f'draw.{label}.full_p99_ms'] = ms(percentile(full_samples, 0.99))
+
+
+def run_benchmarks(args):
+    start = time.perf_counter()
+    metrics = {}
+    pygame, game_module, game = bench_startup(metrics, start, args.profile, args.backend, args.renderer_driver)
+    config = game_module.Config
+
+    bench_backgrounds(metrics, game, config, pygame, game_module.palette)
+    bench_transitions(metrics, game, config, args.repeat)
+
+    for state in (config.STATE_MENU, config.STATE_SELECT_PLAYERS, config.STATE_SELECT_SCORE):
+        bench_draw(metrics, game, state, args.frames)
+    game.num_players_selected = config.NUM_JUGADORES_OPTIONS[-1]
+    game.reset_game()
+    bench_draw(metrics, game, config.STATE_GAMEPLAY, args.frames, f"GameplayState_{game.num_players_selected}j")
+    bench_draw(metrics, game, config.STATE_PAUSE, args.frames)
+    finish_match(game)
+    bench_draw(metrics, game, config.STATE_GAME_OVER, args.frames)
+    bench_rules(metrics, game_module.rules, config.SCORE_MAPPING)
+
+    metrics['memory.peak_rss_mb'] = round(peak_rss_mb(), 1)
+    info = {
+        'render_profile': config.RENDER_PROFILE,
+        'render_backend': 'renderer' if game.canvas is not None else 'surface',
+        'resolution': [config.SCREEN_WIDTH, config.SCREEN_HEIGHT],
+        'frames': args.frames,
+        'repeat': args.repeat,
+        'pygame': pygame.version.ver,
+        'python': sys.version.split()[0],
+    }
+    game.close()
+    return {'version': BENCHMARK_VERSION, 'info': info, 'metrics': metrics}
+
+
+def compare(results, baseline, threshold, tolerance_ms):
+    """
+    Devuelve (líneas del informe, cantidad de regresiones). Una métrica empeora si supera la línea base en más
+    de `threshold` (relativo) y, en las de tiempo, además en más de `tolerance_ms` (para ignorar ruido en
+    mediciones de décimas de milisegundo).
+    """
+    lines = []
+    regressions = 0
+    current = results['metrics']
+    for name in sorted(current):
+        value = current[name]
+        base = baseline['metrics'].get(name)
+        if base is None:
+            lines.append(f"  {name:<55} {value:>10.3f}  (nueva)")
+            continue
+        change = (value - base) / base if base else 0.0
+        worse = value > base * (1 + threshold) and (not name.endswith('_ms') or value - base > tolerance_ms)
+        regressions += worse
+        lines.append(f"{'!' if worse else ' '} {name:<55} {value:>10.3f}  base {base:>10.3f}  {change:+7.1%}")
+    return lines, regressions
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark sin pantalla del juego.")
+    parser.add_argument('--profile', help="Perfil de render a medir (por defecto el de Config)")
+    parser.add_argument('--backend', choices=('surface', 'renderer'), help="Backend de render (por defecto el de Config)")
+    parser.add_argument('--renderer-driver', help="Driver de SDL para el backend 'renderer' (p. ej. 'software')")
+    parser.add_argument('--frames', type=int, default=300, help="Cuadros a dibujar por estado")
+    parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por cambio de estado")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Archivo de línea base a comparar")
+    parser.add_argument('--save-baseline', action='store_true', help="Guarda los resultados como línea base")
+    parser.add_argument('--output', help="Escribe los resultados JSON en este archivo en lugar de la salida estándar")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Empeoramiento relativo permitido (0.25 = 25%%)")
+    parser.add_argument('--tolerance-ms', type=float, default=1.0, help="Empeoramiento absoluto ignorado en métricas de tiempo")
+    parser.add_argument('--verbose', action='store_true', help="Muestra los mensajes del juego")
+    args = parser.parse_args(argv)
+
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(open(os.devnull, 'w')))
+        results = run_benchmarks(args)
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            f.write(text + "\n")
+        print(f"Línea base guardada en {args.baseline}", file=sys.stderr)
+        return 0
+    if not os.path.isfile(args.baseline):
+        print(f"Sin línea base ({args.baseline}); usa --save-baseline para crearla.", file=sys.stderr)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('info', {}).get('resolution') != results['info']['resolution']:
+        print("Advertencia: La línea base se midió con otra resolución, la comparación no es confiable.", file=sys.stderr)
+    if baseline.get('info', {}).get('render_backend', 'surface') != results['info']['render_backend']:
+        print("Advertencia: La línea base se midió con otro backend de render, la comparación no es confiable.", file=sys.stderr)
+    lines, regressions = compare(results, baseline, args.threshold, args.tolerance_ms)
+    print("\n".join(lines), file=sys.stderr)
+    if regressions:
+        print(f"{regressions} métricas empeoraron más de {args.threshold:.0%}.", file=sys.stderr)
+        return 1
+    print("Sin regresiones.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,104 @@
+"""
+Animaciones de fondo codificadas por deltas (Config.DELTA_BACKGROUNDS).
+
+Se guarda el primer fotograma completo y, para cada uno de los siguientes, solo las teselas que cambian
+respecto al anterior (con una tolerancia por canal). Al reproducir, los parches se aplican sobre un back
+buffer persistente y seek devuelve los rectángulos que cambiaron, que el renderizado por rectángulos
+sucios aprovecha:
+
+    animation = DeltaAnimation.encode(fotogramas, tolerance=6, tile_size=32)
+    surface = animation[i]
+    changed = animation.seek(i + 1)  # None si hubo que volver al fotograma clave
+"""
+import pygame
+
+from frame_pack import surface_nbytes
+
+
+class DeltaAnimation:
+    """
+    Secuencia guardada como un fotograma clave más, por cada fotograma, los rectángulos que cambian respecto
+    al anterior. La reproducción aplica esos parches sobre un back buffer persistente, así la memoria y el
+    trabajo por cuadro dependen de cuánto se mueve la imagen y no del tamaño de la pantalla.
+    """
+
+    def __init__(self, keyframe, patches):
+        self.keyframe = keyframe
+        self.patches = patches  # patches[i] = [(Rect, Surface), ...] para pasar del fotograma i-1 al i
+        self.surface = keyframe.copy()
+        self._index = 0
+
+    @classmethod
+    def encode(cls, frames, tolerance, tile_size):
+        keyframe = frames[0].copy()
+        # Las diferencias se calculan contra lo reconstruido y no contra el fotograma anterior,
+        # así el error nunca se acumula más allá de la tolerancia
+        reconstructed = keyframe.copy()
+        patches = [[]]
+        threshold = (tolerance, tolerance, tolerance, 255)
+        for frame in frames[1:]:
+            diff = frame.copy()
+            diff.blit(reconstructed, (0, 0), special_flags=pygame.BLEND_SUB)
+            reverse = reconstructed.copy()
+            reverse.blit(frame, (0, 0), special_flags=pygame.BLEND_SUB)
+            diff.blit(reverse, (0, 0), special_flags=pygame.BLEND_ADD)
+            changed = pygame.mask.from_threshold(diff, (0, 0, 0, 255), threshold)
+            changed.invert()
+            frame_patches = []
+            for rect in cls._tile_rects(changed.get_bounding_rects(), tile_size, frame.get_rect()):
+                patch = frame.subsurface(rect).copy()
+                reconstructed.blit(patch, rect)
+                frame_patches.append((rect, patch))
+            patches.append(frame_patches)
+        return cls(keyframe, patches)
+
+    @staticmethod
+    def _tile_rects(rects, tile_size, bounds):
+        # Ajusta las regiones cambiadas a una grilla de teselas y une las teselas contiguas de cada fila
+        tiles = set()
+        for rect in rects:
+            for ty in range(rect.top // tile_size, (rect.bottom - 1) // tile_size + 1):
+                for tx in range(rect.left // tile_size, (rect.right - 1) // tile_size + 1):
+                    tiles.add((ty, tx))
+        merged = []
+        run_start = None
+        for ty, tx in sorted(tiles) + [(None, None)]:
+            if run_start is not None and (ty != run_start[0] or tx != previous + 1):
+                row, first = run_start
+                merged.append(pygame.Rect(first * tile_size, row * tile_size, (previous - first + 1) * tile_size, tile_size).clip(bounds))
+                run_start = None
+            if ty is not None and run_start is None:
+                run_start = (ty, tx)
+            previous = tx
+        return merged
+
+    def __len__(self):
+        return len(self.patches)
+
+    def __getitem__(self, index):
+        self.seek(index)
+        return self.surface
+
+    def seek(self, index):
+        """
+        Lleva el back buffer al fotograma `index` y devuelve los rectángulos modificados,
+        o None si hubo que volver al fotograma clave.
+        """
+        if index == self._index:
+            return []
+        changed = []
+        if index < self._index:
+            self.surface.blit(self.keyframe, (0, 0))
+            self._index = 0
+            changed = None
+        while self._index < index:
+            self._index += 1
+            for rect, patch in self.patches[self._index]:
+                self.surface.blit(patch, rect)
+                if changed is not None:
+                    changed.append(rect)
+        return changed
+
+    def nbytes(self):
+        patch_bytes = sum(surface_nbytes(patch) for frame_patches in self.patches for _, patch in frame_patches)
+        return surface_nbytes(self.keyframe) + surface_nbytes(self.surface) + patch_bytes
@@ -0,0 +1,79 @@
+"""
+Entrada por evdev para los sensores de la Bolirana (Config.INPUT_BACKEND 'evdev' o 'both').
+
+Lee el dispositivo de entrada del driver GPIO en un hilo propio, sin pasar por el servidor X, y publica
+cada presión y liberación en la cola de pygame con la marca de tiempo del kernel, que SensorHitBatch usa
+para descartar rebotes. Requiere el paquete evdev y permiso de lectura sobre /dev/input/event*.
+
+    evdev_input = EvdevInput("custom_gpio_keyboard", {"KEY_1": "1", ...}, Config.EVENT_ARCADE_INPUT)
+    if evdev_input.device is not None:
+        evdev_input.start()
+"""
+import threading
+import time
+
+import pygame
+
+try:
+    import evdev
+except ImportError:
+    evdev = None  # Solo se necesita para Config.INPUT_BACKEND 'evdev' o 'both'
+
+
+class EvdevInput:
+    """
+    Lee el dispositivo del driver GPIO directamente en un hilo y publica `event_type` en la cola de pygame,
+    sin pasar por el servidor X. Cada evento lleva `key`, `pressed`, `kernel_timestamp` (reloj del kernel) y
+    `timestamp` (el mismo instante en el reloj de time.monotonic). `key_mapping` va de código evdev
+    ('KEY_1') a nombre de tecla del juego.
+    """
+
+    def __init__(self, device_name, key_mapping, event_type):
+        self.key_mapping = {evdev.ecodes.ecodes[code]: key_name for code, key_name in key_mapping.items()}
+        self.event_type = event_type
+        self.device = self._find_device(device_name)
+        self._thread = None
+
+    @staticmethod
+    def _find_device(name):
+        for path in evdev.list_devices():
+            try:
+                device = evdev.InputDevice(path)
+            except OSError as e:
+                print(f"Advertencia: No se pudo abrir '{path}'. Error: {e}")
+                continue
+            if device.name == name:
+                return device
+            device.close()
+        return None
+
+    def start(self):
+        # grab: X deja de recibir estas teclas, así no llegan duplicadas como KEYDOWN
+        self.device.grab()
+        self._thread = threading.Thread(target=self._read_events, name="evdev-input", daemon=True)
+        self._thread.start()
+        print(f"Entradas: leyendo {self.device.path} ({self.device.name}) por evdev.")
+
+    def stop(self):
+        try:
+            self.device.ungrab()
+        except OSError:
+            pass
+        self.device.close()  # Hace que read_loop termine con OSError
+
+    def _read_events(self):
+        try:
+            for event in self.device.read_loop():
+                # value: 1 = presionada, 0 = liberada, 2 = autorepetición (ignorada)
+                if event.type != evdev.ecodes.EV_KEY or event.value == 2:
+                    continue
+                key_name = self.key_mapping.get(event.code)
+                if key_name is None:
+                    continue
+                kernel_timestamp = event.timestamp()
+                received = time.monotonic()
+                age = max(0.0, time.time() - kernel_timestamp)
+                pygame.event.post(pygame.event.Event(self.event_type, key=key_name, pressed=event.value == 1,
+                                                     timestamp=received - age, kernel_timestamp=kernel_timestamp))
+        except OSError:
+            pass  # Dispositivo cerrado o desconectado
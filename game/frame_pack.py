@@ -0,0 +1,212 @@
+"""
+Paquetes de fotogramas precompilados para las animaciones de fondo (assets/state_*).
+
+Un paquete contiene todos los fotogramas de un estado ya escalados a la resolución
+de destino y en el formato de píxeles de la pantalla (BGRA de 32 bits), uno detrás
+de otro. En tiempo de ejecución el archivo se mapea en memoria y cada fotograma se
+envuelve como Surface con pygame.image.frombuffer, sin decodificar ni reescalar.
+
+Los paquetes indexados (sufijo _p8, formato "P") guardan un byte por píxel y una paleta
+de 256 colores compartida por todo el estado, justo después de la cabecera; los genera
+palette.py (requiere numpy), pero abrirlos no lo necesita.
+
+Uso (desde la carpeta game/):
+    python frame_pack.py                      # todos los estados, resolución de Config
+    python frame_pack.py state_inicio state_win
+    python frame_pack.py --profile 540p
+    python frame_pack.py --width 960 --height 540
+    python frame_pack.py --palette            # paquetes indexados de 8 bits
+"""
+import mmap
+import os
+import struct
+import sys
+import weakref
+
+PACK_MAGIC = b"BLRPACK\x00"
+PACK_VERSION = 1
+PACK_PIXEL_FORMAT = b"BGRA"  # Mismo orden de bytes que convert_alpha() en pantallas ARGB8888
+PACK_INDEXED_FORMAT = b"P\x00\x00\x00"  # Un byte por píxel; la paleta RGB va después de la cabecera
+PACK_PALETTE_SIZE = 256
+PACK_HEADER = struct.Struct("<8sH4sIIIQQd")
+PACK_ALIGNMENT = 4096  # Los fotogramas arrancan alineados a página para que el mmap sea directo
+PACK_EXTENSION = ".pack"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+# Surfaces que apuntan a un mmap: sus píxeles son páginas del archivo, no memoria propia del proceso
+_mapped_surfaces = weakref.WeakSet()
+
+
+def list_frame_files(folder):
+    return sorted([f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS)])
+
+
+def source_mtime(folder):
+    """
+    Fecha de modificación más reciente de las imágenes de un estado, para detectar paquetes desactualizados.
+    """
+    files = list_frame_files(folder)
+    if not files:
+        return 0.0
+    return max(os.path.getmtime(os.path.join(folder, f)) for f in files)
+
+
+def pack_filename(state_name, width, height, indexed=False):
+    suffix = "_p8" if indexed else ""
+    return f"{state_name}_{width}x{height}{suffix}{PACK_EXTENSION}"
+
+
+class FramePack:
+    """
+    Paquete abierto y mapeado en memoria. Mantiene vivo el mmap mientras existan Surfaces que lo referencien.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(PACK_HEADER.size)
+            if len(header) != PACK_HEADER.size:
+                raise ValueError(f"Paquete truncado: {path}")
+            (magic, version, pixel_format, self.width, self.height, self.frame_count,
+             self.frame_stride, self.data_offset, self.source_mtime) = PACK_HEADER.unpack(header)
+            if magic != PACK_MAGIC or version != PACK_VERSION:
+                raise ValueError(f"Formato de paquete no soportado: {path}")
+            self.pixel_format = pixel_format.rstrip(b"\x00").decode('ascii')
+            self.bytes_per_pixel = 1 if self.pixel_format == 'P' else 4
+            self.palette = None
+            if self.pixel_format == 'P':
+                data = f.read(PACK_PALETTE_SIZE * 3)
+                self.palette = [tuple(data[i:i + 3]) for i in range(0, len(data), 3)]
+            expected_size = self.data_offset + self.frame_stride * self.frame_count
+            if os.fstat(f.fileno()).st_size < expected_size:
+                raise ValueError(f"Paquete truncado: {path}")
+            # ACCESS_READ: las páginas se comparten con la caché del sistema y se cargan bajo demanda
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.frame_count else None
+
+    def frame_buffer(self, index):
+        start = self.data_offset + index * self.frame_stride
+        return memoryview(self._mmap)[start:start + self.width * self.height * self.bytes_per_pixel]
+
+    def surfaces(self, pygame_module):
+        surfaces = [pygame_module.image.frombuffer(self.frame_buffer(i), (self.width, self.height), self.pixel_format)
+                    for i in range(self.frame_count)]
+        if self.palette is not None:
+            for surface in surfaces:
+                surface.set_palette(self.palette)
+        _mapped_surfaces.update(surfaces)
+        return surfaces
+
+
+def surface_nbytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+def is_mapped(surface):
+    """
+    Indica si la Surface sale de un paquete mapeado (sus bytes los respalda el archivo y el kernel puede soltarlos).
+    """
+    return surface in _mapped_surfaces
+
+
+def open_pack(pack_path, width, height, source_folder=None):
+    """
+    Abre un paquete si existe, coincide con la resolución pedida y no es más antiguo que sus imágenes.
+    Devuelve None en cualquier otro caso para que el llamador use la carga tradicional.
+    """
+    if not os.path.isfile(pack_path):
+        return None
+    pack = FramePack(pack_path)
+    if (pack.width, pack.height) != (width, height):
+        return None
+    if source_folder and os.path.isdir(source_folder) and source_mtime(source_folder) > pack.source_mtime:
+        print(f"Advertencia: El paquete '{pack_path}' está desactualizado, se ignorará.")
+        return None
+    return pack
+
+
+def load_scaled_frames(pygame_module, source_folder, width, height):
+    for filename in list_frame_files(source_folder):
+        image = pygame_module.image.load(os.path.join(source_folder, filename))
+        # Offline podemos permitirnos un escalado suavizado en lugar del escalado rápido en tiempo de ejecución
+        yield pygame_module.transform.smoothscale(image, (width, height))
+
+
+def write_pack(pack_path, width, height, frames, mtime, palette=None):
+    """
+    Escribe `frames` (objetos con interfaz de buffer: bytes, arreglos de numpy...) como paquete. Con `palette`
+    (lista de colores RGB) el paquete es indexado y cada fotograma debe tener un byte por píxel.
+    """
+    pixel_format = PACK_PIXEL_FORMAT if palette is None else PACK_INDEXED_FORMAT
+    frame_size = width * height * (4 if palette is None else 1)
+    frame_stride = -(-frame_size // PACK_ALIGNMENT) * PACK_ALIGNMENT
+    frame_count = 0
+    tmp_path = pack_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(b"\x00" * PACK_ALIGNMENT)  # La cabecera se escribe al final, cuando se sabe cuántos fotogramas hay
+        padding = b"\x00" * (frame_stride - frame_size)
+        for frame in frames:
+            f.write(frame)
+            f.write(padding)
+            frame_count += 1
+        header = PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, pixel_format, width, height, frame_count,
+                                  frame_stride, PACK_ALIGNMENT, mtime)
+        if palette is not None:
+            colors = list(palette)[:PACK_PALETTE_SIZE]
+            colors += [(0, 0, 0)] * (PACK_PALETTE_SIZE - len(colors))
+            header += bytes(channel for color in colors for channel in color)
+        f.seek(0)
+        f.write(header)
+    os.replace(tmp_path, pack_path)
+    return frame_count
+
+
+def build_pack(pygame_module, source_folder, pack_path, width, height):
+    frames = (pygame_module.image.tobytes(image, PACK_PIXEL_FORMAT.decode('ascii'))
+              for image in load_scaled_frames(pygame_module, source_folder, width, height))
+    return write_pack(pack_path, width, height, frames, source_mtime(source_folder))
+
+
+def build_indexed_pack(pygame_module, source_folder, pack_path, width, height):
+    import palette as palette_module  # Requiere numpy; solo se usa al generar paquetes indexados
+
+    surfaces = list(load_scaled_frames(pygame_module, source_folder, width, height))
+    palette, indices = palette_module.quantize_sequence(pygame_module, surfaces)
+    return write_pack(pack_path, width, height, indices, source_mtime(source_folder), palette.tolist())
+
+
+def main(argv):
+    import argparse
+    import time
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from game import Config, resource_path
+
+    parser = argparse.ArgumentParser(description="Genera paquetes de fotogramas para las animaciones de fondo.")
+    parser.add_argument('states', nargs='*', help="Carpetas state_* a empaquetar (por defecto todas)")
+    parser.add_argument('--profile', choices=sorted(Config.RENDER_PROFILES), help="Perfil de render (fija ancho y alto)")
+    parser.add_argument('--width', type=int, default=Config.SCREEN_WIDTH)
+    parser.add_argument('--height', type=int, default=Config.SCREEN_HEIGHT)
+    parser.add_argument('--palette', action='store_true', help="Genera paquetes indexados de 8 bits (requiere numpy)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        args.width, args.height = Config.RENDER_PROFILES[args.profile]
+
+    assets_dir = resource_path('assets')
+    pack_dir = resource_path(os.path.join('assets', Config.FRAME_PACK_DIR))
+    os.makedirs(pack_dir, exist_ok=True)
+    states = args.states or sorted(d for d in os.listdir(assets_dir)
+                                   if d.startswith('state_') and os.path.isdir(os.path.join(assets_dir, d)))
+
+    pygame.init()
+    for state_name in states:
+        start = time.perf_counter()
+        pack_path = os.path.join(pack_dir, pack_filename(state_name, args.width, args.height, args.palette))
+        build = build_indexed_pack if args.palette else build_pack
+        count = build(pygame, os.path.join(assets_dir, state_name), pack_path, args.width, args.height)
+        print(f"{state_name}: {count} fotogramas -> {pack_path} ({time.perf_counter() - start:.2f} s)")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,6 +1,30 @@
 import pygame
 import sys
 import os
+import math
+import signal
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+from frame_pack import is_mapped, list_frame_files, open_pack, pack_filename, source_mtime, surface_nbytes, write_pack
+import rules
+from rules import Match
+from match_log import MatchLog
+from scoreboard import ScoreboardPublisher
+from match_history import MatchHistory
+from session_record import SessionRecorder
+from streaming import StreamingBackground
+from delta import DeltaAnimation
+from evdev_input import EvdevInput, evdev
+from renderer_canvas import Renderer, RendererCanvas, Window, get_render_drivers, to_display_format
+
+try:
+    import palette
+except ImportError:
+    palette = None  # Requiere numpy; solo se necesita para generar los fondos de Config.PALETTE_BACKGROUNDS
 
 # --- Función para manejar rutas de recursos en PyInstaller ---
 
@@ -15,12 +39,44 @@ def resource_path(relative_path):
         base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, relative_path)
 
+def data_path(relative_path):
+    """
+    Obtiene la ruta absoluta a un archivo que escribe el juego (registro, historial, sesiones, cachés).
+    Con PyInstaller --onefile sys._MEIPASS se borra al salir, así que se usa la carpeta del ejecutable.
+    """
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(os.path.abspath(sys.executable))
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, relative_path)
+
 # --- Módulo de Constantes y Configuraciones ---
 class Config:
+    # Resolución de la ventana. SCREEN_WIDTH/SCREEN_HEIGHT es la resolución interna de renderizado,
+    # que la fija el perfil de calidad (ver apply_render_profile)
+    DISPLAY_WIDTH = 1280
+    DISPLAY_HEIGHT = 720
     SCREEN_WIDTH = 1280
     SCREEN_HEIGHT = 720
     FPS = 60
 
+    # Perfiles de calidad: resolución interna a la que se cargan los fondos y se compone el cuadro
+    RENDER_PROFILES = {
+        '720p': (1280, 720),
+        '540p': (960, 540),
+        '360p': (640, 360),
+    }
+    RENDER_PROFILE = '720p'
+    RENDER_SCALE = 1.0
+
+    # Backend de render: 'surface' (blits en CPU y display.flip) o 'renderer' (texturas de SDL2 compuestas por la GPU).
+    # RENDERER_DRIVER elige el driver de SDL ('opengles2', 'opengl', ...); None usa el acelerado por defecto y
+    # 'software' sirve para probar el backend en una máquina sin GPU. Si no se puede crear, se usa 'surface'
+    RENDER_BACKEND = 'surface'
+    RENDERER_DRIVER = None
+    RENDERER_VSYNC = False
+    TEXTURE_CACHE_MB = 192  # Texturas de fondos y textos en memoria de video; las menos usadas se liberan
+
     # Colores
     WHITE = (255, 255, 255)
     BLACK = (0, 0, 0)
@@ -46,6 +102,20 @@ class Config:
     STATE_GAMEPLAY = 3
     STATE_PAUSE = 4
     STATE_GAME_OVER = 5
+    STATE_RESTORE = 6  # Al arrancar, si el registro tiene una partida sin terminar
+    STATE_HIGH_SCORES = 7
+
+    # Transiciones posibles desde cada estado (Game.set_state / handle_input), en orden de probabilidad
+    STATE_TRANSITIONS = {
+        STATE_MENU: (STATE_SELECT_PLAYERS, STATE_SELECT_SCORE, STATE_GAMEPLAY, STATE_HIGH_SCORES),
+        STATE_SELECT_PLAYERS: (STATE_MENU,),
+        STATE_SELECT_SCORE: (STATE_MENU,),
+        STATE_GAMEPLAY: (STATE_PAUSE, STATE_GAME_OVER),
+        STATE_PAUSE: (STATE_GAMEPLAY, STATE_MENU),
+        STATE_GAME_OVER: (STATE_MENU,),
+        STATE_RESTORE: (STATE_GAMEPLAY, STATE_MENU),
+        STATE_HIGH_SCORES: (STATE_MENU,),
+    }
 
     # Mapeo de Teclas Estándar para simular inputs de Arcade
     KEY_MAPPING = {
@@ -59,25 +129,419 @@ class Config:
         pygame.K_w: "W_KEY"
     }
 
+    # Backend de entradas: 'keyboard' (KEYDOWN de X11), 'evdev' (lectura directa del driver GPIO) o 'both'
+    INPUT_BACKEND = 'keyboard'
+    EVDEV_DEVICE_NAME = "custom_gpio_keyboard"  # Nombre del input_dev creado por Driver/gpio_keypad.c
+    EVDEV_KEY_MAPPING = {
+        "KEY_UP": "UP",
+        "KEY_DOWN": "DOWN",
+        "KEY_ENTER": "ENTER",
+        "KEY_TAB": "TAB",
+        "KEY_1": "1", "KEY_2": "2", "KEY_3": "3", "KEY_4": "4",
+        "KEY_5": "5", "KEY_6": "6", "KEY_7": "7", "KEY_8": "8",
+        "KEY_S": "S_KEY",
+        "KEY_W": "W_KEY"
+    }
+    # Golpes del mismo sensor más cercanos que esto (según la marca del kernel) se cuentan una vez. Menor que
+    # los 50 ms de antirrebote del driver, así solo filtra duplicados y nunca un golpe real; 0 lo desactiva
+    SENSOR_DEBOUNCE_MS = 30
+
+    # Trazas de latencia entrada -> pantalla (se imprimen al salir o con `kill -USR1 <pid>`)
+    LATENCY_TRACING = True
+
+    # Perfilador por fases del bucle principal. Volcado con SIGUSR1 o manteniendo S y presionando W
+    FRAME_PROFILER = True
+    PROFILER_RING_FRAMES = 600  # Cuadros guardados por estado
+    PROFILER_SPIKE_MS = 2000 / FPS  # Un cuadro que ocupa más de dos periodos cuenta como pico
+    PROFILER_MAX_SPIKES = 32
+
+    # Contabilidad de memoria: instantánea en cada cambio de estado y reporte al salir. W muestra los números en vivo
+    MEMORY_ACCOUNTING = True
+    MEMORY_SNAPSHOTS = 512  # Se guardan las más recientes; el resumen por estado cubre toda la ejecución
+    MEMORY_OVERLAY_REFRESH_MS = 1000
+
     # Eventos Personalizados
     EVENT_ARCADE_INPUT = pygame.USEREVENT + 1
     EVENT_SCORE = pygame.USEREVENT + 2
     EVENT_SYSTEM_CONTROL = pygame.USEREVENT + 3
 
+    @classmethod
+    def apply_render_profile(cls, profile_name):
+        cls.RENDER_PROFILE = profile_name
+        cls.SCREEN_WIDTH, cls.SCREEN_HEIGHT = cls.RENDER_PROFILES[profile_name]
+        cls.RENDER_SCALE = cls.SCREEN_WIDTH / cls.DISPLAY_WIDTH
+
+    @classmethod
+    def scaled(cls, value):
+        # Tamaños de fuente y desplazamientos del layout, definidos para 1280x720
+        return int(round(value * cls.RENDER_SCALE))
+
+    # Paquetes de fotogramas precompilados (ver frame_pack.py). Si no existe el paquete se decodifican las imágenes.
+    USE_FRAME_PACKS = True
+    FRAME_PACK_DIR = 'packs'
+
+    # Reproducción en streaming: decodifica pocos fotogramas por delante en un hilo en lugar de cachear la secuencia completa
+    STREAM_BACKGROUNDS = False
+    STREAM_BUFFER_FRAMES = 6
+
+    # Caché LRU de fondos decodificados. None = presupuesto automático según la RAM de la placa
+    BACKGROUND_CACHE_BUDGET_MB = None
+    BACKGROUND_CACHE_RAM_FRACTION = 0.35
+    BACKGROUND_CACHE_PINNED = ('state_play', 'state_pause')
+
+    # Precarga de fondos según el grafo de transiciones (ver STATE_TRANSITIONS)
+    PREFETCH_BACKGROUNDS = True
+    PREFETCH_WORKERS = 1
+
+    # Animaciones codificadas por deltas: fotograma clave + regiones cambiadas (tolerancia por canal, tamaño de tesela)
+    DELTA_BACKGROUNDS = False
+    DELTA_TOLERANCE = 6
+    DELTA_TILE_SIZE = 32
+
+    # Fondos de 8 bits con una paleta de 256 colores por estado (ver palette.py): 1/4 de la memoria, se convierten a
+    # 32 bits al hacer blit. Se guardan como paquetes indexados; generarlos la primera vez requiere numpy
+    PALETTE_BACKGROUNDS = False
+
+    # Renderizado por rectángulos sucios: solo se presentan las regiones que cambiaron. Modo alternativo al
+    # repintado completo de cada cuadro; apagado por defecto
+    DIRTY_RECT_RENDERING = False
+
+    # Caché de textos renderizados (entradas) y composición de números desde un atlas de dígitos
+    TEXT_CACHE_SIZE = 256
+    TEXT_DIGIT_ATLAS = True
+
+    # Bucle por eventos: si nada se anima, se bloquea en pygame.event.wait en lugar de girar a FPS. Modo
+    # alternativo al bucle a FPS fijos; apagado por defecto
+    IDLE_EVENT_WAIT = False
+    IDLE_WAIT_TIMEOUT_MS = 500
+
+    # Paso fijo: los updates siguen al reloj de pared aunque draw se atrase; los cuadros atrasados se descartan.
+    # Modo alternativo al bucle de clock.tick; apagado por defecto (replay.py lo activa para su reloj virtual)
+    FIXED_TIMESTEP = False
+    UPDATE_HZ = 60
+    MAX_UPDATES_PER_FRAME = 5
+
+    # Audio: bloque corto del mixer para baja latencia (256 muestras a 44.1 kHz son ~6 ms; pygame usa 512 por defecto)
+    AUDIO_FREQUENCY = 44100
+    AUDIO_SIZE = -16
+    AUDIO_CHANNELS = 2
+    AUDIO_BUFFER = 256
+    AUDIO_NUM_CHANNELS = 8
+    AUDIO_CACHE_DIR = 'pcm'  # Efectos ya convertidos al formato del mixer (assets/pcm/), se regeneran solos
+    # Canales reservados por clase de efecto: (efectos, cantidad de canales). Un efecto solo suena en los canales
+    # de su clase, así los puntos nunca esperan ni se pierden por la fanfarria o los clics de botón
+    AUDIO_CHANNEL_GROUPS = {
+        'points': (('points',), 2),
+        'ui': (('button',), 1),
+        'event': (('game_over', 'fanfare'), 1),
+    }
+
+    # Registro de la partida en curso (match_log.py) para retomarla tras una caída o un reinicio del servicio
+    MATCH_LOG = True
+    MATCH_LOG_DIR = os.path.join('data', 'matchlog')
+    MATCH_LOG_FSYNC_MS = 250  # Sincronización periódica; inicio, ganador, pausa y fin se sincronizan enseguida
+    MATCH_LOG_SNAPSHOT_EVERY = 64  # Registros por segmento antes de compactarlo en una instantánea
+
+    # Historial de partidas en SQLite (match_history.py), escrito en lotes desde un hilo. Opcional: escribe en
+    # disco en cada partida; se activa aquí o con `python game.py --history`
+    MATCH_HISTORY = False
+    MATCH_HISTORY_DB = os.path.join('data', 'history.db')
+    MATCH_HISTORY_BATCH_MS = 1000
+    HIGH_SCORES_SHOWN = 5
+
+    # Grabación de las teclas de cada ejecución (session_record.py) para reproducirlas con replay.py. Herramienta
+    # de diagnóstico: se activa aquí o con `python game.py --record-sessions`
+    SESSION_RECORD = False
+    SESSION_RECORD_DIR = os.path.join('data', 'sessions')
+    SESSION_RECORD_KEEP = 500  # Sesiones guardadas; al arrancar se borran las más antiguas
+    SESSION_RECORD_FLUSH_MS = 1000
+
+    # Marcador para pantallas externas (scoreboard.py): 'unix:/ruta.sock' o 'tcp:host:puerto'
+    SCOREBOARD = False
+    SCOREBOARD_ADDRESS = 'unix:/tmp/bolirana-scoreboard.sock'
+    SCOREBOARD_CLIENT_BUFFER_KB = 256  # Datos pendientes por cliente antes de desconectarlo
+
+    # Arranque rápido: antes del primer cuadro solo se carga lo que necesita el menú; sonidos, icono, el resto
+    # de las fuentes y la caché de textos se cargan después (los sonidos en un hilo)
+    FAST_STARTUP = True
+    STARTUP_FONTS = ('medium',)
+    STARTUP_TARGET_MS = 1500  # Objetivo de tiempo hasta el primer cuadro, medido desde el inicio del proceso
+
+
+Config.apply_render_profile(Config.RENDER_PROFILE)
+
 
 # --- Módulo de Recursos ---
+def frames_nbytes(frames):
+    """
+    Devuelve (bytes decodificados, bytes mapeados) de una secuencia de fondo. Los fotogramas de un paquete
+    mapeado no ocupan memoria propia: las páginas son del archivo y el kernel las suelta bajo presión.
+    """
+    if isinstance(frames, DeltaAnimation):
+        return frames.nbytes(), 0
+    decoded = mapped = 0
+    for frame in frames:
+        if is_mapped(frame):
+            mapped += surface_nbytes(frame)
+        else:
+            decoded += surface_nbytes(frame)
+    return decoded, mapped
+
+
+def system_memory_bytes():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class BackgroundCache:
+    """
+    Caché LRU de secuencias de fondo con presupuesto en bytes. Las secuencias fijadas (estado actual y
+    las de Config.BACKGROUND_CACHE_PINNED) nunca se desalojan. Los fotogramas de paquetes mapeados no cuentan
+    para el presupuesto (se llevan aparte en mapped_bytes): desalojarlos no libera memoria del proceso.
+    """
+
+    def __init__(self, budget_bytes, pinned=()):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()  # state_name -> (frames, nbytes, mapped_nbytes)
+        self._pinned = set(pinned)
+        self.bytes_used = 0
+        self.mapped_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def __contains__(self, state_name):
+        return state_name in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, state_name):
+        return self._entries[state_name][0]
+
+    def __setitem__(self, state_name, frames):
+        self.put(state_name, frames)
+
+    def items(self):
+        return [(name, entry[0]) for name, entry in self._entries.items()]
+
+    def sizes(self):
+        return {name: entry[1] for name, entry in self._entries.items()}
+
+    def mapped_sizes(self):
+        return {name: entry[2] for name, entry in self._entries.items() if entry[2]}
+
+    def get(self, state_name):
+        entry = self._entries.get(state_name)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(state_name)
+        return entry[0]
+
+    def put(self, state_name, frames):
+        if state_name in self._entries:
+            _, old_nbytes, old_mapped = self._entries.pop(state_name)
+            self.bytes_used -= old_nbytes
+            self.mapped_bytes -= old_mapped
+        nbytes, mapped_nbytes = frames_nbytes(frames)
+        self._evict_for(nbytes)
+        self._entries[state_name] = (frames, nbytes, mapped_nbytes)
+        self.bytes_used += nbytes
+        self.mapped_bytes += mapped_nbytes
+        if self.bytes_used > self.budget_bytes:
+            print(f"Advertencia: Caché de fondos sobre el presupuesto ({self.bytes_used // 2**20} MB / {self.budget_bytes // 2**20} MB), todo lo demás está fijado.")
+
+    def pin(self, state_name):
+        self._pinned.add(state_name)
+
+    def unpin(self, state_name):
+        if state_name not in Config.BACKGROUND_CACHE_PINNED:
+            self._pinned.discard(state_name)
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes_used = 0
+        self.mapped_bytes = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes_used': self.bytes_used,
+            'mapped_bytes': self.mapped_bytes,
+            'budget_bytes': self.budget_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'evicted_bytes': self.evicted_bytes,
+        }
+
+    def _evict_for(self, nbytes):
+        for state_name in list(self._entries):
+            if self.bytes_used + nbytes <= self.budget_bytes:
+                return
+            # Una secuencia mapeada no suma al presupuesto: sacarla no haría lugar
+            if state_name in self._pinned or not self._entries[state_name][1]:
+                continue
+            evicted = self._entries.pop(state_name)[1]
+            self.bytes_used -= evicted
+            self.evictions += 1
+            self.evicted_bytes += evicted
+            print(f"Caché de fondos: desalojado '{state_name}' ({evicted // 2**20} MB)")
+
+
+class LoadingFrames(list):
+    """
+    Lista de fotogramas que un hilo del prefetcher todavía está llenando.
+    """
+    loading = True
+
+
+class BackgroundPrefetcher:
+    """
+    Decodifica en un pool de hilos los fondos de los estados a los que se puede llegar desde el actual,
+    para que enter_state nunca espere una decodificación síncrona. Los resultados se pasan a la caché
+    desde el hilo principal en poll().
+    """
+
+    def __init__(self, resources):
+        self.resources = resources
+        self._executor = ThreadPoolExecutor(max_workers=Config.PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        self._pending = {}  # state_name -> (LoadingFrames, Future)
+        # Llamado desde poll() con (LoadingFrames, resultado) para que el estado que reproduce la lista provisional
+        # pase a la versión final (codificada por deltas o de 8 bits) y no retenga dos copias
+        self.on_ready = None
+        self.ready = 0
+        self.late = 0
+        self.unscheduled = 0
+
+    def schedule(self, state_names, screen_width, screen_height):
+        # En streaming no tiene sentido decodificar secuencias completas por adelantado
+        if Config.STREAM_BACKGROUNDS:
+            return
+        cache = self.resources.animated_backgrounds
+        for state_name in state_names:
+            if state_name is None or state_name in cache or state_name in self._pending:
+                continue
+            # La precarga nunca desaloja: solo se hace si cabe en el presupuesto libre
+            if cache.bytes_used + self.resources.estimate_background_bytes(state_name, screen_width, screen_height) > cache.budget_bytes:
+                continue
+            self._submit(state_name, screen_width, screen_height)
+
+    def claim(self, state_name, screen_width, screen_height):
+        if Config.STREAM_BACKGROUNDS:
+            return None
+        pending = self._pending.get(state_name)
+        if pending is None:
+            self.unscheduled += 1
+            print(f"Prefetch: '{state_name}' no estaba precargado, se carga en segundo plano.")
+            return self._submit(state_name, screen_width, screen_height)
+        frames, future = pending
+        if future.done():
+            self.ready += 1
+            self.poll()
+        else:
+            self.late += 1
+            print(f"Prefetch: '{state_name}' llegó tarde ({len(frames)} fotogramas listos). Tardías: {self.late}/{self.ready + self.late}")
+        return frames
+
+    def poll(self):
+        for state_name, (frames, future) in list(self._pending.items()):
+            if future.done():
+                del self._pending[state_name]
+                frames.loading = False
+                if future.exception() is not None:
+                    print(f"Advertencia: Falló la precarga de '{state_name}'. Error: {future.exception()}")
+                    self.resources.animated_backgrounds[state_name] = frames
+                else:
+                    # Puede ser la misma lista o su versión codificada por deltas o de 8 bits
+                    result = future.result()
+                    self.resources.animated_backgrounds[state_name] = result
+                    if result is not frames and self.on_ready is not None:
+                        self.on_ready(frames, result)
+
+    def wait(self, timeout=None):
+        # Bloquea hasta que terminen las precargas en curso y las pasa a la caché (lo usa benchmark.py)
+        wait_futures([future for _, future in self._pending.values()], timeout)
+        self.poll()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {'ready': self.ready, 'late': self.late, 'unscheduled': self.unscheduled, 'pending': len(self._pending)}
+
+    def _submit(self, state_name, screen_width, screen_height):
+        frames = LoadingFrames()
+        future = self._executor.submit(self.resources.read_animated_background, state_name, screen_width, screen_height,
+                                       frames, False)
+        self._pending[state_name] = (frames, future)
+        return frames
+
+
+class FontTable(dict):
+    """
+    Diccionario de fuentes que carga en el momento una fuente todavía no cargada (arranque rápido).
+    """
+
+    def __init__(self, loader):
+        super().__init__()
+        self._loader = loader
+
+    def __missing__(self, name):
+        self._loader([name])
+        return self[name]
+
+
 class ResourceManager:
-    def __init__(self):
-        self.fonts = {}
+    FONT_SPECS = {
+        'large': ('predataur.ttf', 74),
+        'medium': ('electromagnetic.otf', 50),
+        'small': ('electromagnetic.otf', 36),
+    }
+
+    def __init__(self, deferred=False):
+        """
+        Con `deferred` solo se cargan las fuentes de Config.STARTUP_FONTS; el resto se carga en load_deferred().
+        Mientras tanto los sonidos simplemente no suenan.
+        """
+        self.fonts = FontTable(self._load_fonts)
         self.images = {}
-        self.sounds = {}
+        self.audio = AudioBank()
         self.icon = None
-        self.animated_backgrounds = {}
+        self.animated_backgrounds = BackgroundCache(self._background_cache_budget(), Config.BACKGROUND_CACHE_PINNED)
+        self.prefetcher = BackgroundPrefetcher(self) if Config.PREFETCH_BACKGROUNDS else None
         # Almacenar las rutas de los sonidos para pygame.mixer.music porque por alguna razon asi normal no estaba funcionando
-        self._sound_paths = {} 
+        # La música se reproduce en streaming con pygame.mixer.music, nunca se decodifica como Sound
+        self._sound_paths = {'background': resource_path(os.path.join('assets', 'sounds', 'background.ogg'))}
+        self._sounds_thread = None
+        if deferred:
+            self._load_fonts(Config.STARTUP_FONTS)
+        else:
+            self._load_fonts()
+            self.audio.load()
+            self._load_icon()
+
+    def load_deferred(self):
+        """
+        Completa lo que el arranque rápido dejó pendiente: fuentes e icono aquí, los sonidos en un hilo.
+        """
         self._load_fonts()
-        self._load_sounds()
         self._load_icon()
+        self._sounds_thread = threading.Thread(target=self.audio.load, name="sounds", daemon=True)
+        self._sounds_thread.start()
+
+    def wait_deferred(self):
+        if self._sounds_thread is not None:
+            self._sounds_thread.join()
 
     def _load_icon(self):
         try:
@@ -86,150 +550,895 @@ class ResourceManager:
             print(f"Error cargando icono: {e}")
             self.icon = None
 
-    def _load_fonts(self):
-        try:
-            self.fonts['large'] = pygame.font.Font(resource_path(os.path.join('assets', 'fonts', 'predataur.ttf')), 74)
-            self.fonts['medium'] = pygame.font.Font(resource_path(os.path.join('assets', 'fonts', 'electromagnetic.otf')), 50)
-            self.fonts['small'] = pygame.font.Font(resource_path(os.path.join('assets', 'fonts', 'electromagnetic.otf')), 36)
-        except Exception as e:
-            print(f"Error cargando fuentes: {e}")
-            self.fonts['large'] = pygame.font.Font(None, 74)
-            self.fonts['medium'] = pygame.font.Font(None, 50)
-            self.fonts['small'] = pygame.font.Font(None, 36)
-
-    def _load_sounds(self):
-        self.sounds = {} 
-        self._sound_paths = {} 
-        try:
-            points_path = resource_path(os.path.join('assets', 'sounds', 'points.wav'))
-            game_over_path = resource_path(os.path.join('assets', 'sounds', 'gameover.wav'))
-            button_path = resource_path(os.path.join('assets', 'sounds', 'button.wav'))
-            fanfare_path = resource_path(os.path.join('assets', 'sounds', 'fanfare.wav'))
-            background_music_path = resource_path(os.path.join('assets', 'sounds', 'background.ogg'))
-
-            self.sounds['points'] = pygame.mixer.Sound(points_path)
-            self.sounds['game_over'] = pygame.mixer.Sound(game_over_path)
-            self.sounds['button'] = pygame.mixer.Sound(button_path)
-            self.sounds['fanfare'] = pygame.mixer.Sound(fanfare_path)
-            # Aunque no se usa el objeto Sound directamente para pygame.mixer.music.load, lo mantenemos por si acaso.
-            # Esto toco hacerlo asi porque esa vaina no queria funcionar
-            self.sounds['background'] = pygame.mixer.Sound(background_music_path)
-
-            # Almacenar las rutas para el mixer.music.load()
-            self._sound_paths['background'] = background_music_path
-
-        except pygame.error as e:
-            print(f"Advertencia: No se pudieron cargar los sonidos. Asegúrate de que los archivos existan en 'assets/sounds/'. Error: {e}")
-            # Asegurar que las claves existan incluso si la carga falla
-            for key in ['points', 'game_over', 'button', 'fanfare', 'background']:
-                if key not in self.sounds:
-                    self.sounds[key] = None
-                if key not in self._sound_paths:
-                    self._sound_paths[key] = None
+    def _load_fonts(self, names=None):
+        for name in names or self.FONT_SPECS:
+            if name in self.fonts:
+                continue
+            filename, size = self.FONT_SPECS[name]
+            try:
+                self.fonts[name] = pygame.font.Font(resource_path(os.path.join('assets', 'fonts', filename)), Config.scaled(size))
+            except Exception as e:
+                print(f"Error cargando fuentes: {e}")
+                self.fonts[name] = pygame.font.Font(None, Config.scaled(size))
+
+    def _background_cache_budget(self):
+        if Config.BACKGROUND_CACHE_BUDGET_MB is not None:
+            return Config.BACKGROUND_CACHE_BUDGET_MB * 2**20
+        total = system_memory_bytes()
+        if total is None:
+            return 512 * 2**20
+        return int(total * Config.BACKGROUND_CACHE_RAM_FRACTION)
 
     def get_sound_path(self, sound_name):
         return self._sound_paths.get(sound_name)
 
     def load_animated_background(self, state_name, screen_width, screen_height):
+        cached = self.animated_backgrounds.get(state_name)
+        if cached is not None:
+            return cached
+
+        if self.prefetcher is not None:
+            frames = self.prefetcher.claim(state_name, screen_width, screen_height)
+            if frames is not None:
+                return frames
+
+        images_list = self.read_animated_background(state_name, screen_width, screen_height)
+        if not isinstance(images_list, StreamingBackground):
+            self.animated_backgrounds[state_name] = images_list
+        return images_list
+
+    def read_animated_background(self, state_name, screen_width, screen_height, images_list=None, allow_streaming=True):
+        """
+        Lee una secuencia del disco sin pasar por la caché. Si se entrega `images_list`, los fotogramas se van
+        agregando ahí a medida que se decodifican (lo usa el prefetcher desde su hilo).
+        """
         path = resource_path(os.path.join('assets', state_name))
-        images_list = []
-        if state_name in self.animated_backgrounds:
-            return self.animated_backgrounds[state_name]
+        if images_list is None:
+            images_list = []
+
+        if Config.PALETTE_BACKGROUNDS:
+            pack_frames = self._load_frame_pack(state_name, screen_width, screen_height, indexed=True)
+            if pack_frames is not None:
+                images_list.extend(pack_frames)
+                return images_list
+            if palette is None:
+                print(f"Advertencia: No hay paquete indexado para '{state_name}' y falta numpy para generarlo, se usará el fondo de 32 bits.")
+
+        if Config.USE_FRAME_PACKS:
+            pack_frames = self._load_frame_pack(state_name, screen_width, screen_height)
+            if pack_frames is not None:
+                images_list.extend(pack_frames)
+                return self._palettize(state_name, images_list)
 
         try:
             # os.listdir requiere la ruta que resource_path proporciona
-            files = sorted([f for f in os.listdir(path) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))])
+            files = list_frame_files(path)
 
             if not files:
                 print(f"Advertencia: No se encontraron imágenes en la carpeta '{path}'. Asegúrate de que existan y sean PNG/JPG.")
-                self.animated_backgrounds[state_name] = []
-                return []
-
-            for filename in files:
-                img_path = resource_path(os.path.join('assets', state_name, filename))
-                image = pygame.image.load(img_path).convert_alpha()
-                image = pygame.transform.scale(image, (screen_width, screen_height))
-                images_list.append(image)
-
-            self.animated_backgrounds[state_name] = images_list
-            return images_list
+                return images_list
+
+            img_paths = [resource_path(os.path.join('assets', state_name, filename)) for filename in files]
+            if (allow_streaming and Config.STREAM_BACKGROUNDS and len(img_paths) > Config.STREAM_BUFFER_FRAMES
+                    and not (Config.PALETTE_BACKGROUNDS and palette is not None)):
+                # No se cachea: cada estado abre su propio stream y lo libera en exit_state
+                return StreamingBackground(img_paths, (screen_width, screen_height), Config.STREAM_BUFFER_FRAMES,
+                                           decode_background_frame)
+
+            for img_path in img_paths:
+                images_list.append(decode_background_frame(img_path, (screen_width, screen_height)))
+            return self._palettize(state_name, images_list)
         except pygame.error as e:
             print(f"Advertencia: No se pudieron cargar las imágenes para el estado '{state_name}'. Error: {e}")
-            self.animated_backgrounds[state_name] = []
-            return []
         except FileNotFoundError as e:
             print(f"Advertencia: La carpeta de estado '{path}' no fue encontrada. Error: {e}")
-            self.animated_backgrounds[state_name] = []
-            return []
+        return images_list
+
+    def _palettize(self, state_name, images_list):
+        # Cuantiza la secuencia a 8 bits y la guarda como paquete indexado para no repetirlo en el próximo arranque
+        if not (Config.PALETTE_BACKGROUNDS and palette is not None and images_list):
+            return self._delta_encode(images_list)
+        start = time.perf_counter()
+        colors, indices = palette.quantize_sequence(pygame, images_list)
+        width, height = images_list[0].get_size()
+        print(f"Fondo '{state_name}' cuantizado a 8 bits en {(time.perf_counter() - start) * 1000:.0f} ms")
+        pack_path = data_path(os.path.join('assets', Config.FRAME_PACK_DIR, pack_filename(state_name, width, height, indexed=True)))
+        try:
+            os.makedirs(os.path.dirname(pack_path), exist_ok=True)
+            write_pack(pack_path, width, height, indices, source_mtime(resource_path(os.path.join('assets', state_name))),
+                       colors.tolist())
+        except OSError as e:
+            print(f"Advertencia: No se pudo guardar el paquete indexado '{pack_path}'. Error: {e}")
+        return [palette.indexed_surface(pygame, frame, colors) for frame in indices]
+
+    def _delta_encode(self, images_list):
+        if Config.DELTA_BACKGROUNDS and len(images_list) > 1:
+            animation = DeltaAnimation.encode(images_list, Config.DELTA_TOLERANCE, Config.DELTA_TILE_SIZE)
+            # El back buffer cambia en su lugar: con el backend 'renderer' se vuelve a subir lo que se dibuja
+            RendererCanvas.mark_mutable(animation.surface)
+            return animation
+        return images_list
+
+    def estimate_background_bytes(self, state_name, screen_width, screen_height):
+        try:
+            bytes_per_pixel = 1 if Config.PALETTE_BACKGROUNDS else 4
+            return len(list_frame_files(resource_path(os.path.join('assets', state_name)))) * screen_width * screen_height * bytes_per_pixel
+        except FileNotFoundError:
+            return 0
+
+    def _load_frame_pack(self, state_name, screen_width, screen_height, indexed=False):
+        # Paquete mapeado en memoria: los fotogramas ya están escalados y en formato de pantalla (o indexados a 8 bits)
+        # Primero los paquetes incluidos en assets/, después los que el juego generó en su carpeta de datos
+        pack_name = os.path.join('assets', Config.FRAME_PACK_DIR, pack_filename(state_name, screen_width, screen_height, indexed))
+        for pack_path in dict.fromkeys((resource_path(pack_name), data_path(pack_name))):
+            try:
+                pack = open_pack(pack_path, screen_width, screen_height, resource_path(os.path.join('assets', state_name)))
+                if pack is not None:
+                    return pack.surfaces(pygame)
+            except (OSError, ValueError, pygame.error) as e:
+                print(f"Advertencia: No se pudo abrir el paquete de fotogramas '{pack_path}'. Error: {e}")
+        return None
 
     def get_font(self, font_size):
         return self.fonts.get(font_size)
 
+    def font_nbytes(self):
+        # Tamaño de los archivos de las fuentes cargadas: FreeType los lee por partes, es una cota y no lo residente
+        total = 0
+        for filename in {self.FONT_SPECS[name][0] for name in self.FONT_SPECS if name in self.fonts}:
+            try:
+                total += os.path.getsize(resource_path(os.path.join('assets', 'fonts', filename)))
+            except OSError:
+                pass
+        return total
+
     def get_sound(self, sound_name):
-        return self.sounds.get(sound_name)
+        return self.audio.get(sound_name)
     
     def get_icon(self):
         return self.icon
 
 
+# --- Módulo de Audio ---
+def mixer_format_tag():
+    frequency, size, channels = pygame.mixer.get_init()
+    return f"{frequency}_{size}_{channels}"
+
+
+class AudioBank:
+    """
+    Efectos de sonido con caché PCM en disco y canales reservados por clase (Config.AUDIO_CHANNEL_GROUPS).
+    La primera vez cada WAV se decodifica y remuestrea al formato del mixer y se guarda crudo en
+    assets/pcm/; después se carga con Sound(buffer=...) sin decodificar ni remuestrear.
+    """
+    SOUND_FILES = {'points': 'points.wav', 'game_over': 'gameover.wav', 'button': 'button.wav', 'fanfare': 'fanfare.wav'}
+
+    def __init__(self):
+        self.sounds = dict.fromkeys(self.SOUND_FILES)
+        self._groups = {}  # efecto -> [Channel]
+        self._started = {}  # id del canal -> time.monotonic() del último play
+        self.steals = 0  # Efectos que cortaron a otro porque todos los canales de su clase estaban ocupados
+
+    def configure_channels(self):
+        """
+        Reserva los canales de cada clase para que Sound.play() nunca los tome. Requiere el mixer iniciado.
+        """
+        index = 0
+        for sound_names, count in Config.AUDIO_CHANNEL_GROUPS.values():
+            channels = list(range(index, index + count))
+            for sound_name in sound_names:
+                self._groups[sound_name] = channels
+            index += count
+        pygame.mixer.set_num_channels(max(Config.AUDIO_NUM_CHANNELS, index))
+        pygame.mixer.set_reserved(index)
+        self._groups = {name: [pygame.mixer.Channel(i) for i in channels] for name, channels in self._groups.items()}
+
+    def load(self):
+        if pygame.mixer.get_init() is None:
+            print("Advertencia: El mixer no está iniciado, el juego sigue sin efectos de sonido.")
+            return
+        start = time.perf_counter()
+        sounds = dict.fromkeys(self.SOUND_FILES)
+        cache_dir = data_path(os.path.join('assets', Config.AUDIO_CACHE_DIR))
+        try:
+            for key, filename in self.SOUND_FILES.items():
+                sounds[key] = self._load_cached(resource_path(os.path.join('assets', 'sounds', filename)), cache_dir)
+        except pygame.error as e:
+            print(f"Advertencia: No se pudieron cargar los sonidos. Asegúrate de que los archivos existan en 'assets/sounds/'. Error: {e}")
+        # Se reemplaza de una vez: el hilo principal nunca ve el diccionario a medio llenar
+        self.sounds = sounds
+        print(f"Sonidos cargados en {(time.perf_counter() - start) * 1000:.0f} ms.")
+
+    def _load_cached(self, source_path, cache_dir):
+        name = os.path.splitext(os.path.basename(source_path))[0]
+        cache_path = os.path.join(cache_dir, f"{name}_{mixer_format_tag()}.pcm")
+        try:
+            if os.path.getmtime(cache_path) >= os.path.getmtime(source_path):
+                with open(cache_path, 'rb') as f:
+                    return pygame.mixer.Sound(buffer=f.read())
+        except OSError:
+            pass  # Sin caché o sin permisos: se decodifica el WAV
+
+        sound = pygame.mixer.Sound(source_path)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(sound.get_raw())
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Advertencia: No se pudo guardar la caché PCM '{cache_path}'. Error: {e}")
+        return sound
+
+    def get(self, sound_name):
+        return self.sounds.get(sound_name)
+
+    def play(self, sound_name):
+        """
+        Reproduce en un canal libre de su clase o, si todos están ocupados, en el que lleva más tiempo sonando.
+        """
+        sound = self.sounds.get(sound_name)
+        if sound is None:
+            return None
+        channels = self._groups.get(sound_name)
+        if not channels:
+            return sound.play()
+        channel = next((c for c in channels if not c.get_busy()), None)
+        if channel is None:
+            channel = min(channels, key=lambda c: self._started.get(id(c), 0.0))
+            self.steals += 1
+        channel.play(sound)
+        self._started[id(channel)] = time.monotonic()
+        return channel
+
+    def play_once(self, sound_name):
+        # No reinicia el efecto si ya está sonando en su clase
+        sound = self.sounds.get(sound_name)
+        if sound is None or any(c.get_sound() is sound for c in self._groups.get(sound_name, ())):
+            return None
+        return self.play(sound_name)
+
+    def busy_channels(self):
+        if pygame.mixer.get_init() is None:
+            return 0
+        return sum(pygame.mixer.Channel(i).get_busy() for i in range(pygame.mixer.get_num_channels()))
+
+    def nbytes(self):
+        # PCM en el formato del mixer: duración x muestras por segundo x bytes por muestra x canales
+        mixer_format = pygame.mixer.get_init()
+        if mixer_format is None:
+            return 0
+        frequency, size, channels = mixer_format
+        bytes_per_second = frequency * (abs(size) // 8) * channels
+        return sum(int(sound.get_length() * bytes_per_second) for sound in list(self.sounds.values()) if sound is not None)
+
+# --- Módulo de Decodificación de fondos ---
+def decode_background_frame(img_path, size):
+    return pygame.transform.scale(to_display_format(pygame.image.load(img_path)), size)
+
+
+# --- Módulo de Entradas ---
+class SensorHitBatch:
+    """
+    Junta los golpes de sensor que llegan en un mismo cuadro para aplicarlos de una vez (Game.flush_hits).
+    Descarta los duplicados: una presión de un sensor que sigue presionado (sin su liberación), o, si el evento
+    trae la marca del kernel (evdev), una que llega a menos de Config.SENSOR_DEBOUNCE_MS de la anterior aceptada.
+    Con el teclado no hay marca confiable: varias presiones encoladas durante un cuadro lento salen de la cola
+    casi en el mismo instante y son golpes reales. press devuelve False solo para un rebote, que Game no graba en
+    la sesión: así replay.py, que entrega las teclas sin marca del kernel, aplica los mismos golpes que el juego.
+    """
+
+    def __init__(self, debounce_ms):
+        self.debounce_s = debounce_ms / 1000
+        self.pending = []  # (tecla, t_entrada, t_salida_de_cola)
+        self._held = set()
+        self._last_kernel_time = {}
+        self.accepted = 0
+        self.duplicates = 0
+        self.bounces = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.apply_s = 0.0
+
+    def press(self, key, input_time, dequeued_time, kernel_time=None):
+        if key in self._held:
+            # Sin la liberación en medio el replay la descarta igual, así que se graba
+            self.duplicates += 1
+            return True
+        if kernel_time is not None:
+            last = self._last_kernel_time.get(key)
+            if last is not None and kernel_time - last < self.debounce_s:
+                self.bounces += 1
+                return False
+            self._last_kernel_time[key] = kernel_time
+        self._held.add(key)
+        self.pending.append((key, input_time, dequeued_time))
+        self.accepted += 1
+        return True
+
+    def release(self, key):
+        self._held.discard(key)
+
+    def take(self):
+        hits, self.pending = self.pending, []
+        if hits:
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(hits))
+        return hits
+
+    def record_apply(self, seconds):
+        self.apply_s += seconds
+
+    def report(self):
+        per_hit_us = self.apply_s / self.accepted * 1e6 if self.accepted else 0.0
+        return (f"Golpes: {self.accepted} en {self.batches} lotes (máx {self.max_batch} por cuadro), "
+                f"descartados {self.duplicates} duplicados y {self.bounces} rebotes, {per_hit_us:.1f} µs por golpe")
+
+
+# --- Módulo de Planificación ---
+class FrameScheduler:
+    """
+    Separa la simulación del dibujo. Los updates corren en pasos fijos de Config.UPDATE_HZ sobre un reloj lógico
+    (`time_ms`) que sigue al reloj de pared; los estados eligen el fotograma de la animación y vencen sus
+    temporizadores según ese reloj, no según cuántas veces se llamó update. El dibujo va a Config.FPS: si un
+    cuadro termina después de su plazo se cuenta como atrasado y las ranuras que ya pasaron se descartan en
+    lugar de dibujarlas seguidas para alcanzar al reloj.
+    """
+
+    def __init__(self, fps, update_hz, max_updates, clock=time.perf_counter, sleep=time.sleep):
+        # replay.py pasa un reloj acelerado o virtual para reproducir sesiones más rápido que en tiempo real
+        self.clock = clock
+        self.sleep = sleep
+        self.frame_s = 1 / fps
+        self.step_s = 1 / update_hz
+        self.step_ms = 1000 / update_hz
+        self.max_updates = max_updates
+        self.time_ms = 0.0
+        self._last = clock()
+        self._accumulator = 0.0
+        self._deadline = self._last + self.frame_s
+        self.updates = 0
+        self.skipped_steps = 0
+        self.frames = 0
+        self.dropped = 0
+        self.late = 0
+
+    def updates_due(self):
+        # Cantidad de pasos fijos que corresponden al tiempo transcurrido desde la última llamada
+        now = self.clock()
+        self._accumulator += now - self._last
+        self._last = now
+        steps = int(self._accumulator / self.step_s)
+        self._accumulator -= steps * self.step_s
+        if steps > self.max_updates:
+            # Tras un reposo o una carga larga el reloj salta de una vez: el resultado no depende de la cantidad de updates
+            self.time_ms += (steps - self.max_updates) * self.step_ms
+            self.skipped_steps += steps - self.max_updates
+            steps = self.max_updates
+        return steps
+
+    def step(self):
+        self.time_ms += self.step_ms
+        self.updates += 1
+
+    def resync(self):
+        # Después de dormir en pygame.event.wait el próximo cuadro vuelve a contar desde ahora
+        self._deadline = self.clock() + self.frame_s
+
+    def end_frame(self):
+        self.frames += 1
+        now = self.clock()
+        if now < self._deadline:
+            self.sleep(self._deadline - now)
+            self._deadline += self.frame_s
+            return
+        self.late += 1
+        missed = int((now - self._deadline) / self.frame_s)
+        self.dropped += missed
+        self._deadline += (missed + 1) * self.frame_s
+
+    def report(self):
+        return (f"Planificador: {self.frames} cuadros dibujados, {self.late} atrasados, {self.dropped} descartados; "
+                f"{self.updates} updates ({self.skipped_steps} pasos saltados tras reposo)")
+
+
+# --- Módulo de Instrumentación ---
+class LatencyHistogram:
+    """
+    Histograma de latencias con cubetas logarítmicas (10% de ancho), de costo fijo por muestra.
+    """
+    MIN_MS = 0.05
+    GROWTH = 1.1
+    BUCKETS = 160  # Cubre hasta ~200 s
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        index = 0 if ms <= self.MIN_MS else min(self.BUCKETS - 1, int(math.log(ms / self.MIN_MS, self.GROWTH)) + 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p):
+        target = math.ceil(self.count * p / 100)
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                # Borde superior de la cubeta
+                return min(self.max_ms, self.MIN_MS * self.GROWTH ** index)
+        return self.max_ms
+
+
+class LatencyTracer:
+    """
+    Sigue cada entrada desde que llega (marca del kernel con evdev, o al salir de la cola con el teclado),
+    pasando por cuándo handle_input la aplica, hasta el primer present que la muestra en pantalla.
+    Los tramos se acumulan en histogramas por estado:
+      cola: entrada -> sale de la cola de eventos (polling y clock.tick)
+      aplicar: sale de la cola -> handle_input terminó (puntaje aplicado)
+      presentar: aplicado -> primer flip/update posterior (draw y presentación)
+      total: entrada -> pantalla
+    Una entrada que no cambia nada en pantalla (S, teclas que el estado ignora) solo cuenta en cola y aplicar:
+    si el draw siguiente no devuelve regiones, su traza se descarta en lugar de cerrarse en un present posterior.
+    """
+    SEGMENTS = ('cola', 'aplicar', 'presentar', 'total')
+
+    def __init__(self):
+        self.histograms = {}  # (etiqueta, tramo) -> LatencyHistogram
+        self._awaiting_present = []  # (etiqueta, t_entrada, t_aplicado)
+        self.discarded = 0
+
+    def input_applied(self, label, input_time, dequeued_time):
+        applied_time = time.monotonic()
+        self._add(label, 'cola', dequeued_time - input_time)
+        self._add(label, 'aplicar', applied_time - dequeued_time)
+        self._awaiting_present.append((label, input_time, applied_time))
+
+    def nothing_drawn(self):
+        self.discarded += len(self._awaiting_present)
+        self._awaiting_present = []
+
+    def presented(self):
+        if not self._awaiting_present:
+            return
+        presented_time = time.monotonic()
+        for label, input_time, applied_time in self._awaiting_present:
+            self._add(label, 'presentar', presented_time - applied_time)
+            self._add(label, 'total', presented_time - input_time)
+        self._awaiting_present = []
+
+    def report(self):
+        lines = ["Latencias entrada -> pantalla (ms)          n     p50     p95     p99     max"]
+        for (label, segment), histogram in sorted(self.histograms.items(), key=lambda item: (item[0][0], self.SEGMENTS.index(item[0][1]))):
+            lines.append(f"  {label:<24} {segment:<10} {histogram.count:>6} {histogram.percentile(50):>7.1f} "
+                         f"{histogram.percentile(95):>7.1f} {histogram.percentile(99):>7.1f} {histogram.max_ms:>7.1f}")
+        lines.append(f"  Entradas sin cambios en pantalla (sin presentar/total): {self.discarded}")
+        return "\n".join(lines)
+
+    def _add(self, label, segment, seconds):
+        histogram = self.histograms.get((label, segment))
+        if histogram is None:
+            histogram = self.histograms[(label, segment)] = LatencyHistogram()
+        histogram.add(max(0.0, seconds) * 1000)
+
+
+class FrameProfiler:
+    """
+    Tiempos por fase de cada vuelta de Game.run en un buffer circular de tamaño fijo por estado, más una
+    lista de los últimos picos con su desglose. Registrar un cuadro son unas pocas escrituras en un array.
+    """
+    PHASES = ('eventos', 'entrada', 'update', 'draw', 'present', 'espera')
+    BUSY_PHASES = 5  # 'espera' (clock.tick y event.wait en reposo) no cuenta para los picos
+
+    def __init__(self, ring_frames, spike_ms, max_spikes):
+        self.ring_frames = ring_frames
+        self.spike_ms = spike_ms
+        self._rings = {}  # estado -> [array de ring_frames * fases, siguiente posición, cuadros registrados]
+        self.spikes = deque(maxlen=max_spikes)
+        self.frames = 0
+
+    def record(self, state_name, phases):
+        ring = self._rings.get(state_name)
+        if ring is None:
+            ring = self._rings[state_name] = [array('d', bytes(8 * self.ring_frames * len(self.PHASES))), 0, 0]
+        samples, position, _ = ring
+        base = position * len(self.PHASES)
+        samples[base:base + len(self.PHASES)] = array('d', phases)
+        ring[1] = (position + 1) % self.ring_frames
+        ring[2] += 1
+        self.frames += 1
+        busy_ms = sum(phases[:self.BUSY_PHASES]) * 1000
+        if busy_ms > self.spike_ms:
+            self.spikes.append((time.strftime('%H:%M:%S'), state_name, busy_ms, phases))
+
+    def report(self):
+        lines = [f"Perfil por fases (ms, últimos {self.ring_frames} cuadros por estado)"]
+        header = "".join(f"{phase:>10}" for phase in self.PHASES)
+        for state_name, (samples, _, recorded) in sorted(self._rings.items()):
+            count = min(recorded, self.ring_frames)
+            means = [sum(samples[i * len(self.PHASES) + p] for i in range(count)) / count * 1000 for p in range(len(self.PHASES))]
+            maxima = [max(samples[i * len(self.PHASES) + p] for i in range(count)) * 1000 for p in range(len(self.PHASES))]
+            lines.append(f"  {state_name} ({recorded} cuadros)")
+            lines.append(f"    {'':<6}{header}")
+            lines.append(f"    {'media':<6}" + "".join(f"{value:>10.2f}" for value in means))
+            lines.append(f"    {'max':<6}" + "".join(f"{value:>10.2f}" for value in maxima))
+        lines.append(f"Picos (> {self.spike_ms:.1f} ms): {len(self.spikes)}")
+        for when, state_name, busy_ms, phases in self.spikes:
+            breakdown = " ".join(f"{phase}={value * 1000:.1f}" for phase, value in zip(self.PHASES, phases))
+            lines.append(f"  {when} {state_name} {busy_ms:.1f} ms: {breakdown}")
+        return "\n".join(lines)
+
+
+
+def process_age_seconds():
+    """
+    Segundos desde que arrancó el proceso (incluye importar pygame), o None si no se puede leer /proc.
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # El nombre del proceso va entre paréntesis y puede tener espacios; los campos siguen después
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """
+    Tiempos de las fases del arranque, desde la creación de Game hasta el primer cuadro y la carga diferida.
+    """
+
+    def __init__(self):
+        self.phases = []  # (fase, ms)
+        self._last = time.perf_counter()
+        self.first_frame_ms = None
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000))
+        self._last = now
+
+    def first_frame(self):
+        # Desde el inicio del proceso si se puede, si no desde la creación de Game
+        age = process_age_seconds()
+        self.first_frame_ms = age * 1000 if age is not None else sum(ms for _, ms in self.phases)
+
+    def report(self):
+        lines = [f"Arranque: primer cuadro a {self.first_frame_ms:.0f} ms del inicio del proceso (objetivo {Config.STARTUP_TARGET_MS} ms)"]
+        lines.extend(f"  {phase:<16} {ms:>8.1f} ms" for phase, ms in self.phases)
+        return "\n".join(lines)
+
+def process_memory():
+    """
+    (RSS, pico de RSS) del proceso en bytes, leídos de /proc/self/status, o (None, None) si no se puede.
+    """
+    rss = peak = None
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return rss, peak
+
+
+class MemoryAccounting:
+    """
+    Bytes que retiene cada parte del juego (fondos por estado, sonidos, fuentes, textos, texturas) junto al RSS
+    del proceso. Game toma una instantánea en cada set_state; el reporte compara, por estado, la primera visita
+    con la última, así un crecimiento de partida en partida se ve aunque esté lejos del OOM. Los fondos de paquetes
+    mapeados van en 'mapeados' y no en 'fondos': son páginas del archivo y solo pesan en el RSS las que se tocaron.
+    """
+    CATEGORIES = ('rss', 'fondos', 'mapeados', 'sonidos', 'fuentes', 'textos', 'texturas')
+
+    def __init__(self, max_snapshots):
+        self.snapshots = deque(maxlen=max_snapshots)  # (hora, estado, muestra)
+        self._per_state = {}  # estado -> [visitas, primera muestra, última muestra, rss máximo]
+        self.peaks = dict.fromkeys(self.CATEGORIES, 0)
+        self.peak_rss = 0
+
+    def measure(self, game):
+        """
+        Devuelve (muestra por categoría, bytes de fondos decodificados por estado). Recorre solo estructuras ya en memoria.
+        """
+        resources = game.resources
+        backgrounds = {name: nbytes for name, nbytes in resources.animated_backgrounds.sizes().items() if nbytes}
+        handler = game.current_state_handler
+        if isinstance(handler.background_frames, StreamingBackground):
+            backgrounds[f"{handler.background_name} (stream)"] = handler.background_frames.nbytes()
+        rss, peak = process_memory()
+        self.peak_rss = max(self.peak_rss, peak or 0)
+        sample = {
+            'rss': rss or 0,
+            'fondos': sum(backgrounds.values()),
+            'mapeados': resources.animated_backgrounds.mapped_bytes,
+            'sonidos': resources.audio.nbytes(),
+            'fuentes': resources.font_nbytes(),
+            'textos': DrawingUtils.text_cache.nbytes(),
+            'texturas': game.canvas.nbytes() if game.canvas is not None else 0,
+        }
+        for category, value in sample.items():
+            self.peaks[category] = max(self.peaks[category], value)
+        return sample, backgrounds
+
+    def snapshot(self, game, state_name):
+        sample, _ = self.measure(game)
+        self.snapshots.append((time.strftime('%H:%M:%S'), state_name, sample))
+        entry = self._per_state.get(state_name)
+        if entry is None:
+            self._per_state[state_name] = [1, sample, sample, sample['rss']]
+        else:
+            entry[0] += 1
+            entry[2] = sample
+            entry[3] = max(entry[3], sample['rss'])
+
+    def report(self):
+        mb = 2**20
+        lines = [f"Memoria (MB): pico de RSS {self.peak_rss / mb:.1f}, {len(self.snapshots)} instantáneas guardadas"]
+        lines.append(f"  {'estado':<20} {'visitas':>7} {'rss 1ra':>8} {'rss últ':>8} {'rss máx':>8} {'crec.':>7}  fondos/mapeados/sonidos/textos/texturas (últ)")
+        for state_name, (visits, first, last, max_rss) in sorted(self._per_state.items()):
+            lines.append(f"  {state_name:<20} {visits:>7} {first['rss'] / mb:>8.1f} {last['rss'] / mb:>8.1f} {max_rss / mb:>8.1f} "
+                         f"{(last['rss'] - first['rss']) / mb:>+7.1f}  {last['fondos'] / mb:.1f}/{last['mapeados'] / mb:.1f}/{last['sonidos'] / mb:.1f}/"
+                         f"{last['textos'] / mb:.1f}/{last['texturas'] / mb:.1f}")
+        lines.append("  máximos por categoría: " + ", ".join(f"{category} {value / mb:.1f}" for category, value in self.peaks.items()))
+        for when, state_name, sample in list(self.snapshots)[-5:]:
+            lines.append(f"  {when} {state_name:<20} " + " ".join(f"{category}={value / mb:.1f}" for category, value in sample.items()))
+        return "\n".join(lines)
+
 # --- Módulo de Utilidades de Dibujo ---
+# Texto a dibujar sobre el fondo de un estado. Los estados devuelven una lista de estos en overlay()
+OverlayText = namedtuple('OverlayText', ['text', 'font', 'color', 'x', 'y', 'center'], defaults=[True])
+
+
+class TextCache:
+    """
+    Caché LRU de textos renderizados por (texto, fuente, color). Los números se componen a partir de un
+    atlas de dígitos por fuente y color, así un puntaje nuevo no requiere un font.render completo.
+    """
+    DIGITS = "0123456789"
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._surfaces = OrderedDict()
+        self._atlases = {}  # (font, color) -> (surface atlas, [Rect por dígito])
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, font, color):
+        key = (text, font, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        if Config.TEXT_DIGIT_ATLAS and any(c in self.DIGITS for c in text):
+            surface = self._compose(text, font, color)
+        else:
+            surface = font.render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def prewarm(self, texts, font, colors):
+        for text in texts:
+            for color in colors:
+                self.render(text, font, color)
+
+    def nbytes(self):
+        surfaces = list(self._surfaces.values()) + [atlas for atlas, _ in self._atlases.values()]
+        return sum(surface.get_pitch() * surface.get_height() for surface in surfaces)
+
+    def _digit_atlas(self, font, color):
+        atlas = self._atlases.get((font, color))
+        if atlas is None:
+            surface = font.render(self.DIGITS, True, color)
+            rects = []
+            for i in range(len(self.DIGITS)):
+                x = font.size(self.DIGITS[:i])[0] if i else 0
+                rects.append(pygame.Rect(x, 0, font.size(self.DIGITS[i])[0], surface.get_height()))
+            atlas = (surface, rects)
+            self._atlases[(font, color)] = atlas
+        return atlas
+
+    def _compose(self, text, font, color):
+        # Se separa el texto en tramos de letras (cacheados) y tramos de dígitos (tomados del atlas)
+        atlas, digit_rects = self._digit_atlas(font, color)
+        pieces = []
+        run = ""
+        for c in text + "\0":
+            if run and ((c in self.DIGITS) != (run[-1] in self.DIGITS) or c == "\0"):
+                if run[-1] in self.DIGITS:
+                    pieces.extend((atlas, digit_rects[ord(d) - 48]) for d in run)
+                else:
+                    segment = self.render(run, font, color)
+                    pieces.append((segment, segment.get_rect()))
+                run = ""
+            run += c
+        width = sum(area.width for _, area in pieces)
+        surface = pygame.Surface((width, atlas.get_height()), pygame.SRCALPHA)
+        x = 0
+        for source, area in pieces:
+            # BLEND_RGBA_MAX sobre un fondo transparente copia los píxeles tal cual, alfa incluido
+            surface.blit(source, (x, 0), area, special_flags=pygame.BLEND_RGBA_MAX)
+            x += area.width
+        return surface
+
+
 class DrawingUtils:
+    text_cache = TextCache(Config.TEXT_CACHE_SIZE)
+
     @staticmethod
-    def draw_text(surface, text, font, color, x, y, center=True):
-        text_surface = font.render(text, True, color)
+    def render_text(text, font, color, x, y, center=True):
+        text_surface = DrawingUtils.text_cache.render(text, font, color)
         text_rect = text_surface.get_rect()
         if center:
             text_rect.center = (x, y)
         else:
             text_rect.topleft = (x, y)
+        return text_surface, text_rect
+
+    @staticmethod
+    def draw_text(surface, text, font, color, x, y, center=True):
+        text_surface, text_rect = DrawingUtils.render_text(text, font, color, x, y, center)
         surface.blit(text_surface, text_rect)
+        return text_rect
 
 # --- Clases de Pantalla/Estado del Juego ---
 class GameState:
+    background_name = None
+
     def __init__(self, game):
         self.game = game
         self.background_frames = []
         self.current_frame_index = 0
-        self.last_frame_time = 0
+        self.animation_start_time = 0
         self.animation_speed_ms = 30 #30 FPS para la animación
         self.animation_finished = False
+        # Lo último que se dibujó en pantalla, para el renderizado por rectángulos sucios
+        self._drawn_frame = None
+        self._drawn_overlay = []
 
     def enter_state(self):
         self.background_frames = []
         self.current_frame_index = 0
-        self.last_frame_time = pygame.time.get_ticks()
+        self.animation_start_time = self.game.now_ms()
         self.animation_finished = False
+        self.invalidate()
+
+    def invalidate(self):
+        # Fuerza un repintado completo en el próximo draw
+        self._drawn_frame = None
+        self._drawn_overlay = []
+
+    def _load_background(self):
+        # El fondo del estado activo queda fijado en la caché hasta salir del estado
+        self.game.resources.animated_backgrounds.pin(self.background_name)
+        return self.game.resources.load_animated_background(self.background_name, Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT)
+
+    def exit_state(self):
+        self.game.resources.animated_backgrounds.unpin(self.background_name)
+        # Los streams no se cachean, se liberan al salir del estado
+        if isinstance(self.background_frames, StreamingBackground):
+            self.background_frames.close()
+        # Sin referencias fuera de la caché: un desalojo libera la memoria de verdad. enter_state la vuelve a pedir
+        self.background_frames = []
+        self.invalidate()
 
     def handle_input(self, key_name):
         raise NotImplementedError
 
+    def is_animating(self):
+        # True mientras el estado necesite cuadros a ritmo de FPS (animación de fondo, temporizadores)
+        return not self.animation_finished and bool(self.background_frames) \
+            or isinstance(self.background_frames, LoadingFrames) and self.background_frames.loading
+
     def update(self):
-        if not self.animation_finished and self.background_frames:
-            current_time = pygame.time.get_ticks()
-            if current_time - self.last_frame_time > self.animation_speed_ms:
-                self.last_frame_time = current_time
-                if self.current_frame_index < len(self.background_frames) - 1:
-                    self.current_frame_index += 1
-                else:
-                    self.animation_finished = True
+        if self.animation_finished or not self.background_frames:
+            return
+        # El fotograma sale del tiempo transcurrido: un draw lento no estira la animación, se saltan fotogramas
+        now = self.game.now_ms()
+        target_index = int((now - self.animation_start_time) // self.animation_speed_ms)
+        last_index = len(self.background_frames) - 1
+        if isinstance(self.background_frames, StreamingBackground):
+            # En streaming se espera al decodificador en lugar de saltarse fotogramas que no están listos
+            while self.current_frame_index < min(target_index, last_index):
+                if not self.background_frames.is_ready(self.current_frame_index + 1):
+                    self.animation_start_time = now - self.current_frame_index * self.animation_speed_ms
+                    return
+                self.current_frame_index += 1
+        else:
+            self.current_frame_index = max(self.current_frame_index, min(target_index, last_index))
+        if target_index > last_index:
+            if isinstance(self.background_frames, LoadingFrames) and self.background_frames.loading:
+                # El prefetcher todavía está agregando fotogramas: la animación sigue desde el último que hay
+                self.animation_start_time = now - self.current_frame_index * self.animation_speed_ms
+            else:
+                self.animation_finished = True
+
+    def overlay(self):
+        # Textos que el estado dibuja sobre el fondo, como lista de OverlayText
+        return []
 
     def draw(self, screen):
-        if self.background_frames and self.current_frame_index < len(self.background_frames):
-            screen.blit(self.background_frames[self.current_frame_index], (0, 0))
+        """
+        Dibuja el estado y devuelve las regiones a presentar: None para toda la pantalla,
+        una lista de Rect para actualizar solo esas regiones, o una lista vacía si nada cambió.
+        """
+        frame = None
+        background_dirty = []  # Regiones del fondo que cambiaron desde el último draw; None = todo
+        if isinstance(self.background_frames, DeltaAnimation):
+            background_dirty = self.background_frames.seek(self.current_frame_index)
+            frame = self.background_frames.surface
+        elif self.background_frames and self.current_frame_index < len(self.background_frames):
+            frame = self.background_frames[self.current_frame_index]
+        if frame is None or frame is not self._drawn_frame:
+            background_dirty = None
+        items = self.overlay() + self.game.memory_overlay_items()
+        if Config.DIRTY_RECT_RENDERING and background_dirty == [] \
+                and items == [item for item, _ in self._drawn_overlay]:
+            return []
+        rendered = [DrawingUtils.render_text(*item) for item in items]
+
+        if not Config.DIRTY_RECT_RENDERING or background_dirty is None:
+            self._draw_background(screen, frame)
+            for text_surface, text_rect in rendered:
+                screen.blit(text_surface, text_rect)
+            self._remember_drawn(frame, items, rendered)
+            return None
+
+        # Mismo fondo: solo se repintan las regiones del fondo que cambiaron y los textos
+        # que cambiaron (su posición anterior y la nueva)
+        dirty = list(background_dirty)
+        previous = self._drawn_overlay
+        for i in range(max(len(items), len(previous))):
+            old_item, old_rect = previous[i] if i < len(previous) else (None, None)
+            new_item, new_rect = (items[i], rendered[i][1]) if i < len(items) else (None, None)
+            if old_item != new_item:
+                dirty.extend(r for r in (old_rect, new_rect) if r is not None)
+        for rect in dirty:
+            screen.set_clip(rect)
+            screen.blit(frame, rect, rect)
+            for text_surface, text_rect in rendered:
+                if text_rect.colliderect(rect):
+                    screen.blit(text_surface, text_rect)
+        screen.set_clip(None)
+        self._remember_drawn(frame, items, rendered)
+        return dirty
+
+    def _draw_background(self, screen, frame):
+        if frame is not None:
+            screen.blit(frame, (0, 0))
         else:
             screen.fill(Config.BLACK) # Fallback si no hay frames
 
+    def _remember_drawn(self, frame, items, rendered):
+        self._drawn_frame = frame
+        self._drawn_overlay = [(item, text_rect) for item, (_, text_rect) in zip(items, rendered)]
+
 class MenuState(GameState):
+    background_name = 'state_inicio'
+
     def __init__(self, game):
         super().__init__(game)
         self.selection_index = 0
-        self.options = ["Seleccionar jugadores", "Seleccionar puntaje", "Jugar"]
+        self.options = ["Seleccionar jugadores", "Seleccionar puntaje", "Jugar", "Récords"]
 
     def enter_state(self):
         super().enter_state()
-        self.background_frames = self.game.resources.load_animated_background('state_inicio', Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT)
+        self.background_frames = self._load_background()
         self.current_frame_index = 0
-        self.last_frame_time = pygame.time.get_ticks()
+        self.animation_start_time = self.game.now_ms()
         self.animation_finished = False
         # Solo reproducir la música de fondo si ya está cargada
         if self.game.game_music_loaded:
@@ -238,12 +1447,12 @@ class MenuState(GameState):
     def handle_input(self, key_name):
         if key_name == "UP":
             self.selection_index = (self.selection_index - 1 + len(self.options)) % len(self.options)
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
         elif key_name == "DOWN":
             self.selection_index = (self.selection_index + 1) % len(self.options)
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
         elif key_name == "ENTER":
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
             if self.selection_index == 0:
                 self.game.set_state(Config.STATE_SELECT_PLAYERS)
             elif self.selection_index == 1:
@@ -251,26 +1460,29 @@ class MenuState(GameState):
             elif self.selection_index == 2:
                 self.game.reset_game()
                 self.game.set_state(Config.STATE_GAMEPLAY)
+            elif self.selection_index == 3:
+                self.game.set_state(Config.STATE_HIGH_SCORES)
 
-    def draw(self, screen):
-        super().draw(screen)
-
-        y_start = Config.SCREEN_HEIGHT // 2 - 50
+    def overlay(self):
+        items = []
+        y_start = Config.SCREEN_HEIGHT // 2 - Config.scaled(50)
         for i, option in enumerate(self.options):
             color = Config.GREEN if self.selection_index == i else Config.WHITE
-            DrawingUtils.draw_text(screen, option, self.game.resources.fonts['medium'], color, Config.SCREEN_WIDTH // 2, y_start + i * 60)
-        pygame.display.flip()
+            items.append(OverlayText(option, self.game.resources.fonts['medium'], color, Config.SCREEN_WIDTH // 2, y_start + i * Config.scaled(60)))
+        return items
 
 class SelectPlayersState(GameState):
+    background_name = 'state_jugadores'
+
     def __init__(self, game):
         super().__init__(game)
         self.current_idx = Config.NUM_JUGADORES_OPTIONS.index(self.game.num_players_selected)
 
     def enter_state(self):
         super().enter_state()
-        self.background_frames = self.game.resources.load_animated_background('state_jugadores', Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT)
+        self.background_frames = self._load_background()
         self.current_frame_index = 0
-        self.last_frame_time = pygame.time.get_ticks()
+        self.animation_start_time = self.game.now_ms()
         self.animation_finished = False
 
 
@@ -278,61 +1490,63 @@ class SelectPlayersState(GameState):
         if key_name == "UP":
             self.current_idx = (self.current_idx - 1 + len(Config.NUM_JUGADORES_OPTIONS)) % len(Config.NUM_JUGADORES_OPTIONS)
             self.game.num_players_selected = Config.NUM_JUGADORES_OPTIONS[self.current_idx]
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
         elif key_name == "DOWN":
             self.current_idx = (self.current_idx + 1) % len(Config.NUM_JUGADORES_OPTIONS)
             self.game.num_players_selected = Config.NUM_JUGADORES_OPTIONS[self.current_idx]
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
         elif key_name == "ENTER":
             print(f"Config: {self.game.num_players_selected} jugadores seleccionados.")
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
             self.game.set_state(Config.STATE_MENU)
 
-    def draw(self, screen):
-        super().draw(screen)
-
+    def overlay(self):
+        items = []
         y_start = Config.SCREEN_HEIGHT // 3
         for i, num_jug in enumerate(Config.NUM_JUGADORES_OPTIONS):
             color = Config.GREEN if num_jug == self.game.num_players_selected else Config.WHITE
-            DrawingUtils.draw_text(screen, f"{num_jug} Jugadores", self.game.resources.fonts['medium'], color, Config.SCREEN_WIDTH // 2, y_start + i * 50)
-        pygame.display.flip()
+            items.append(OverlayText(f"{num_jug} Jugadores", self.game.resources.fonts['medium'], color, Config.SCREEN_WIDTH // 2, y_start + i * Config.scaled(50)))
+        return items
 
 class SelectScoreState(GameState):
+    background_name = 'state_puntos'
+
     def __init__(self, game):
         super().__init__(game)
         self.current_idx = Config.PUNTAJE_OBJETIVO_OPTIONS.index(self.game.game_target_score)
 
     def enter_state(self):
         super().enter_state()
-        self.background_frames = self.game.resources.load_animated_background('state_puntos', Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT)
+        self.background_frames = self._load_background()
         self.current_frame_index = 0
-        self.last_frame_time = pygame.time.get_ticks()
+        self.animation_start_time = self.game.now_ms()
         self.animation_finished = False
 
     def handle_input(self, key_name):
         if key_name == "UP":
             self.current_idx = (self.current_idx - 1 + len(Config.PUNTAJE_OBJETIVO_OPTIONS)) % len(Config.PUNTAJE_OBJETIVO_OPTIONS)
             self.game.game_target_score = Config.PUNTAJE_OBJETIVO_OPTIONS[self.current_idx]
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
         elif key_name == "DOWN":
             self.current_idx = (self.current_idx + 1) % len(Config.PUNTAJE_OBJETIVO_OPTIONS)
             self.game.game_target_score = Config.PUNTAJE_OBJETIVO_OPTIONS[self.current_idx]
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
         elif key_name == "ENTER":
             print(f"Config: {self.game.game_target_score} puntos objetivo seleccionados.")
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
             self.game.set_state(Config.STATE_MENU)
 
-    def draw(self, screen):
-        super().draw(screen)
-
+    def overlay(self):
+        items = []
         y_start = Config.SCREEN_HEIGHT // 4 #3
         for i, score_opt in enumerate(Config.PUNTAJE_OBJETIVO_OPTIONS):
             color = Config.GREEN if score_opt == self.game.game_target_score else Config.WHITE
-            DrawingUtils.draw_text(screen, f"{score_opt} Puntos", self.game.resources.fonts['medium'], color, Config.SCREEN_WIDTH // 2, y_start + i * 50)
-        pygame.display.flip()
+            items.append(OverlayText(f"{score_opt} Puntos", self.game.resources.fonts['medium'], color, Config.SCREEN_WIDTH // 2, y_start + i * Config.scaled(50)))
+        return items
 
 class GameplayState(GameState):
+    background_name = 'state_play'
+
     def __init__(self, game):
         super().__init__(game)
         self.display_score_feedback = False
@@ -342,9 +1556,9 @@ class GameplayState(GameState):
 
     def enter_state(self):
         super().enter_state()
-        self.background_frames = self.game.resources.load_animated_background('state_play', Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT)
+        self.background_frames = self._load_background()
         self.current_frame_index = 0
-        self.last_frame_time = pygame.time.get_ticks()
+        self.animation_start_time = self.game.now_ms()
         self.animation_finished = False
         self.display_score_feedback = False
         # Solo reproducir la música de fondo si ya está cargada
@@ -353,82 +1567,99 @@ class GameplayState(GameState):
 
 
     def handle_input(self, key_name):
-        current_player = self.game.players[self.game.current_player_index]
+        match = self.game.match
 
         if key_name == "TAB":
-            self._check_for_winner(current_player)
-            if self.game.current_game_state == Config.STATE_GAMEPLAY:
-                self.game.current_player_index = (self.game.current_player_index + 1) % len(self.game.players)
-                print(f"Juego: Turno de: {self.game.players[self.game.current_player_index]['name']}")
+            flags = match.next_turn()
+            self.game.match_event(rules.EVENT_NEXT_TURN)
+            self._apply_outcome(flags)
+            if flags & rules.TURN_CHANGED:
+                print(f"Juego: Turno de: {match.current_player.name}")
             self.display_score_feedback = False
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
         elif key_name == "ENTER":
             self.game.set_state(Config.STATE_PAUSE)
+            self.game.match_event(rules.EVENT_PAUSE)
             self.game.pause_menu_selection_index = 0
             pygame.mixer.music.pause() # Pausar la música al entrar en pausa
             print("Juego: Pausado.")
             self.display_score_feedback = False
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
         elif key_name in Config.SCORE_MAPPING:
-            score_value = Config.SCORE_MAPPING[key_name]
-            if not current_player['has_won']:
-                current_player['score'] += score_value
-                print(f"Juego: {current_player['name']} obtuvo {score_value} puntos. Total: {current_player['score']}")
-                if self.game.resources.sounds['points']: self.game.resources.sounds['points'].play()
-
-                self.score_feedback_value = score_value
-                self.score_feedback_start_time = pygame.time.get_ticks()
-                self.display_score_feedback = True
-
-                self._check_for_winner(current_player)
-
-    def _check_for_winner(self, player):
-        if not player['has_won'] and player['score'] >= self.game.game_target_score:
-            player['has_won'] = True
-            self.game.winners.append(player)
-            print(f"¡{player['name']} alcanzó el objetivo! Es el puesto #{len(self.game.winners)}")
-
-            if (len(self.game.winners) >= 2 and self.game.num_players_selected > 2) or all(p['has_won'] for p in self.game.players):
-                pygame.mixer.music.stop() # Detener la música de fondo al final del juego
-                self.game.set_state(Config.STATE_GAME_OVER)
-                if self.game.resources.sounds['fanfare']:
-                    self.game.resources.sounds['fanfare'].play()
-                print("Juego: Fin de partida alcanzado.")
-            elif self.game.resources.sounds['game_over']:
-                if not pygame.mixer.get_busy() or self.game.resources.sounds['game_over'].get_num_channels() == 0:
-                    self.game.resources.sounds['game_over'].play()
+            self.handle_hits([key_name])
+
+    def handle_hits(self, sensor_keys):
+        # Todos los golpes de un cuadro: una revisión de ganador, un sonido y un aviso con la suma
+        match = self.game.match
+        current_player = match.current_player
+        flags, points = match.hit_many(sensor_keys)
+        for key_name in sensor_keys:
+            self.game.match_event(rules.EVENT_HIT, key_name)
+        if flags & rules.SCORED:
+            if len(sensor_keys) == 1:
+                print(f"Juego: {current_player.name} obtuvo {points} puntos. Total: {current_player.score}")
+            else:
+                print(f"Juego: {current_player.name} obtuvo {points} puntos en {len(sensor_keys)} golpes "
+                      f"({', '.join(sensor_keys)}). Total: {current_player.score}")
+            self.game.audio.play('points')
+
+            self.score_feedback_value = points
+            self.score_feedback_start_time = self.game.now_ms()
+            self.display_score_feedback = True
+
+            self._apply_outcome(flags)
+
+    def _apply_outcome(self, flags):
+        # Las reglas ya decidieron; aquí solo van los sonidos, mensajes y el cambio de pantalla
+        if flags & rules.WINNER:
+            winner = self.game.winners[-1]
+            self.game.match_event(rules.EVENT_WINNER, self.game.players.index(winner))
+            print(f"¡{winner.name} alcanzó el objetivo! Es el puesto #{len(self.game.winners)}")
+
+        if flags & rules.GAME_OVER:
+            self.game.match_event(rules.EVENT_END)
+            pygame.mixer.music.stop() # Detener la música de fondo al final del juego
+            self.game.set_state(Config.STATE_GAME_OVER)
+            self.game.audio.play_once('fanfare')
+            print("Juego: Fin de partida alcanzado.")
+        elif flags & rules.WINNER:
+            self.game.audio.play_once('game_over')
+
+    def is_animating(self):
+        return self.display_score_feedback or super().is_animating()
 
     def update(self):
         super().update()
 
         if self.display_score_feedback:
-            if pygame.time.get_ticks() - self.score_feedback_start_time > self.score_feedback_duration_ms:
+            if self.game.now_ms() - self.score_feedback_start_time > self.score_feedback_duration_ms:
                 self.display_score_feedback = False
 
-    def draw(self, screen):
-        super().draw(screen)
-
+    def overlay(self):
+        items = []
         current_player = self.game.players[self.game.current_player_index]
 
-        DrawingUtils.draw_text(screen, f"Turno del  {current_player['name']}", self.game.resources.fonts['medium'], Config.YELLOW, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT // 4)
-        DrawingUtils.draw_text(screen, f"Puntaje  {current_player['score']}", self.game.resources.fonts['medium'], Config.WHITE, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT // 2 - 50)
+        items.append(OverlayText(f"Turno del  {current_player.name}", self.game.resources.fonts['medium'], Config.YELLOW, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT // 4))
+        items.append(OverlayText(f"Puntaje  {current_player.score}", self.game.resources.fonts['medium'], Config.WHITE, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT // 2 - Config.scaled(50)))
 
-        if self.display_score_feedback:
-            feedback_text = f"* {self.score_feedback_value} *"
-            DrawingUtils.draw_text(screen, feedback_text, self.game.resources.fonts['large'], Config.GREEN, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT // 2 + 50)
-
-        y_offset_start = Config.SCREEN_HEIGHT - 100
-        total_width_for_players = Config.SCREEN_WIDTH - 200
+        y_offset_start = Config.SCREEN_HEIGHT - Config.scaled(100)
+        total_width_for_players = Config.SCREEN_WIDTH - Config.scaled(200)
         player_spacing = total_width_for_players // len(self.game.players) if len(self.game.players) > 0 else 0
-        start_x = 100
+        start_x = Config.scaled(100)
 
         for i, player in enumerate(self.game.players):
             color = Config.YELLOW if i == self.game.current_player_index else Config.WHITE
-            DrawingUtils.draw_text(screen, f"{player['name']}  {player['score']}", self.game.resources.fonts['small'], color, start_x + player_spacing * i, y_offset_start, center=False)
+            items.append(OverlayText(f"{player.name}  {player.score}", self.game.resources.fonts['small'], color, start_x + player_spacing * i, y_offset_start, center=False))
 
-        pygame.display.flip()
+        # El feedback va al final para que aparecer/desaparecer no desplace a los demás textos en la comparación
+        if self.display_score_feedback:
+            feedback_text = f"* {self.score_feedback_value} *"
+            items.append(OverlayText(feedback_text, self.game.resources.fonts['large'], Config.GREEN, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT // 2 + Config.scaled(50)))
+        return items
 
 class PauseState(GameState):
+    background_name = 'state_pause'
+
     def __init__(self, game):
         super().__init__(game)
         self.selection_index = 0
@@ -436,54 +1667,57 @@ class PauseState(GameState):
 
     def enter_state(self):
         super().enter_state()
-        self.background_frames = self.game.resources.load_animated_background('state_pause', Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT)
+        self.background_frames = self._load_background()
         self.current_frame_index = 0
-        self.last_frame_time = pygame.time.get_ticks()
+        self.animation_start_time = self.game.now_ms()
         self.animation_finished = True
 
     def handle_input(self, key_name):
         if key_name == "UP":
             self.selection_index = (self.selection_index - 1 + len(self.options)) % len(self.options)
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
         elif key_name == "DOWN":
             self.selection_index = (self.selection_index + 1) % len(self.options)
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
         elif key_name == "ENTER":
-            if self.game.resources.get_sound('button'): self.game.resources.get_sound('button').play()
+            self.game.audio.play('button')
             if self.selection_index == 0:
                 self.game.set_state(Config.STATE_GAMEPLAY)
+                self.game.match_event(rules.EVENT_RESUME)
                 pygame.mixer.music.unpause() # Reanudar la música al continuar
                 print("Juego: Reanudado.")
             elif self.selection_index == 1:
+                self.game.match_event(rules.EVENT_END)
                 self.game.set_state(Config.STATE_MENU)
                 self.game.reset_game_state_variables()
                 pygame.mixer.music.stop() # Detener la música al salir de la partida ||| revisar que pasa si se comenta esta linea
                 print("Juego: Saliendo de la partida.")
 
-    def draw(self, screen):
-        super().draw(screen)
-
-        y_start = Config.SCREEN_HEIGHT // 2 + 80
+    def overlay(self):
+        items = []
+        y_start = Config.SCREEN_HEIGHT // 2 + Config.scaled(80)
         for i, option in enumerate(self.options):
             color = Config.GREEN if self.selection_index == i else Config.WHITE
-            DrawingUtils.draw_text(screen, option, self.game.resources.fonts['medium'], color, Config.SCREEN_WIDTH // 2, y_start + i * 60)
-        pygame.display.flip()
+            items.append(OverlayText(option, self.game.resources.fonts['medium'], color, Config.SCREEN_WIDTH // 2, y_start + i * Config.scaled(60)))
+        return items
 
 class GameOverState(GameState):
+    background_name = 'state_win'
+
     def __init__(self, game):
         super().__init__(game)
 
     def enter_state(self):
         super().enter_state()
-        self.background_frames = self.game.resources.load_animated_background('state_win', Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT)
+        self.background_frames = self._load_background()
         self.current_frame_index = 0
-        self.last_frame_time = pygame.time.get_ticks()
+        self.animation_start_time = self.game.now_ms()
         self.animation_finished = False
 
-        if len(self.game.winners) > 0 and 'fanfare' in self.game.resources.sounds and self.game.resources.sounds['fanfare'] and not pygame.mixer.get_busy():
-            self.game.resources.sounds['fanfare'].play()
-        elif len(self.game.winners) == 0 and 'game_over' in self.game.resources.sounds and self.game.resources.sounds['game_over'] and not pygame.mixer.get_busy():
-            self.game.resources.sounds['game_over'].play()
+        if len(self.game.winners) > 0:
+            self.game.audio.play_once('fanfare')
+        else:
+            self.game.audio.play_once('game_over')
 
     def handle_input(self, key_name):
         if key_name == "ENTER":
@@ -495,50 +1729,174 @@ class GameOverState(GameState):
     def update(self):
         super().update()
 
-    def draw(self, screen):
-        super().draw(screen)
-
+    def overlay(self):
+        items = []
         if len(self.game.winners) > 0:
-            y_offset = Config.SCREEN_HEIGHT // 2 + 60
-            DrawingUtils.draw_text(screen, "GANADORES ", self.game.resources.fonts['large'], Config.GREEN, Config.SCREEN_WIDTH // 2, y_offset)
-            y_offset += 50
+            y_offset = Config.SCREEN_HEIGHT // 2 + Config.scaled(60)
+            items.append(OverlayText("GANADORES ", self.game.resources.fonts['large'], Config.GREEN, Config.SCREEN_WIDTH // 2, y_offset))
+            y_offset += Config.scaled(50)
 
             if len(self.game.winners) > 0:
-                DrawingUtils.draw_text(screen, f"1er Puesto: {self.game.winners[0]['name']}     {self.game.winners[0]['score']} puntos", self.game.resources.fonts['medium'], Config.YELLOW, Config.SCREEN_WIDTH // 2, y_offset)
-                y_offset += 40
+                items.append(OverlayText(f"1er Puesto: {self.game.winners[0].name}     {self.game.winners[0].score} puntos", self.game.resources.fonts['medium'], Config.YELLOW, Config.SCREEN_WIDTH // 2, y_offset))
+                y_offset += Config.scaled(40)
 
             if len(self.game.winners) > 1 and self.game.num_players_selected > 2:
-                DrawingUtils.draw_text(screen, f"2do Puesto: {self.game.winners[1]['name']}     {self.game.winners[1]['score']} puntos", self.game.resources.fonts['medium'], Config.WHITE, Config.SCREEN_WIDTH // 2, y_offset)
+                items.append(OverlayText(f"2do Puesto: {self.game.winners[1].name}     {self.game.winners[1].score} puntos", self.game.resources.fonts['medium'], Config.WHITE, Config.SCREEN_WIDTH // 2, y_offset))
 
-            y_offset += 60
-            DrawingUtils.draw_text(screen, "Presiona SELECT para Juego Nuevo", self.game.resources.fonts['small'], Config.YELLOW, Config.SCREEN_WIDTH // 2, y_offset)
+            y_offset += Config.scaled(60)
+            items.append(OverlayText("Presiona SELECT para Juego Nuevo", self.game.resources.fonts['small'], Config.YELLOW, Config.SCREEN_WIDTH // 2, y_offset))
         else:
-            DrawingUtils.draw_text(screen, "JUEGO TERMINADO", self.game.resources.fonts['large'], Config.WHITE, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT // 2)
-            DrawingUtils.draw_text(screen, "Presiona SELECT para Nuevo Juego", self.game.resources.fonts['small'], Config.YELLOW, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT * 3 // 4)
+            items.append(OverlayText("JUEGO TERMINADO", self.game.resources.fonts['large'], Config.WHITE, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT // 2))
+            items.append(OverlayText("Presiona SELECT para Nuevo Juego", self.game.resources.fonts['small'], Config.YELLOW, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT * 3 // 4))
+        return items
+
+class RestoreMatchState(GameState):
+    background_name = 'state_pause'
+
+    def __init__(self, game):
+        super().__init__(game)
+        self.selection_index = 0
+        self.options = ["Continuar partida", "Descartar"]
+
+    def enter_state(self):
+        super().enter_state()
+        self.background_frames = self._load_background()
+        self.current_frame_index = 0
+        self.animation_start_time = self.game.now_ms()
+        self.animation_finished = True
+        self.selection_index = 0
+
+    def handle_input(self, key_name):
+        if key_name in ("UP", "DOWN"):
+            self.selection_index = (self.selection_index + 1) % len(self.options)
+            self.game.audio.play('button')
+        elif key_name == "ENTER":
+            self.game.audio.play('button')
+            if self.selection_index == 0:
+                self.game.restore_match()
+            else:
+                self.game.discard_recovered_match()
+
+    def overlay(self):
+        match = self.game.recovered_match.match
+        items = [
+            OverlayText("Partida sin terminar", self.game.resources.fonts['large'], Config.YELLOW, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT // 4),
+            OverlayText(f"{len(match.players)} jugadores - Objetivo {match.target_score} - Turno del {match.current_player.name}",
+                        self.game.resources.fonts['small'], Config.WHITE, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT // 4 + Config.scaled(70)),
+        ]
+        y_start = Config.SCREEN_HEIGHT // 2 + Config.scaled(80)
+        for i, option in enumerate(self.options):
+            color = Config.GREEN if self.selection_index == i else Config.WHITE
+            items.append(OverlayText(option, self.game.resources.fonts['medium'], color, Config.SCREEN_WIDTH // 2, y_start + i * Config.scaled(60)))
+        return items
+
+class HighScoresState(GameState):
+    background_name = 'state_puntos'
 
-        pygame.display.flip()
+    def __init__(self, game):
+        super().__init__(game)
+        self.items = []
+
+    def enter_state(self):
+        super().enter_state()
+        self.background_frames = self._load_background()
+        self.current_frame_index = 0
+        self.animation_start_time = self.game.now_ms()
+        self.animation_finished = False
+        # El resumen ya viene calculado por el hilo del historial; aquí solo se arman los textos una vez
+        self.items = self._build_items()
+
+    def handle_input(self, key_name):
+        if key_name == "ENTER":
+            self.game.audio.play('button')
+            self.game.set_state(Config.STATE_MENU)
+
+    def _build_items(self):
+        fonts = self.game.resources.fonts
+        items = [OverlayText("RÉCORDS", fonts['large'], Config.GREEN, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT // 6)]
+        if self.game.history is None:
+            items.append(OverlayText("Historial desactivado", fonts['medium'], Config.WHITE, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT // 2))
+            return items
+        summary = self.game.history.summary
+        y = Config.SCREEN_HEIGHT // 6 + Config.scaled(90)
+        if not summary['top_scores']:
+            items.append(OverlayText("Todavía no hay partidas terminadas", fonts['medium'], Config.WHITE, Config.SCREEN_WIDTH // 2, y))
+        for position, (name, score, rank, ended_at) in enumerate(summary['top_scores'], 1):
+            color = Config.YELLOW if position == 1 else Config.WHITE
+            date = time.strftime('%d/%m/%Y', time.localtime(ended_at))
+            items.append(OverlayText(f"{position}.  {name}  {score} puntos  {date}", fonts['medium'], color, Config.SCREEN_WIDTH // 2, y))
+            y += Config.scaled(55)
+        minutes, seconds = divmod(int(summary['average_ms'] // 1000), 60)
+        stats_text = f"Partidas: {summary['matches']}   Duración media: {minutes}:{seconds:02d}"
+        if summary['hits_per_sensor']:
+            sensor_key, hits, _ = summary['hits_per_sensor'][0]
+            stats_text += f"   Sensor más golpeado: {sensor_key} ({hits})"
+        items.append(OverlayText(stats_text, fonts['small'], Config.WHITE, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT - Config.scaled(120)))
+        items.append(OverlayText("Presiona SELECT para volver", fonts['small'], Config.YELLOW, Config.SCREEN_WIDTH // 2, Config.SCREEN_HEIGHT - Config.scaled(70)))
+        return items
+
+    def overlay(self):
+        return self.items
 
 # --- Clase Principal del Juego ---
 class Game:
     def __init__(self):
+        self.startup = StartupTimer()
+        # pre_init antes de pygame.init(), que es quien abre el dispositivo de audio
+        pygame.mixer.pre_init(Config.AUDIO_FREQUENCY, Config.AUDIO_SIZE, Config.AUDIO_CHANNELS, Config.AUDIO_BUFFER)
         pygame.init()
+        self.startup.mark('pygame.init')
         pygame.mixer.init()
-        self.resources = ResourceManager()
-
-        self.screen = pygame.display.set_mode((Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT))
-        pygame.display.set_caption("Bolirrana")
-        pygame.display.set_icon(self.resources.get_icon())
+        self.startup.mark('mixer.init')
+        self.resources = ResourceManager(deferred=Config.FAST_STARTUP)
+        self.audio = self.resources.audio
+        if pygame.mixer.get_init() is not None:
+            self.audio.configure_channels()
+        self.startup.mark('recursos')
+
+        self.window = None
+        self.canvas = self._create_canvas() if Config.RENDER_BACKEND == 'renderer' else None
+        if self.canvas is not None:
+            # La textura destino se escala a la ventana en la GPU, con cualquier perfil de render
+            self.display = None
+            self.screen = self.canvas
+        else:
+            self.display = pygame.display.set_mode((Config.DISPLAY_WIDTH, Config.DISPLAY_HEIGHT))
+            # Con un perfil de menor resolución se compone en una superficie aparte y se escala al presentar
+            if (Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT) == (Config.DISPLAY_WIDTH, Config.DISPLAY_HEIGHT):
+                self.screen = self.display
+            else:
+                self.screen = pygame.Surface((Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT)).convert()
+                print(f"Perfil de render {Config.RENDER_PROFILE}: {Config.SCREEN_WIDTH}x{Config.SCREEN_HEIGHT} -> {Config.DISPLAY_WIDTH}x{Config.DISPLAY_HEIGHT}")
+            pygame.display.set_caption("Bolirrana")
+        self._set_icon(self.resources.get_icon())
         
         self.clock = pygame.time.Clock()
+        self.scheduler = FrameScheduler(Config.FPS, Config.UPDATE_HZ, Config.MAX_UPDATES_PER_FRAME) if Config.FIXED_TIMESTEP else None
         pygame.mouse.set_visible(False) # Oculta el cursor del ratón
 
         self.current_game_state = Config.STATE_MENU
-        self.players = []
-        self.current_player_index = 0
+        self.match = None # Reglas de la partida en curso (rules.Match), se crea en reset_game
+        self.match_observers = [] # Reciben cada evento de la partida en el hilo principal: on_match_event(tipo, arg, match)
         self.game_target_score = Config.PUNTAJE_OBJETIVO_OPTIONS[0]
         self.num_players_selected = Config.NUM_JUGADORES_OPTIONS[0]
-        self.winners = []
         self.s_key_pressed_time = 0
+        self.keyboard_input = True
+        self.evdev_input = None
+        self._start_input_backend()
+        self.latency = LatencyTracer() if Config.LATENCY_TRACING else None
+        self.hit_batch = SensorHitBatch(Config.SENSOR_DEBOUNCE_MS)
+        self.memory = MemoryAccounting(Config.MEMORY_SNAPSHOTS) if Config.MEMORY_ACCOUNTING else None
+        self.memory_overlay = False
+        self._memory_overlay_items = []
+        self._memory_overlay_time = 0.0
+        self.profiler = FrameProfiler(Config.PROFILER_RING_FRAMES, Config.PROFILER_SPIKE_MS, Config.PROFILER_MAX_SPIKES) if Config.FRAME_PROFILER else None
+        self._idle_wait_s = 0.0
+        # SIGUSR1 pide volcar las estadísticas; el volcado se hace en el bucle principal
+        self.dump_requested = False
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self._request_dump)
+        self.startup.mark('ventana')
 
         #  Cargar la música de fondo UNA SOLA VEZ al inicio, porque cargarla en cada estado se estaba llevando la memoria---
         self.game_music_loaded = False
@@ -552,6 +1910,30 @@ class Game:
                 print(f"Error cargando música de fondo principal: {e}")
                 self.game_music_loaded = False
         # -------------------------------------------------------------------
+        self.startup.mark('música')
+
+        self.match_log = None
+        self.recovered_match = None
+        if Config.MATCH_LOG:
+            self._open_match_log()
+            self.startup.mark('registro')
+        self.history = None
+        if Config.MATCH_HISTORY:
+            self.history = MatchHistory(data_path(Config.MATCH_HISTORY_DB), Config.SCORE_MAPPING,
+                                        Config.MATCH_HISTORY_BATCH_MS, Config.HIGH_SCORES_SHOWN)
+            self.history.start(self.recovered_match.match if self.recovered_match is not None else None)
+            self.match_observers.append(self.history)
+        self.recorder = None
+        if Config.SESSION_RECORD:
+            self._open_session_recorder()
+        self.scoreboard = None
+        if Config.SCOREBOARD:
+            scoreboard = ScoreboardPublisher(Config.SCOREBOARD_ADDRESS, Config.SCORE_MAPPING,
+                                             Config.SCOREBOARD_CLIENT_BUFFER_KB * 1024)
+            if scoreboard.start():
+                self.scoreboard = scoreboard
+                self.match_observers.append(scoreboard)
+            self.startup.mark('marcador')
 
         self.states = {
             Config.STATE_MENU: MenuState(self),
@@ -560,73 +1942,455 @@ class Game:
             Config.STATE_GAMEPLAY: GameplayState(self),
             Config.STATE_PAUSE: PauseState(self),
             Config.STATE_GAME_OVER: GameOverState(self),
+            Config.STATE_RESTORE: RestoreMatchState(self),
+            Config.STATE_HIGH_SCORES: HighScoresState(self),
         }
+        if self.resources.prefetcher is not None:
+            self.resources.prefetcher.on_ready = self._background_ready
+        if self.recovered_match is not None:
+            self.current_game_state = Config.STATE_RESTORE
+        if not Config.FAST_STARTUP:
+            self.prewarm_text_cache()
+        self.startup.mark('estados')
         self.current_state_handler = self.states[self.current_game_state]
         self.current_state_handler.enter_state()
+        if Config.FAST_STARTUP:
+            self._wait_first_background_frame()
+        self.prefetch_next_states()
+        if self.scoreboard is not None:
+            self.scoreboard.on_state_changed(type(self.current_state_handler).__name__, self.match)
+        self.startup.mark('menú')
+
+    def _open_match_log(self):
+        self.match_log = MatchLog(data_path(Config.MATCH_LOG_DIR), Config.SCORE_MAPPING,
+                                  Config.MATCH_LOG_FSYNC_MS, Config.MATCH_LOG_SNAPSHOT_EVERY)
+        start = time.perf_counter()
+        try:
+            self.recovered_match = self.match_log.recover()
+        except (OSError, ValueError) as e:
+            print(f"Advertencia: No se pudo leer el registro de la partida. Error: {e}")
+        if self.recovered_match is not None:
+            match = self.recovered_match.match
+            print(f"Registro: partida sin terminar encontrada ({len(match.players)} jugadores, "
+                  f"puntajes {[p.score for p in match.players]}), leída en {(time.perf_counter() - start) * 1000:.1f} ms.")
+        self.match_log.start()
+        self.match_observers.append(self.match_log)
+
+    def _open_session_recorder(self):
+        key_names = sorted(set(Config.KEY_MAPPING.values()) | set(Config.EVDEV_KEY_MAPPING.values()))
+        try:
+            self.recorder = SessionRecorder(data_path(Config.SESSION_RECORD_DIR), key_names,
+                                            Config.SESSION_RECORD_FLUSH_MS, Config.SESSION_RECORD_KEEP)
+        except OSError as e:
+            print(f"Advertencia: No se pudo abrir la grabación de la sesión. Error: {e}")
+
+    def match_event(self, kind, arg=0):
+        for observer in self.match_observers:
+            observer.on_match_event(kind, arg, self.match)
+
+    def restore_match(self):
+        recovered, self.recovered_match = self.recovered_match, None
+        self.match = recovered.match
+        self.num_players_selected = len(self.match.players)
+        self.game_target_score = self.match.target_score
+        self.match_log.resume(recovered)
+        if recovered.paused:
+            self.match_event(rules.EVENT_RESUME)
+        self.set_state(Config.STATE_GAMEPLAY)
+        print(f"Juego: Partida restaurada. Turno de: {self.match.current_player.name}")
+
+    def discard_recovered_match(self):
+        self.recovered_match = None
+        self.match_event(rules.EVENT_END)
+        self.set_state(Config.STATE_MENU)
+        print("Juego: Partida sin terminar descartada.")
+
+    def _wait_first_background_frame(self):
+        # El menú se carga en el hilo de precarga; solo se espera su primer fotograma, no la animación completa
+        frames = self.current_state_handler.background_frames
+        while isinstance(frames, LoadingFrames) and frames.loading and not frames:
+            time.sleep(0.002)
+            self.resources.prefetcher.poll()
+
+    def _create_canvas(self):
+        if Renderer is None:
+            print("Advertencia: Esta versión de pygame no tiene pygame._sdl2.video. Se usará el backend 'surface'.")
+            return None
+        drivers = [info.name for info in get_render_drivers()]
+        driver = Config.RENDERER_DRIVER
+        if driver is not None and driver not in drivers:
+            print(f"Advertencia: SDL no tiene el driver de render '{driver}' (disponibles: {', '.join(drivers)}). Se usa el de por defecto.")
+            driver = None
+        window = Window("Bolirrana", size=(Config.DISPLAY_WIDTH, Config.DISPLAY_HEIGHT))
+        try:
+            renderer = Renderer(window, index=drivers.index(driver) if driver else -1,
+                                accelerated=0 if driver == 'software' else -1, vsync=Config.RENDERER_VSYNC)
+            canvas = RendererCanvas(renderer, (Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT), Config.TEXTURE_CACHE_MB * 2**20)
+        except pygame.error as e:
+            print(f"Advertencia: No se pudo crear el Renderer de SDL2. Se usará el backend 'surface'. Error: {e}")
+            window.destroy()
+            return None
+        self.window = window
+        print(f"Render por {driver or 'el driver de SDL por defecto'}: {Config.SCREEN_WIDTH}x{Config.SCREEN_HEIGHT} -> {Config.DISPLAY_WIDTH}x{Config.DISPLAY_HEIGHT}")
+        return canvas
+
+    def _set_icon(self, icon):
+        if icon is None:
+            return
+        if self.window is not None:
+            self.window.set_icon(icon)
+        else:
+            pygame.display.set_icon(icon)
+
+    def finish_startup(self):
+        """
+        Se llama después de presentar el primer cuadro: informa los tiempos del arranque y carga lo diferido.
+        """
+        self.startup.mark('primer cuadro')
+        self.startup.first_frame()
+        if Config.FAST_STARTUP:
+            self.resources.load_deferred()
+            self._set_icon(self.resources.get_icon())
+            self.prewarm_text_cache()
+            self.startup.mark('carga diferida')
+        if self.memory is not None:
+            self.memory.snapshot(self, 'arranque')
+        print(self.startup.report())
+        if self.startup.first_frame_ms > Config.STARTUP_TARGET_MS:
+            print(f"Advertencia: El primer cuadro tardó {self.startup.first_frame_ms:.0f} ms, más que el objetivo de {Config.STARTUP_TARGET_MS} ms.")
+        self.startup = None
 
     def set_state(self, new_state):
+        self.current_state_handler.exit_state()
         self.current_game_state = new_state
         self.current_state_handler = self.states[new_state]
         self.current_state_handler.enter_state()
+        self.prefetch_next_states()
+        if self.scoreboard is not None:
+            self.scoreboard.on_state_changed(type(self.current_state_handler).__name__, self.match)
+        if self.memory is not None:
+            self.memory.snapshot(self, type(self.current_state_handler).__name__)
         print(f"Cambio de estado a: {new_state}")
 
+    def _background_ready(self, frames, result):
+        for handler in self.states.values():
+            if handler.background_frames is frames:
+                handler.background_frames = result
+                handler.invalidate()
+
+    def prefetch_next_states(self):
+        if self.resources.prefetcher is not None:
+            next_backgrounds = [self.states[s].background_name for s in Config.STATE_TRANSITIONS.get(self.current_game_state, ())]
+            self.resources.prefetcher.schedule(next_backgrounds, Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT)
+
+    def prewarm_text_cache(self):
+        # Textos fijos de los menús, en los dos colores con los que se dibujan (seleccionado / normal)
+        text_cache = DrawingUtils.text_cache
+        colors = (Config.GREEN, Config.WHITE)
+        text_cache.prewarm(self.states[Config.STATE_MENU].options, self.resources.fonts['medium'], colors)
+        text_cache.prewarm(self.states[Config.STATE_PAUSE].options, self.resources.fonts['medium'], colors)
+        text_cache.prewarm([f"{num_jug} Jugadores" for num_jug in Config.NUM_JUGADORES_OPTIONS], self.resources.fonts['medium'], colors)
+        text_cache.prewarm([f"{score_opt} Puntos" for score_opt in Config.PUNTAJE_OBJETIVO_OPTIONS], self.resources.fonts['medium'], colors)
+        # Atlas de dígitos para los puntajes de la partida
+        for font_name in ('large', 'medium', 'small'):
+            for color in (Config.WHITE, Config.YELLOW, Config.GREEN):
+                text_cache.render(TextCache.DIGITS, self.resources.fonts[font_name], color)
+
+    def _start_input_backend(self):
+        if Config.INPUT_BACKEND not in ('evdev', 'both'):
+            return
+        if evdev is None:
+            print("Advertencia: INPUT_BACKEND requiere el paquete 'evdev'. Se usará solo el teclado.")
+            return
+        try:
+            evdev_input = EvdevInput(Config.EVDEV_DEVICE_NAME, Config.EVDEV_KEY_MAPPING, Config.EVENT_ARCADE_INPUT)
+            if evdev_input.device is None:
+                print(f"Advertencia: No se encontró el dispositivo '{Config.EVDEV_DEVICE_NAME}'. Se usará solo el teclado.")
+                return
+            evdev_input.start()
+        except OSError as e:
+            print(f"Advertencia: No se pudo iniciar la lectura por evdev. Se usará solo el teclado. Error: {e}")
+            return
+        self.evdev_input = evdev_input
+        self.keyboard_input = Config.INPUT_BACKEND == 'both'
+
+    def key_down(self, key_name, input_time=None, kernel_time=None):
+        dequeued_time = time.monotonic()
+        if input_time is None:
+            input_time = dequeued_time
+        sensor_hit = self.current_game_state == Config.STATE_GAMEPLAY and key_name in Config.SCORE_MAPPING
+        if self.recorder is not None and key_name and not sensor_hit:
+            self.recorder.record(True, key_name, self.current_game_state)
+        if key_name == "W_KEY" and self.s_key_pressed_time != 0:
+            # Combinación oculta: mantener S y presionar W vuelca las estadísticas
+            self.dump_requested = True
+        elif key_name == "W_KEY" and self.memory is not None:
+            self.memory_overlay = not self.memory_overlay
+            self._memory_overlay_time = 0.0
+        if key_name == "S_KEY":
+            if self.s_key_pressed_time == 0:
+                self.s_key_pressed_time = pygame.time.get_ticks()
+        else:
+            self.s_key_pressed_time = 0
+
+        if key_name:
+            if sensor_hit:
+                # Los golpes se juntan y se aplican al final de la vuelta de eventos (flush_hits). Un rebote descartado
+                # por la marca del kernel no se graba: replay.py no tiene esa marca y no podría repetir el descarte
+                if self.hit_batch.press(key_name, input_time, dequeued_time, kernel_time) and self.recorder is not None:
+                    self.recorder.record(True, key_name, self.current_game_state)
+                return
+            # Un TAB o ENTER va después de los golpes que llegaron antes que él
+            self.flush_hits()
+            # Se asegura que el sonido de botón solo se reproduzca para los inputs de juego y navegación.
+            # No para las teclas 'S' o 'W' que tienen funciones especiales.
+            if key_name not in ["S_KEY", "W_KEY"]:
+                self.audio.play('button')
+            state_name = type(self.current_state_handler).__name__
+            self.current_state_handler.handle_input(key_name)
+            if self.latency is not None:
+                self.latency.input_applied(state_name, input_time, dequeued_time)
+
+    def key_up(self, key_name):
+        if self.recorder is not None and key_name:
+            self.recorder.record(False, key_name, self.current_game_state)
+        if key_name == "S_KEY":
+            self.s_key_pressed_time = 0
+        elif key_name in Config.SCORE_MAPPING:
+            self.hit_batch.release(key_name)
+
+    def flush_hits(self):
+        hits = self.hit_batch.take()
+        if not hits:
+            return
+        if self.current_game_state != Config.STATE_GAMEPLAY:
+            return  # Defensivo: la partida ya no está en juego
+        start = time.perf_counter()
+        self.audio.play('button')
+        self.current_state_handler.handle_hits([key for key, _, _ in hits])
+        self.hit_batch.record_apply(time.perf_counter() - start)
+        if self.latency is not None:
+            for _, input_time, dequeued_time in hits:
+                self.latency.input_applied("GameplayState:puntaje", input_time, dequeued_time)
+
+    def now_ms(self):
+        # Reloj de las animaciones y temporizadores de los estados
+        if self.scheduler is not None:
+            return self.scheduler.time_ms
+        return pygame.time.get_ticks()
+
+    def is_idle(self):
+        # La tecla S mantenida también cuenta como actividad: su temporizador de 3 s se revisa cada cuadro
+        return self.s_key_pressed_time == 0 and not self.current_state_handler.is_animating()
+
+    def wait_for_events(self):
+        self._idle_wait_s = 0.0
+        if Config.IDLE_EVENT_WAIT and self.is_idle():
+            # Sin nada que animar se duerme hasta el próximo evento; el timeout mantiene vivo el prefetch
+            wait_start = time.perf_counter()
+            event = pygame.event.wait(Config.IDLE_WAIT_TIMEOUT_MS)
+            self._idle_wait_s = time.perf_counter() - wait_start
+            if event.type == pygame.NOEVENT:
+                return []
+            return [event] + pygame.event.get()
+        return pygame.event.get()
+
+    def present(self, dirty_rects):
+        # None = pantalla completa; lista vacía = nada cambió, no se presenta
+        if dirty_rects is not None and not dirty_rects:
+            if self.latency is not None:
+                self.latency.nothing_drawn()
+            return
+        if self.canvas is not None:
+            # El Renderer presenta la ventana completa; componerla es trabajo de la GPU
+            self.canvas.present()
+        else:
+            if self.screen is not self.display:
+                # Un solo escalado por presentación, y solo cuando hubo cambios
+                pygame.transform.scale(self.screen, self.display.get_size(), self.display)
+                if dirty_rects is not None:
+                    dirty_rects = [self._to_display_rect(rect) for rect in dirty_rects]
+            if dirty_rects is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(dirty_rects)
+        if self.latency is not None:
+            self.latency.presented()
+
+    def memory_overlay_items(self):
+        """
+        Textos del overlay de memoria (tecla W), que los estados agregan a los suyos. Se recalcula cada
+        Config.MEMORY_OVERLAY_REFRESH_MS para no ensuciar la caché de textos con un número nuevo por cuadro.
+        """
+        if not self.memory_overlay:
+            return []
+        now = time.monotonic()
+        if now - self._memory_overlay_time >= Config.MEMORY_OVERLAY_REFRESH_MS / 1000:
+            self._memory_overlay_time = now
+            sample, backgrounds = self.memory.measure(self)
+            mb = 2**20
+            lines = [f"RSS {sample['rss'] / mb:.0f} MB  (pico {self.memory.peak_rss / mb:.0f} MB)",
+                     f"Fondos {sample['fondos'] / mb:.0f} MB" + "".join(f", {name.replace('state_', '')} {nbytes / mb:.0f}" for name, nbytes in backgrounds.items()),
+                     f"Mapeados {sample['mapeados'] / mb:.0f} MB (paquetes en disco, fuera del RSS hasta que se tocan)",
+                     f"Sonidos {sample['sonidos'] / mb:.1f}  Fuentes {sample['fuentes'] / mb:.1f}  Textos {sample['textos'] / mb:.1f}  Texturas {sample['texturas'] / mb:.0f} MB"]
+            font = self.resources.fonts['small']
+            x, y = Config.scaled(20), Config.scaled(10)
+            self._memory_overlay_items = [OverlayText(line, font, Config.WHITE, x, y + i * font.get_linesize(), center=False)
+                                          for i, line in enumerate(lines)]
+        return self._memory_overlay_items
+
+    def _request_dump(self, signum, frame):
+        self.dump_requested = True
+
+    def dump_diagnostics(self):
+        print(self.hit_batch.report())
+        if self.scheduler is not None:
+            print(self.scheduler.report())
+        if self.latency is not None:
+            print(self.latency.report())
+        if self.profiler is not None:
+            print(self.profiler.report())
+        if self.memory is not None:
+            print(self.memory.report())
+
+    def _to_display_rect(self, rect):
+        scale = 1 / Config.RENDER_SCALE
+        return pygame.Rect(int(rect.x * scale), int(rect.y * scale), int(rect.w * scale) + 2, int(rect.h * scale) + 2)
+
+    @property
+    def players(self):
+        return self.match.players if self.match else []
+
+    @property
+    def current_player_index(self):
+        return self.match.current_index if self.match else 0
+
+    @property
+    def winners(self):
+        return self.match.winners if self.match else []
+
     def reset_game_state_variables(self):
-        self.players = []
-        self.current_player_index = 0
-        self.winners = []
+        self.match = None
         print("Variables de estado de la partida reiniciadas.")
 
     def reset_game(self):
         self.reset_game_state_variables()
-        for i in range(self.num_players_selected):
-            self.players.append({"name": f"Jugador {i+1}", "score": 0, "has_won": False})
+        self.match = Match(self.num_players_selected, self.game_target_score, Config.SCORE_MAPPING)
+        self.match_event(rules.EVENT_START)
 
         print(f"Juego reiniciado. {len(self.players)} jugadores. Objetivo: {self.game_target_score}")
 
     def run(self):
+        while self.run_frame():
+            pass
+        self.close()
+        sys.exit()
+
+    def run_frame(self, events=None):
+        """
+        Una vuelta del bucle principal. Devuelve False cuando el juego debe terminar. replay.py entrega los
+        eventos de una sesión grabada en `events` en lugar de leerlos de la cola de pygame.
+        """
         running = True
-        while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-
-                if event.type == pygame.KEYDOWN:
-                    key_name = None
-                    if event.key in Config.KEY_MAPPING:
-                        key_name = Config.KEY_MAPPING[event.key]
-
-                    if event.key == pygame.K_s:
-                        if self.s_key_pressed_time == 0:
-                            self.s_key_pressed_time = pygame.time.get_ticks()
-                    else:
-                        self.s_key_pressed_time = 0
-
-                    if key_name:
-                        # Se asegura que el sonido de botón solo se reproduzca para los inputs de juego y navegación.
-                        # No para las teclas 'S' o 'W' que tienen funciones especiales.
-                        if self.resources.get_sound('button') and key_name not in ["S_KEY", "W_KEY"]:
-                            self.resources.get_sound('button').play()
-                        self.current_state_handler.handle_input(key_name)
-
-                elif event.type == pygame.KEYUP:
-                    if event.key == pygame.K_s:
-                        self.s_key_pressed_time = 0
-
-            if self.s_key_pressed_time != 0 and pygame.time.get_ticks() - self.s_key_pressed_time > 3000:
-                print("Tecla 's' mantenida por 3 segundos. Saliendo del programa.")
+        frame_state = type(self.current_state_handler).__name__
+        t_start = time.perf_counter()
+        if events is None:
+            events = self.wait_for_events()
+        else:
+            self._idle_wait_s = 0.0
+        t_events = time.perf_counter()
+        for event in events:
+            if event.type == pygame.QUIT:
                 running = False
 
-            self.current_state_handler.update()
-            self.current_state_handler.draw(self.screen)
+            if event.type == pygame.KEYDOWN and self.keyboard_input:
+                # Sin marca del kernel, la entrada se fecha al salir de la cola
+                self.key_down(Config.KEY_MAPPING.get(event.key), time.monotonic())
+
+            elif event.type == pygame.KEYUP and self.keyboard_input:
+                self.key_up(Config.KEY_MAPPING.get(event.key))
 
+            elif event.type == Config.EVENT_ARCADE_INPUT:
+                if event.pressed:
+                    self.key_down(event.key, event.timestamp, event.kernel_timestamp)
+                else:
+                    self.key_up(event.key)
+        self.flush_hits()
+
+        if self.s_key_pressed_time != 0 and pygame.time.get_ticks() - self.s_key_pressed_time > 3000:
+            print("Tecla 's' mantenida por 3 segundos. Saliendo del programa.")
+            running = False
+
+        if self.dump_requested:
+            self.dump_requested = False
+            self.dump_diagnostics()
+
+        if self.resources.prefetcher is not None:
+            self.resources.prefetcher.poll()
+        t_input = time.perf_counter()
+        if self.scheduler is not None:
+            if self._idle_wait_s:
+                self.scheduler.resync()
+            for _ in range(self.scheduler.updates_due()):
+                self.scheduler.step()
+                self.current_state_handler.update()
+        else:
+            self.current_state_handler.update()
+        t_update = time.perf_counter()
+        dirty_rects = self.current_state_handler.draw(self.screen)
+        t_draw = time.perf_counter()
+        self.present(dirty_rects)
+        t_present = time.perf_counter()
+        if self.startup is not None:
+            self.finish_startup()
+
+        if self.scheduler is not None:
+            self.scheduler.end_frame()
+        else:
             self.clock.tick(Config.FPS)
 
+        if self.profiler is not None:
+            t_end = time.perf_counter()
+            self.profiler.record(frame_state, (t_events - t_start - self._idle_wait_s, t_input - t_events, t_update - t_input,
+                                               t_draw - t_update, t_present - t_draw, t_end - t_present + self._idle_wait_s))
+        return running
+
+    def close(self):
+        if self.evdev_input is not None:
+            self.evdev_input.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+            print(f"Sesión grabada: {self.recorder.stats()}")
+        if self.match_log is not None:
+            self.match_log.close()
+            print(f"Registro de partida: {self.match_log.stats()}")
+        if self.history is not None:
+            self.history.close()
+            print(f"Historial: {self.history.stats()}")
+        if self.scoreboard is not None:
+            print(f"Marcador: {self.scoreboard.stats()}")
+            self.scoreboard.stop()
+        self.dump_diagnostics()
+        print(f"Caché de fondos: {self.resources.animated_backgrounds.stats()}")
+        if self.canvas is not None:
+            print(f"Texturas: {self.canvas.stats()}")
+        if self.resources.prefetcher is not None:
+            print(f"Prefetch de fondos: {self.resources.prefetcher.stats()}")
+            self.resources.prefetcher.shutdown()
         print("Juego: Saliendo limpiamente...")
         pygame.quit()
-        sys.exit()
 
 # --- Funcion Principal ---
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bolirana arcade.")
+    parser.add_argument('--history', action='store_true', help="Guarda las partidas en el historial (Config.MATCH_HISTORY)")
+    parser.add_argument('--record-sessions', action='store_true', help="Graba las teclas para replay.py (Config.SESSION_RECORD)")
+    args = parser.parse_args()
+    Config.MATCH_HISTORY = Config.MATCH_HISTORY or args.history
+    Config.SESSION_RECORD = Config.SESSION_RECORD or args.record_sessions
+
     DrawingUtils = DrawingUtils()
     game = Game()
     game.run()
\ No newline at end of file
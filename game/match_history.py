@@ -0,0 +1,296 @@
+"""
+Historial persistente de partidas y estadísticas por sensor en SQLite.
+
+Game le pasa cada evento de la partida (on_match_event) y el hilo principal solo encola una tupla. Un hilo
+escritor con su propia conexión (modo WAL) aplica los eventos sobre un rules.Match propio, junta los
+golpes en lotes y los escribe en una sola transacción cada Config.MATCH_HISTORY_BATCH_MS. Al terminar
+cada partida recalcula un resumen (mejores puntajes, golpes por sensor, duración media) que la pantalla
+de récords lee directamente, sin tocar la base en el hilo de render.
+
+Una partida restaurada del registro (match_log.py) sigue en su fila abierta. Al arrancar, las filas que
+quedaron sin ended_at y sin partida para restaurar (caída sin registro, salida con S a mitad de partida) se
+cierran como abandonadas con los puntajes que suman sus golpes.
+
+Tablas:
+    matches(id, started_at, ended_at, duration_ms, num_players, target_score, finished)
+    player_results(match_id, player_index, name, score, rank, has_won)
+    hits(match_id, player_index, sensor_key, points, at_ms)
+    sensor_stats(sensor_key, hits, points)   -- agregado que se actualiza con cada lote
+
+Uso (desde la carpeta game/):
+    python match_history.py            # imprime el resumen de data/history.db
+    python match_history.py otra.db
+"""
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+import rules
+from rules import Match
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    duration_ms INTEGER,
+    num_players INTEGER NOT NULL,
+    target_score INTEGER NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS player_results (
+    match_id INTEGER NOT NULL REFERENCES matches(id),
+    player_index INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    rank INTEGER,
+    has_won INTEGER NOT NULL,
+    PRIMARY KEY (match_id, player_index)
+);
+CREATE TABLE IF NOT EXISTS hits (
+    match_id INTEGER NOT NULL REFERENCES matches(id),
+    player_index INTEGER NOT NULL,
+    sensor_key TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    at_ms INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sensor_stats (
+    sensor_key TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL,
+    points INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_score ON player_results(score DESC);
+CREATE INDEX IF NOT EXISTS idx_hits_match ON hits(match_id);
+CREATE INDEX IF NOT EXISTS idx_hits_sensor ON hits(sensor_key);
+CREATE INDEX IF NOT EXISTS idx_matches_finished ON matches(finished, duration_ms);
+"""
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Con WAL, NORMAL solo puede perder el último lote ante un corte de luz, nunca corromper la base
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# --- Consultas ---
+def top_scores(conn, limit=5):
+    # Mejores puntajes de partidas terminadas: (nombre, puntaje, puesto, fecha de fin)
+    return conn.execute(
+        "SELECT r.name, r.score, r.rank, m.ended_at FROM player_results r JOIN matches m ON m.id = r.match_id "
+        "WHERE m.finished = 1 ORDER BY r.score DESC LIMIT ?", (limit,)).fetchall()
+
+
+def hits_per_sensor(conn):
+    return conn.execute("SELECT sensor_key, hits, points FROM sensor_stats ORDER BY hits DESC").fetchall()
+
+
+def match_totals(conn):
+    # (partidas terminadas, duración media en ms)
+    count, average = conn.execute("SELECT COUNT(*), AVG(duration_ms) FROM matches WHERE finished = 1").fetchone()
+    return count, average or 0
+
+
+def summarize(conn, limit=5):
+    count, average_ms = match_totals(conn)
+    return {
+        'top_scores': top_scores(conn, limit),
+        'hits_per_sensor': hits_per_sensor(conn),
+        'matches': count,
+        'average_ms': average_ms,
+    }
+
+
+class MatchHistory:
+    """
+    Observador de Game que guarda las partidas. `summary` se reemplaza entero desde el hilo escritor, así el
+    hilo principal siempre lo lee completo.
+    """
+    EMPTY_SUMMARY = {'top_scores': [], 'hits_per_sensor': [], 'matches': 0, 'average_ms': 0}
+
+    def __init__(self, db_path, score_mapping, batch_ms=1000, summary_size=5):
+        self.db_path = db_path
+        self.score_mapping = score_mapping
+        self.batch_s = batch_ms / 1000
+        self.summary_size = summary_size
+        self.summary = self.EMPTY_SUMMARY
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        # Estado del hilo escritor
+        self._conn = None
+        self._restored = None
+        self._match = None
+        self._match_id = None
+        self._started = 0.0
+        self._pending_hits = []
+        self.batches = 0
+        self.rows = 0
+
+    def start(self, restored=None):
+        # restored: la partida que Game trae del registro; el hilo escritor sigue su propia copia
+        self._restored = restored.copy() if restored is not None else None
+        self._thread = threading.Thread(target=self._run, name="match-history", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {'batches': self.batches, 'rows': self.rows}
+
+    def on_match_event(self, kind, arg, match):
+        if kind == rules.EVENT_START:
+            arg = (len(match.players), match.target_score)
+        self._queue.put((kind, arg, time.time()))
+
+    def _run(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            self._conn = connect(self.db_path)
+            self._resume_open_matches(time.time())
+            self.summary = summarize(self._conn, self.summary_size)
+        except sqlite3.Error as e:
+            print(f"Advertencia: No se pudo abrir el historial '{self.db_path}'. Error: {e}")
+            return
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                self._apply(*item)
+                if deadline is None and self._pending_hits:
+                    deadline = time.monotonic() + self.batch_s
+                if not (deadline is not None and time.monotonic() >= deadline):
+                    continue
+            self._flush()
+            deadline = None
+        self._flush()
+        self._conn.close()
+
+    def _apply(self, kind, arg, when):
+        if kind == rules.EVENT_START:
+            self._flush()
+            num_players, target_score = arg
+            self._match = Match(num_players, target_score, self.score_mapping)
+            self._started = when
+            with self._conn:
+                self._match_id = self._conn.execute(
+                    "INSERT INTO matches (started_at, num_players, target_score) VALUES (?, ?, ?)",
+                    (when, num_players, target_score)).lastrowid
+            return
+        if self._match is None:
+            return
+        if kind == rules.EVENT_HIT:
+            # Se guarda cada golpe del sensor, también los que no suman (jugador que ya ganó)
+            player = self._match.current_player
+            before = player.score
+            self._match.hit(arg)
+            self._pending_hits.append((self._match_id, self._match.current_index, arg, player.score - before,
+                                       int((when - self._started) * 1000)))
+        elif kind == rules.EVENT_NEXT_TURN:
+            self._match.next_turn()
+        elif kind == rules.EVENT_END:
+            self._finish_match(when)
+
+    def _resume_open_matches(self, now):
+        open_rows = self._conn.execute(
+            "SELECT id, started_at, num_players, target_score FROM matches WHERE ended_at IS NULL ORDER BY id").fetchall()
+        restored, self._restored = self._restored, None
+        if restored is not None:
+            if open_rows and tuple(open_rows[-1][2:]) == (len(restored.players), restored.target_score):
+                self._match_id, self._started = open_rows.pop()[:2]
+            else:
+                self._started = now
+                with self._conn:
+                    self._match_id = self._conn.execute(
+                        "INSERT INTO matches (started_at, num_players, target_score) VALUES (?, ?, ?)",
+                        (now, len(restored.players), restored.target_score)).lastrowid
+            self._match = restored
+        for match_id, started_at, num_players, target_score in open_rows:
+            self._close_abandoned(match_id, started_at, num_players, target_score)
+
+    def _close_abandoned(self, match_id, started_at, num_players, target_score):
+        scores = [0] * num_players
+        last_ms = 0
+        for player_index, points, at_ms in self._conn.execute(
+                "SELECT player_index, points, at_ms FROM hits WHERE match_id = ?", (match_id,)):
+            if player_index < num_players:
+                scores[player_index] += points
+            last_ms = max(last_ms, at_ms)
+        with self._conn:
+            self._conn.execute("UPDATE matches SET ended_at = ?, duration_ms = ?, finished = 0 WHERE id = ?",
+                               (started_at + last_ms / 1000, last_ms, match_id))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO player_results (match_id, player_index, name, score, rank, has_won) "
+                "VALUES (?, ?, ?, ?, NULL, ?)",
+                [(match_id, i, f"Jugador {i + 1}", score, int(score >= target_score)) for i, score in enumerate(scores)])
+        self.rows += 1 + num_players
+
+    def _finish_match(self, when):
+        self._flush()
+        match = self._match
+        ranks = {id(player): rank for rank, player in enumerate(match.winners, 1)}
+        with self._conn:
+            self._conn.execute("UPDATE matches SET ended_at = ?, duration_ms = ?, finished = ? WHERE id = ?",
+                               (when, int((when - self._started) * 1000), int(match.finished), self._match_id))
+            self._conn.executemany(
+                "INSERT INTO player_results (match_id, player_index, name, score, rank, has_won) VALUES (?, ?, ?, ?, ?, ?)",
+                [(self._match_id, i, p.name, p.score, ranks.get(id(p)), int(p.has_won)) for i, p in enumerate(match.players)])
+        self.rows += 1 + len(match.players)
+        self._match = None
+        self._match_id = None
+        self.summary = summarize(self._conn, self.summary_size)
+
+    def _flush(self):
+        if not self._pending_hits:
+            return
+        hits, self._pending_hits = self._pending_hits, []
+        totals = {}
+        for _, _, sensor_key, points, _ in hits:
+            count, total = totals.get(sensor_key, (0, 0))
+            totals[sensor_key] = (count + 1, total + points)
+        with self._conn:
+            self._conn.executemany("INSERT INTO hits (match_id, player_index, sensor_key, points, at_ms) VALUES (?, ?, ?, ?, ?)", hits)
+            self._conn.executemany(
+                "INSERT INTO sensor_stats (sensor_key, hits, points) VALUES (?, ?, ?) "
+                "ON CONFLICT(sensor_key) DO UPDATE SET hits = hits + excluded.hits, points = points + excluded.points",
+                [(key, count, total) for key, (count, total) in totals.items()])
+        self.batches += 1
+        self.rows += len(hits)
+
+
+def main(argv):
+    db_path = argv[0] if argv else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'history.db')
+    if not os.path.isfile(db_path):
+        print(f"No existe el historial '{db_path}'.")
+        return 1
+    conn = connect(db_path)
+    summary = summarize(conn, 10)
+    print(f"Partidas terminadas: {summary['matches']}, duración media: {summary['average_ms'] / 1000:.0f} s")
+    print("Mejores puntajes:")
+    for name, score, rank, ended_at in summary['top_scores']:
+        print(f"  {score:>6}  {name:<12} puesto {rank or '-'}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(ended_at))}")
+    print("Golpes por sensor:")
+    for sensor_key, hits, points in summary['hits_per_sensor']:
+        print(f"  sensor {sensor_key}: {hits} golpes, {points} puntos")
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,334 @@
+"""
+Registro de escritura anticipada (WAL) de la partida en curso, para retomarla si el juego se cae.
+
+Cada evento de la partida (inicio, golpe de sensor, cambio de turno, ganador, pausa, fin) se agrega como
+un registro binario de 8 bytes a un segmento `match_NNNNNN.wal`. Las escrituras las hace un hilo aparte:
+el hilo principal solo encola una tupla. El hilo pasa al sistema operativo (flush) cada lote que saca de la
+cola y sincroniza a disco (fsync) cada Config.MATCH_LOG_FSYNC_MS, o enseguida en los eventos importantes, y cada cierto número de registros compacta el segmento en una
+instantánea `match.snap` con el estado completo de la partida.
+
+Al arrancar, load_state() lee la instantánea y vuelve a aplicar los segmentos posteriores sobre un
+rules.Match; como las reglas no dependen de pygame, esto tarda milisegundos. Un registro END (partida
+terminada, abandonada o descartada) borra todo y deja el directorio vacío.
+"""
+import os
+import queue
+import struct
+import threading
+import time
+
+import rules
+from rules import Match
+
+RECORD_TAG = 0xB1  # Un final de archivo truncado o relleno con ceros no tiene la marca y corta la lectura
+RECORD = struct.Struct("<BBBxI")  # marca, evento, argumento, valor (ms desde el inicio; en START el puntaje objetivo)
+SNAPSHOT_MAGIC = b"BLRSNAP\x00"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sHIIIBBB??")  # ..., siguiente segmento, objetivo, ms, jugadores, turno, ganadores, terminada, en pausa
+SNAPSHOT_PLAYER = struct.Struct("<I?")
+SNAPSHOT_NAME = "match.snap"
+SEGMENT_PREFIX = "match_"
+SEGMENT_EXTENSION = ".wal"
+URGENT_EVENTS = (rules.EVENT_START, rules.EVENT_WINNER, rules.EVENT_PAUSE, rules.EVENT_END)
+
+
+class RecoveredMatch:
+    __slots__ = ('match', 'paused', 'elapsed_ms', 'segment', 'valid_bytes')
+
+    def __init__(self, match):
+        self.match = match
+        self.paused = False
+        self.elapsed_ms = 0
+        self.segment = 0  # Último segmento leído y bytes válidos, para seguir escribiendo desde ahí
+        self.valid_bytes = 0
+
+    def copy(self):
+        copy = RecoveredMatch(self.match.copy())
+        copy.paused, copy.elapsed_ms = self.paused, self.elapsed_ms
+        copy.segment, copy.valid_bytes = self.segment, self.valid_bytes
+        return copy
+
+
+def segment_filename(number):
+    return f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_EXTENSION}"
+
+
+def list_segments(directory):
+    numbers = []
+    for filename in os.listdir(directory):
+        if filename.startswith(SEGMENT_PREFIX) and filename.endswith(SEGMENT_EXTENSION):
+            try:
+                numbers.append(int(filename[len(SEGMENT_PREFIX):-len(SEGMENT_EXTENSION)]))
+            except ValueError:
+                continue
+    return sorted(numbers)
+
+
+def apply_record(state, kind, arg, value, sensor_keys, score_mapping):
+    if kind == rules.EVENT_START:
+        return RecoveredMatch(Match(arg, value, score_mapping))
+    if state is None:
+        return None  # Restos de una partida anterior sin su inicio
+    if kind == rules.EVENT_END:
+        return None
+    state.elapsed_ms = value
+    if kind == rules.EVENT_HIT:
+        state.match.hit(sensor_keys[arg])
+    elif kind == rules.EVENT_NEXT_TURN:
+        state.match.next_turn()
+    elif kind == rules.EVENT_PAUSE:
+        state.paused = True
+    elif kind == rules.EVENT_RESUME:
+        state.paused = False
+    # EVENT_WINNER es informativo: el ganador ya sale de aplicar los golpes y turnos
+    return state
+
+
+def read_snapshot(path, score_mapping):
+    with open(path, 'rb') as f:
+        data = f.read()
+    (magic, version, next_segment, target_score, elapsed_ms, num_players, current_index,
+     num_winners, finished, paused) = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"Formato de instantánea no soportado: {path}")
+    state = RecoveredMatch(Match(num_players, target_score, score_mapping))
+    offset = SNAPSHOT_HEADER.size
+    for player in state.match.players:
+        player.score, player.has_won = SNAPSHOT_PLAYER.unpack_from(data, offset)
+        offset += SNAPSHOT_PLAYER.size
+    state.match.winners = [state.match.players[i] for i in data[offset:offset + num_winners]]
+    state.match.current_index = current_index
+    state.match.finished = finished
+    state.paused = paused
+    state.elapsed_ms = elapsed_ms
+    state.segment = next_segment
+    return state, next_segment
+
+
+def encode_snapshot(state, next_segment):
+    match = state.match
+    parts = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, next_segment, match.target_score, state.elapsed_ms,
+                                  len(match.players), match.current_index, len(match.winners), match.finished, state.paused)]
+    parts.extend(SNAPSHOT_PLAYER.pack(player.score, player.has_won) for player in match.players)
+    parts.append(bytes(match.players.index(winner) for winner in match.winners))
+    return b"".join(parts)
+
+
+def load_state(directory, score_mapping):
+    """
+    Reconstruye la partida en curso desde la instantánea y los segmentos. Devuelve RecoveredMatch, o None si
+    no hay una partida sin terminar.
+    """
+    sensor_keys = tuple(score_mapping)
+    state = None
+    first_segment = 0
+    snapshot_path = os.path.join(directory, SNAPSHOT_NAME)
+    if os.path.isfile(snapshot_path):
+        try:
+            state, first_segment = read_snapshot(snapshot_path, score_mapping)
+        except (OSError, ValueError, struct.error, IndexError) as e:
+            print(f"Advertencia: No se pudo leer la instantánea '{snapshot_path}', se usan solo los segmentos. Error: {e}")
+    for number in list_segments(directory):
+        if number < first_segment:
+            continue
+        with open(os.path.join(directory, segment_filename(number)), 'rb') as f:
+            data = f.read()
+        valid_bytes = 0
+        for offset in range(0, len(data) - RECORD.size + 1, RECORD.size):
+            tag, kind, arg, value = RECORD.unpack_from(data, offset)
+            if tag != RECORD_TAG or (kind == rules.EVENT_HIT and arg >= len(sensor_keys)):
+                break
+            state = apply_record(state, kind, arg, value, sensor_keys, score_mapping)
+            valid_bytes = offset + RECORD.size
+        if state is not None:
+            state.segment, state.valid_bytes = number, valid_bytes
+    return state
+
+
+class MatchLog:
+    """
+    Escritor del registro. on_match_event se llama desde el hilo principal (Game.match_event) y solo encola;
+    el hilo "match-log" escribe, sincroniza y compacta.
+    """
+
+    def __init__(self, directory, score_mapping, fsync_ms=250, snapshot_every=64):
+        self.directory = directory
+        self.score_mapping = score_mapping
+        self.sensor_keys = tuple(score_mapping)
+        self._key_index = {key: i for i, key in enumerate(self.sensor_keys)}
+        self.fsync_s = fsync_ms / 1000
+        self.snapshot_every = snapshot_every
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._recovered = False  # recover() ya leyó el disco; el hilo escritor sigue desde ese resultado
+        self._recovery = None
+        self._start_time = None  # time.monotonic() del inicio de la partida, en el hilo principal
+        # Estado del hilo escritor
+        self._state = None
+        self._file = None
+        self._segment = 0
+        self._segment_records = 0
+        self.records = 0
+        self.fsyncs = 0
+        self.snapshots = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def recover(self):
+        # Se marca antes de leer: si la lectura falla, el hilo escritor no la repite
+        self._recovered = True
+        self._recovery = load_state(self.directory, self.score_mapping)
+        return self._recovery
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="match-log", daemon=True)
+        self._thread.start()
+
+    def resume(self, recovered):
+        # La partida restaurada sigue contando el tiempo desde donde quedó
+        self._start_time = time.monotonic() - recovered.elapsed_ms / 1000
+
+    def on_match_event(self, kind, arg, match):
+        now = time.monotonic()
+        if kind == rules.EVENT_START:
+            self._start_time = now
+            self._queue.put((kind, len(match.players), match.target_score))
+            return
+        if kind == rules.EVENT_END:
+            self._start_time = None
+            self._queue.put((kind, arg, 0))
+            return
+        if self._start_time is None:
+            return
+        if kind == rules.EVENT_HIT:
+            arg = self._key_index[arg]
+        self._queue.put((kind, arg, int((now - self._start_time) * 1000)))
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {'records': self.records, 'fsyncs': self.fsyncs, 'snapshots': self.snapshots}
+
+    def _run(self):
+        try:
+            self._open_recovered()
+        except (OSError, ValueError, struct.error, IndexError) as e:
+            # Sin esto el hilo moriría en silencio y los eventos se acumularían en la cola sin escribirse
+            print(f"Advertencia: El registro de la partida no pudo retomar los archivos existentes, "
+                  f"empieza con la próxima partida. Error: {e}")
+            self._state = None
+            self._file = None
+        dirty = False
+        last_sync = time.monotonic()
+        running = True
+        while running:
+            timeout = max(0.0, self.fsync_s - (time.monotonic() - last_sync)) if dirty else None
+            try:
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            # Lo que ya está en la cola se escribe junto, con un solo flush
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            urgent = False
+            for item in batch:
+                if item is None:
+                    running = False
+                    break
+                urgent |= self._write(*item)
+            if self._file is None:
+                dirty = False
+            elif batch:
+                self._file.flush()
+                dirty = True
+            if dirty and (urgent or time.monotonic() - last_sync >= self.fsync_s):
+                self._sync()
+                dirty = False
+                last_sync = time.monotonic()
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+
+    def _open_recovered(self):
+        if not self._recovered:
+            self.recover()
+        # Copia propia: Game juega sobre la partida devuelta por recover() en el hilo principal
+        self._state = self._recovery.copy() if self._recovery is not None else None
+        if self._state is None:
+            self._remove_files()
+        else:
+            self._open_segment(self._state.segment, self._state.valid_bytes)
+
+    def _write(self, kind, arg, value):
+        if kind == rules.EVENT_START:
+            # Una partida nueva reemplaza cualquier resto de la anterior
+            if self._file is not None:
+                self._file.close()
+            self._remove_files()
+            self._open_segment(0)
+        if self._file is None:
+            return False
+        self._file.write(RECORD.pack(RECORD_TAG, kind, arg, value))
+        self.records += 1
+        self._segment_records += 1
+        self._state = apply_record(self._state, kind, arg, value, self.sensor_keys, self.score_mapping)
+        if kind == rules.EVENT_END:
+            self._file.close()
+            self._file = None
+            self._remove_files()
+            return False
+        if self._segment_records >= self.snapshot_every and self._state is not None:
+            self._compact()
+        return kind in URGENT_EVENTS
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+
+    def _compact(self):
+        # La instantánea cubre todo hasta el segmento actual inclusive; se borra después de reemplazarla
+        self._sync()
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_NAME)
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(encode_snapshot(self._state, self._segment + 1))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+        self._fsync_directory()
+        self._file.close()
+        os.remove(os.path.join(self.directory, segment_filename(self._segment)))
+        self._open_segment(self._segment + 1)
+        self.snapshots += 1
+
+    def _open_segment(self, number, valid_bytes=None):
+        path = os.path.join(self.directory, segment_filename(number))
+        self._file = open(path, 'ab')
+        if valid_bytes is not None:
+            # Descarta un registro a medio escribir antes de seguir agregando
+            self._file.truncate(valid_bytes)
+            self._file.seek(0, os.SEEK_END)
+        self._segment = number
+        self._segment_records = self._file.tell() // RECORD.size
+
+    def _remove_files(self):
+        paths = [os.path.join(self.directory, SNAPSHOT_NAME)]
+        paths.extend(os.path.join(self.directory, segment_filename(n)) for n in list_segments(self.directory))
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self._fsync_directory()
+
+    def _fsync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
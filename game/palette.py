@@ -0,0 +1,151 @@
+"""
+Cuantización de las animaciones de fondo a 8 bits con una paleta compartida por estado (requiere numpy).
+
+Todos los fotogramas de un estado se reducen a la misma paleta de 256 colores, calculada con median cut sobre
+una muestra de píxeles de toda la secuencia. Cada píxel se asigna con una tabla de 32768 entradas (5 bits por
+canal) que guarda el índice del color más cercano de la paleta, así mapear un fotograma completo es una sola
+indexación de numpy. Un fotograma de 1280x720 pasa de 3.5 MB (32 bits) a 0.9 MB.
+
+Los fotogramas cuantizados se guardan como paquetes indexados de frame_pack.py (`python frame_pack.py --palette`,
+o los genera el juego la primera vez con Config.PALETTE_BACKGROUNDS); cargarlos no necesita numpy.
+
+Uso como benchmark (desde la carpeta game/):
+    python palette.py                     # todos los estados, resolución de Config
+    python palette.py state_inicio --profile 540p
+"""
+import os
+import sys
+import time
+
+import numpy
+
+PALETTE_SIZE = 256
+LUT_BITS = 5  # Bits por canal de la tabla de asignación: 2**15 entradas
+MAX_SAMPLES = 1 << 16  # Píxeles de toda la secuencia que entran al median cut
+
+
+def surface_rgb(pygame_module, surface):
+    # (alto, ancho, 3) en el mismo orden de filas que espera pygame.image.frombuffer
+    width, height = surface.get_size()
+    return numpy.frombuffer(pygame_module.image.tobytes(surface, 'RGB'), numpy.uint8).reshape(height, width, 3)
+
+
+def median_cut(pixels, colors=PALETTE_SIZE):
+    """
+    Paleta de hasta `colors` colores para `pixels` (N, 3): se parte siempre la caja con el canal de mayor rango
+    por su mediana, y cada color es el promedio de su caja.
+    """
+    # Por canal (3, N): los mínimos y máximos recorren memoria contigua
+    boxes = [numpy.ascontiguousarray(pixels.T)]
+    ranges = [_box_range(boxes[0])]
+    while len(boxes) < colors:
+        index = int(numpy.argmax(ranges))
+        if ranges[index] == 0:
+            break  # Todas las cajas tienen un solo color
+        box = boxes[index]
+        channel = int(numpy.argmax(box.max(axis=1) - box.min(axis=1)))
+        half = box.shape[1] // 2
+        order = numpy.argpartition(box[channel], half)
+        low, high = box[:, order[:half]], box[:, order[half:]]
+        boxes[index:index + 1] = [low, high]
+        ranges[index:index + 1] = [_box_range(low), _box_range(high)]
+    palette = numpy.array([box.mean(axis=1) for box in boxes if box.shape[1]], dtype=numpy.float32)
+    return numpy.clip(numpy.rint(palette), 0, 255).astype(numpy.uint8)
+
+
+def _box_range(box):
+    if box.shape[1] < 2:
+        return 0
+    return int((box.max(axis=1) - box.min(axis=1)).max())
+
+
+def nearest_lut(palette, bits=LUT_BITS):
+    # Para el centro de cada celda de la grilla RGB, el índice del color de la paleta más cercano
+    levels = 1 << bits
+    centers = (numpy.arange(levels, dtype=numpy.float32) + 0.5) * (256 / levels)
+    grid = numpy.stack(numpy.meshgrid(centers, centers, centers, indexing='ij'), axis=-1).reshape(-1, 3)
+    colors = palette.astype(numpy.float32)
+    colors_norm = (colors ** 2).sum(axis=1)
+    lut = numpy.empty(len(grid), dtype=numpy.uint8)
+    # Por bloques: la matriz de distancias completa serían 32768 x 256 flotantes
+    for start in range(0, len(grid), 4096):
+        block = grid[start:start + 4096]
+        distances = colors_norm[None, :] - 2 * block @ colors.T
+        lut[start:start + 4096] = distances.argmin(axis=1)
+    return lut
+
+
+def map_frame(rgb, lut, bits=LUT_BITS):
+    shift = 8 - bits
+    reduced = (rgb >> shift).astype(numpy.uint16)
+    return lut[(reduced[..., 0] << (2 * bits)) | (reduced[..., 1] << bits) | reduced[..., 2]]
+
+
+def quantize_sequence(pygame_module, surfaces, colors=PALETTE_SIZE, max_samples=MAX_SAMPLES):
+    """
+    Devuelve (paleta (K, 3) uint8, [índices (alto, ancho) uint8 por fotograma]). Recorre los fotogramas dos
+    veces (muestra y asignación) para no tener nunca toda la secuencia en RGB a la vez.
+    """
+    if not surfaces:
+        return numpy.zeros((0, 3), numpy.uint8), []
+    width, height = surfaces[0].get_size()
+    step = max(1, (width * height * len(surfaces)) // max_samples)
+    samples = numpy.concatenate([surface_rgb(pygame_module, surface).reshape(-1, 3)[::step] for surface in surfaces])
+    palette = median_cut(samples, colors)
+    lut = nearest_lut(palette)
+    return palette, [map_frame(surface_rgb(pygame_module, surface), lut) for surface in surfaces]
+
+
+def indexed_surface(pygame_module, indices, palette):
+    height, width = indices.shape
+    surface = pygame_module.image.frombuffer(numpy.ascontiguousarray(indices), (width, height), 'P')
+    surface.set_palette([tuple(color) for color in palette.tolist()])
+    return surface
+
+
+def main(argv):
+    import argparse
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from game import Config, resource_path, decode_background_frame
+    from frame_pack import list_frame_files
+
+    parser = argparse.ArgumentParser(description="Mide la cuantización a 8 bits de las animaciones de fondo.")
+    parser.add_argument('states', nargs='*', help="Carpetas state_* a medir (por defecto todas)")
+    parser.add_argument('--profile', choices=sorted(Config.RENDER_PROFILES), help="Perfil de render (fija ancho y alto)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        Config.apply_render_profile(args.profile)
+    size = (Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT)
+
+    assets_dir = resource_path('assets')
+    states = args.states or sorted(d for d in os.listdir(assets_dir)
+                                   if d.startswith('state_') and os.path.isdir(os.path.join(assets_dir, d)))
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    print(f"{'estado':<16} {'cuadros':>7} {'paleta ms':>10} {'mapeo ms/cuadro':>16} {'32 bits MB':>11} {'8 bits MB':>10} {'error medio':>12}")
+    for state_name in states:
+        folder = os.path.join(assets_dir, state_name)
+        surfaces = [decode_background_frame(os.path.join(folder, f), size) for f in list_frame_files(folder)]
+        if not surfaces:
+            continue
+        start = time.perf_counter()
+        step = max(1, (size[0] * size[1] * len(surfaces)) // MAX_SAMPLES)
+        samples = numpy.concatenate([surface_rgb(pygame, s).reshape(-1, 3)[::step] for s in surfaces])
+        palette = median_cut(samples)
+        lut = nearest_lut(palette)
+        palette_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        indices = [map_frame(surface_rgb(pygame, s), lut) for s in surfaces]
+        map_ms = (time.perf_counter() - start) * 1000 / len(surfaces)
+        # Error medio por canal del primer fotograma, en niveles de 0 a 255
+        error = numpy.abs(palette[indices[0]].astype(numpy.int16) - surface_rgb(pygame, surfaces[0])).mean()
+        full_mb = sum(s.get_pitch() * s.get_height() for s in surfaces) / 2**20
+        indexed_mb = sum(i.nbytes for i in indices) / 2**20
+        print(f"{state_name:<16} {len(surfaces):>7} {palette_ms:>10.1f} {map_ms:>16.2f} {full_mb:>11.1f} {indexed_mb:>10.1f} {error:>12.2f}")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,130 @@
+"""
+Backend de render por GPU (Config.RENDER_BACKEND 'renderer') sobre pygame._sdl2.video.
+
+RendererCanvas imita la parte de Surface que usan los draw de los estados (blit, fill, set_clip): cada
+Surface se sube una vez como textura y la GPU compone el cuadro sobre una textura destino del tamaño del
+perfil de render, que al presentar se escala a la ventana. Si esta versión de pygame no trae _sdl2,
+Renderer queda en None y Game vuelve al backend 'surface'.
+
+    renderer = Renderer(Window("Bolirrana", size=(1280, 720)))
+    canvas = RendererCanvas(renderer, (1280, 720), cache_bytes=192 * 2**20)
+    canvas.blit(surface, (0, 0))
+    canvas.present()
+"""
+import weakref
+from collections import OrderedDict
+
+import pygame
+
+try:
+    from pygame._sdl2.video import Window, Renderer, Texture, get_drivers as get_render_drivers
+except ImportError:
+    Window = Renderer = Texture = get_render_drivers = None  # Solo se necesitan para Config.RENDER_BACKEND 'renderer'
+
+
+def to_display_format(image):
+    # Con el backend 'renderer' no hay superficie de pantalla: las imágenes quedan en su formato y la GPU las convierte al subirlas
+    if pygame.display.get_surface() is None:
+        return image
+    return image.convert_alpha()
+
+
+class RendererCanvas:
+    """
+    La parte de Surface que usan los draw de los estados (blit, fill, set_clip), implementada con el Renderer
+    de SDL2. Cada superficie (fotograma de fondo, texto de la caché) se sube una vez como textura y la GPU las
+    compone; el CPU ya no copia los píxeles del cuadro. Lo dibujado va a una textura destino del tamaño del
+    perfil de render que se conserva entre cuadros, así el renderizado por rectángulos sucios sigue igual, y
+    al presentar se escala a la ventana.
+    """
+    _mutable = weakref.WeakSet()  # Superficies que cambian en su lugar (back buffer de DeltaAnimation)
+
+    def __init__(self, renderer, size, cache_bytes):
+        self.renderer = renderer
+        self.size = size
+        self.cache_bytes = cache_bytes
+        self.target = Texture(renderer, size, target=True)
+        renderer.target = self.target
+        self._textures = OrderedDict()  # id(superficie) -> (weakref a la superficie, Texture, bytes)
+        self._texture_bytes = 0
+        self._clip = None
+        self.hits = 0
+        self.uploads = 0
+        self.uploaded_bytes = 0
+        self.evictions = 0
+
+    @classmethod
+    def mark_mutable(cls, surface):
+        cls._mutable.add(surface)
+
+    def get_size(self):
+        return self.size
+
+    def get_rect(self):
+        return pygame.Rect((0, 0), self.size)
+
+    def set_clip(self, rect):
+        self._clip = None if rect is None else pygame.Rect(rect)
+
+    def fill(self, color, rect=None):
+        area = self.get_rect() if rect is None else pygame.Rect(rect)
+        if self._clip is not None:
+            area = area.clip(self._clip)
+        self.renderer.draw_color = pygame.Color(color)
+        self.renderer.fill_rect(area)
+        return area
+
+    def blit(self, source, dest, area=None):
+        src = source.get_rect() if area is None else pygame.Rect(area).clip(source.get_rect())
+        dst = pygame.Rect(dest[0], dest[1], src.width, src.height)
+        if self._clip is not None:
+            clipped = dst.clip(self._clip)
+            src = pygame.Rect(src.x + clipped.x - dst.x, src.y + clipped.y - dst.y, clipped.width, clipped.height)
+            dst = clipped
+        if not dst.width or not dst.height:
+            return dst
+        self._texture(source, src).draw(srcrect=src, dstrect=dst)
+        return dst
+
+    def present(self):
+        # La textura destino se escala a la ventana en la GPU; luego se vuelve a dibujar sobre ella
+        renderer = self.renderer
+        renderer.target = None
+        self.target.draw()
+        renderer.present()
+        renderer.target = self.target
+
+    def nbytes(self):
+        return self._texture_bytes
+
+    def stats(self):
+        return {'texturas': len(self._textures), 'mb': round(self._texture_bytes / 2**20, 1), 'aciertos': self.hits,
+                'subidas': self.uploads, 'mb_subidos': round(self.uploaded_bytes / 2**20, 1), 'desalojos': self.evictions}
+
+    def _texture(self, surface, area):
+        key = id(surface)
+        entry = self._textures.get(key)
+        if entry is not None and entry[0]() is surface:
+            self._textures.move_to_end(key)
+            texture = entry[1]
+            if surface in self._mutable:
+                # Solo se sube la región que se va a dibujar, que es la que pudo cambiar
+                texture.update(surface.subsurface(area), area)
+                self.uploaded_bytes += area.width * area.height * 4
+            else:
+                self.hits += 1
+            return texture
+        if entry is not None:
+            del self._textures[key]  # id reutilizado por una superficie nueva
+            self._texture_bytes -= entry[2]
+        texture = Texture.from_surface(self.renderer, surface)
+        nbytes = surface.get_width() * surface.get_height() * 4
+        self._textures[key] = (weakref.ref(surface), texture, nbytes)
+        self._texture_bytes += nbytes
+        self.uploads += 1
+        self.uploaded_bytes += nbytes
+        while self._texture_bytes > self.cache_bytes and len(self._textures) > 1:
+            _, (_, _, evicted_bytes) = self._textures.popitem(last=False)
+            self._texture_bytes -= evicted_bytes
+            self.evictions += 1
+        return texture
@@ -0,0 +1,297 @@
+"""
+Reproduce sesiones grabadas (session_record.py) sin pantalla, para reproducir errores y para pruebas de
+resistencia de varias horas.
+
+Corre Game con SDL_VIDEODRIVER=dummy y SDL_AUDIODRIVER=dummy y entrega las teclas grabadas a Game.run_frame
+como eventos Config.EVENT_ARCADE_INPUT, el mismo camino que usan los sensores. Con --speed 1 se reproduce en
+tiempo real, con --speed N a N veces esa velocidad y con --speed 0 sin esperas: el reloj del planificador es
+virtual y avanza un cuadro por vuelta (o hasta la próxima tecla si el juego está en reposo), así cada sesión
+tarda solo lo que cuestan sus cuadros. Antes de cada sesión el juego vuelve al menú con las opciones por
+defecto, como recién arrancado; cada tecla se compara con el estado grabado y una diferencia marca la sesión
+como desincronizada.
+
+Durante la reproducción se mide el tiempo de trabajo de cada cuadro (sin las esperas), la memoria (RSS, fondos
+de la caché, textos y texturas) y el uso de los canales del mixer, y se imprime una línea por intervalo. Al
+final se compara el último intervalo con el segundo (el primero incluye la carga de los fondos): termina con
+código 1 si el RSS creció o el p99 del cuadro empeoró más de lo permitido, o si alguna sesión se desincronizó.
+
+Uso (desde la carpeta game/):
+    python replay.py data/sessions                          # todas las sesiones, en tiempo real
+    python replay.py data/sessions/session_20250101_120000_4242.rec --speed 10
+    python replay.py data/sessions --speed 0 --hours 4 --report-every 300   # prueba de resistencia
+"""
+import contextlib
+import os
+import sys
+import time
+
+from session_record import list_sessions, read_session
+
+
+class ReplayClock:
+    """
+    Reloj del planificador durante la reproducción: `speed` veces el tiempo real, o virtual con `speed` 0
+    (sleep avanza el reloj sin dormir).
+    """
+
+    def __init__(self, speed):
+        self.speed = speed
+        self._origin = time.perf_counter()
+        self._virtual = 0.0
+        self.slept = 0.0  # Segundos reales dormidos, para descontarlos del tiempo de cada cuadro
+
+    def now(self):
+        if self.speed:
+            return (time.perf_counter() - self._origin) * self.speed
+        return self._virtual
+
+    def sleep(self, seconds):
+        if not self.speed:
+            self._virtual += seconds
+            return
+        start = time.perf_counter()
+        time.sleep(seconds / self.speed)
+        self.slept += time.perf_counter() - start
+
+
+class ReplayChecker:
+    """
+    Ocupa el lugar de Game.recorder: compara cada tecla que consume el juego con la grabada y su estado.
+    """
+
+    def __init__(self):
+        self._expected = iter(())
+        self._session_ok = True
+        self.keys = 0
+        self.desynced = []  # (archivo, tecla grabada, tecla consumida) de la primera diferencia de cada sesión
+
+    def start(self, session):
+        self._path = session.path
+        self._expected = iter(session.events)
+        self._session_ok = True
+
+    def record(self, pressed, key_name, state):
+        self.keys += 1
+        expected = next(self._expected, None)
+        if self._session_ok and (expected is None or expected[1:] != (pressed, key_name, state)):
+            self._session_ok = False
+            self.desynced.append((self._path, expected, (pressed, key_name, state)))
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class SoakStats:
+    """
+    Tiempos de cuadro y muestras de memoria y mixer por intervalo de reporte.
+    """
+
+    def __init__(self, game, memory):
+        self.game = game
+        self.memory = memory
+        self.started = time.perf_counter()
+        self.sessions = 0
+        self.frames = 0
+        self.windows = []  # Un dict por intervalo cerrado
+        self._frame_times = []
+        self._busy_max = 0
+        self._steals_start = game.audio.steals
+
+    def frame(self, work_s):
+        self.frames += 1
+        self._frame_times.append(work_s)
+        self._busy_max = max(self._busy_max, self.game.audio.busy_channels())
+
+    def close_window(self, partial=False):
+        sample, _ = self.memory.measure(self.game)
+        cache = self.game.resources.animated_backgrounds
+        times = self._frame_times or [0.0]
+        window = {
+            'elapsed_s': time.perf_counter() - self.started,
+            'sessions': self.sessions,
+            'frames': self.frames,
+            'p50_ms': percentile(times, 0.50) * 1000,
+            'p99_ms': percentile(times, 0.99) * 1000,
+            'max_ms': max(times) * 1000,
+            'rss_mb': sample['rss'] / 2**20,
+            'backgrounds_mb': cache.bytes_used / 2**20,
+            'background_entries': len(cache),
+            'mapped_mb': cache.mapped_bytes / 2**20,
+            'texts_mb': sample['textos'] / 2**20,
+            'textures_mb': sample['texturas'] / 2**20,
+            'busy_channels': self._busy_max,
+            'steals': self.game.audio.steals - self._steals_start,
+            'partial': partial,  # El último, cortado al terminar: pocos cuadros para comparar su p99
+        }
+        self.windows.append(window)
+        self._frame_times = []
+        self._busy_max = 0
+        self._steals_start = self.game.audio.steals
+        return window
+
+
+def format_window(window, channels):
+    elapsed = int(window['elapsed_s'])
+    return (f"[{elapsed // 3600:02d}:{elapsed // 60 % 60:02d}:{elapsed % 60:02d}] {window['sessions']} sesiones, "
+            f"{window['frames']} cuadros | cuadro p50 {window['p50_ms']:.2f} ms p99 {window['p99_ms']:.2f} ms "
+            f"máx {window['max_ms']:.1f} ms | RSS {window['rss_mb']:.0f} MB, fondos {window['backgrounds_mb']:.0f} MB "
+            f"({window['background_entries']}), mapeados {window['mapped_mb']:.0f} MB, textos {window['texts_mb']:.1f} MB, texturas {window['textures_mb']:.0f} MB | "
+            f"canales máx {window['busy_channels']}/{channels}, cortes {window['steals']}")
+
+
+def reset_to_menu(game, config):
+    """
+    Deja el juego como recién arrancado, sin recrear nada: una fuga de una sesión a otra tiene que verse.
+    """
+    game.hit_batch.take()
+    for key in config.SCORE_MAPPING:
+        game.hit_batch.release(key)
+    game.s_key_pressed_time = 0
+    game.match = None
+    game.num_players_selected = config.NUM_JUGADORES_OPTIONS[0]
+    game.game_target_score = config.PUNTAJE_OBJETIVO_OPTIONS[0]
+    for handler in game.states.values():
+        if hasattr(handler, 'selection_index'):
+            handler.selection_index = 0
+    game.states[config.STATE_SELECT_PLAYERS].current_idx = 0
+    game.states[config.STATE_SELECT_SCORE].current_idx = 0
+    if game.current_game_state != config.STATE_MENU:
+        game.set_state(config.STATE_MENU)
+
+
+def replay_session(pygame, config, game, session, clock, checker, stats, report):
+    reset_to_menu(game, config)
+    checker.start(session)
+    events = session.events
+    end_s = session.duration_ms / 1000
+    start = clock.now()
+    index = 0
+    while True:
+        elapsed = clock.now() - start
+        if index < len(events) and events[index][0] / 1000 > elapsed and config.IDLE_EVENT_WAIT and game.is_idle():
+            # Como pygame.event.wait en Game.wait_for_events: sin nada que animar se salta hasta la próxima tecla
+            clock.sleep(min(events[index][0] / 1000 - elapsed, config.IDLE_WAIT_TIMEOUT_MS / 1000))
+            game.scheduler.resync()
+            elapsed = clock.now() - start
+        batch = []
+        while index < len(events) and events[index][0] / 1000 <= elapsed:
+            _, pressed, key_name, _ = events[index]
+            batch.append(pygame.event.Event(config.EVENT_ARCADE_INPUT, key=key_name, pressed=pressed,
+                                            timestamp=time.monotonic(), kernel_timestamp=None))
+            index += 1
+        pygame.event.clear()  # La cola de SDL no se lee durante la reproducción
+        frame_start = time.perf_counter()
+        slept = clock.slept
+        running = game.run_frame(batch)
+        stats.frame(time.perf_counter() - frame_start - (clock.slept - slept))
+        report()
+        if not running or (index >= len(events) and elapsed >= end_s):
+            break
+    stats.sessions += 1
+
+
+def run_replay(args, files):
+    import pygame
+    import game as game_module
+    from game import Config, FrameScheduler, MemoryAccounting
+
+    # Nada de lo reproducido debe quedar en el registro, el historial ni las sesiones de la máquina
+    Config.MATCH_LOG = False
+    Config.MATCH_HISTORY = False
+    Config.SCOREBOARD = False
+    Config.SESSION_RECORD = False
+    Config.INPUT_BACKEND = 'keyboard'
+    Config.FIXED_TIMESTEP = True
+    if args.backend:
+        Config.RENDER_BACKEND = args.backend
+        Config.RENDERER_DRIVER = args.renderer_driver
+    if args.profile:
+        Config.apply_render_profile(args.profile)
+
+    clock = ReplayClock(args.speed)
+    checker = ReplayChecker()
+    game = game_module.Game()
+    game.scheduler = FrameScheduler(Config.FPS, Config.UPDATE_HZ, Config.MAX_UPDATES_PER_FRAME, clock.now, clock.sleep)
+    game.recorder = checker
+    stats = SoakStats(game, game.memory or MemoryAccounting(1))
+    channels = pygame.mixer.get_num_channels() if pygame.mixer.get_init() else 0
+    report_s = args.report_every
+    next_report = time.perf_counter() + report_s
+
+    def report():
+        nonlocal next_report
+        if time.perf_counter() >= next_report:
+            next_report += report_s
+            print(format_window(stats.close_window(), channels), file=sys.stderr)
+
+    deadline = time.perf_counter() + args.hours * 3600
+    sessions = [read_session(path) for path in files]
+    while True:
+        for session in sessions:
+            replay_session(pygame, Config, game, session, clock, checker, stats, report)
+            if args.hours and time.perf_counter() >= deadline:
+                break
+        if not args.hours or time.perf_counter() >= deadline:
+            break
+    print(format_window(stats.close_window(partial=True), channels), file=sys.stderr)
+
+    game.recorder = None
+    game.close()
+    return stats, checker
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reproduce sesiones grabadas sin pantalla.")
+    parser.add_argument('sessions', nargs='*', help="Archivos .rec o carpetas (por defecto data/sessions)")
+    parser.add_argument('--speed', type=float, default=1.0, help="Velocidad: 1 = tiempo real, N = N veces, 0 = sin esperas")
+    parser.add_argument('--hours', type=float, default=0.0, help="Repite las sesiones en cadena durante estas horas (0 = una pasada)")
+    parser.add_argument('--report-every', type=float, default=60.0, help="Segundos entre líneas de reporte")
+    parser.add_argument('--max-rss-growth-mb', type=float, default=64.0, help="Crecimiento del RSS permitido entre el primer y el último intervalo")
+    parser.add_argument('--max-slowdown', type=float, default=0.5, help="Empeoramiento relativo permitido del p99 del cuadro (0.5 = 50%%)")
+    parser.add_argument('--profile', help="Perfil de render (por defecto el de Config)")
+    parser.add_argument('--backend', choices=('surface', 'renderer'), help="Backend de render (por defecto el de Config)")
+    parser.add_argument('--renderer-driver', help="Driver de SDL para el backend 'renderer' (p. ej. 'software')")
+    parser.add_argument('--verbose', action='store_true', help="Muestra los mensajes del juego")
+    args = parser.parse_args(argv)
+
+    files = list_sessions(args.sessions or [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sessions')])
+    if not files:
+        print("No hay sesiones para reproducir.", file=sys.stderr)
+        return 1
+
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(open(os.devnull, 'w')))
+        stats, checker = run_replay(args, files)
+
+    failures = 0
+    for path, expected, consumed in checker.desynced:
+        print(f"Advertencia: La sesión '{path}' se desincronizó: se grabó {expected} y el juego consumió {consumed}.", file=sys.stderr)
+        failures += 1
+    # El primer intervalo incluye la carga de los fondos: si hay suficientes, la referencia es el segundo
+    windows = [window for window in stats.windows if not window['partial']] or stats.windows
+    first, last = windows[1 if len(windows) > 2 else 0], windows[-1]
+    if len(windows) > 1:
+        growth = last['rss_mb'] - first['rss_mb']
+        if growth > args.max_rss_growth_mb:
+            print(f"Advertencia: El RSS creció {growth:.0f} MB durante la reproducción (permitido {args.max_rss_growth_mb:.0f} MB).", file=sys.stderr)
+            failures += 1
+        if first['p99_ms'] and last['p99_ms'] > first['p99_ms'] * (1 + args.max_slowdown):
+            print(f"Advertencia: El p99 del cuadro pasó de {first['p99_ms']:.2f} ms a {last['p99_ms']:.2f} ms.", file=sys.stderr)
+            failures += 1
+    print(f"{stats.sessions} sesiones, {checker.keys} teclas, {stats.frames} cuadros en "
+          f"{time.perf_counter() - stats.started:.0f} s. {'Sin problemas.' if not failures else f'{failures} problemas.'}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,119 @@
+"""
+Reglas de la Bolirana sin dependencia de pygame: puntaje, turnos y fin de partida.
+
+Los estados de game.py le entregan eventos a Match (un golpe de sensor o un cambio de turno) y reciben
+banderas con lo que cambió; el sonido, los textos y las transiciones de pantalla quedan del lado de
+pygame. Al no iniciar SDL se puede usar para simular millones de lanzamientos:
+
+    match = Match(4, 3000, {"1": 500, "2": 300, ...})
+    flags = match.hit("1")
+    if flags & GAME_OVER: ...
+"""
+
+# Banderas devueltas por Match.hit / Match.hit_many / Match.next_turn / Match.apply
+SCORED = 1
+WINNER = 2
+GAME_OVER = 4
+TURN_CHANGED = 8
+
+# Tipos de evento de una partida. Match.apply solo aplica HIT (valor: tecla del sensor) y NEXT_TURN; el resto
+# describe lo que pasó alrededor (ganador: índice del jugador) para el registro y otros observadores de Game
+EVENT_HIT = 0
+EVENT_NEXT_TURN = 1
+EVENT_START = 2
+EVENT_WINNER = 3
+EVENT_PAUSE = 4
+EVENT_RESUME = 5
+EVENT_END = 6
+
+
+class Player:
+    __slots__ = ('name', 'score', 'has_won')
+
+    def __init__(self, name, score=0, has_won=False):
+        self.name = name
+        self.score = score
+        self.has_won = has_won
+
+    def __repr__(self):
+        return f"Player({self.name!r}, {self.score}, {self.has_won})"
+
+
+class Match:
+    __slots__ = ('players', 'target_score', 'score_mapping', 'current_index', 'winners', 'finished')
+
+    def __init__(self, num_players, target_score, score_mapping):
+        self.players = [Player(f"Jugador {i + 1}") for i in range(num_players)]
+        self.target_score = target_score
+        self.score_mapping = score_mapping
+        self.current_index = 0
+        self.winners = []
+        self.finished = False
+
+    def copy(self):
+        # Copia independiente, para otro hilo que sigue la misma partida (registro, marcador)
+        copy = Match(len(self.players), self.target_score, self.score_mapping)
+        for source, player in zip(self.players, copy.players):
+            player.name, player.score, player.has_won = source.name, source.score, source.has_won
+        copy.winners = [copy.players[self.players.index(winner)] for winner in self.winners]
+        copy.current_index = self.current_index
+        copy.finished = self.finished
+        return copy
+
+    @property
+    def current_player(self):
+        return self.players[self.current_index]
+
+    def hit(self, sensor_key):
+        # Un jugador que ya ganó no suma más puntos, pero conserva el turno hasta el TAB
+        player = self.players[self.current_index]
+        if player.has_won or self.finished:
+            return 0
+        player.score += self.score_mapping[sensor_key]
+        if player.score >= self.target_score:
+            return SCORED | self._declare_winner(player)
+        return SCORED
+
+    def hit_many(self, sensor_keys):
+        """
+        Aplica varios golpes del jugador de turno con una sola revisión de ganador. Devuelve (banderas, puntos
+        sumados); el resultado es el mismo que llamar hit() con cada tecla en orden.
+        """
+        player = self.players[self.current_index]
+        if player.has_won or self.finished:
+            return 0, 0
+        before = player.score
+        for key in sensor_keys:
+            player.score += self.score_mapping[key]
+            if player.score >= self.target_score:
+                break  # Los golpes siguientes ya no suman, como con hit()
+        points = player.score - before
+        if player.score >= self.target_score:
+            return SCORED | self._declare_winner(player), points
+        return (SCORED if sensor_keys else 0), points
+
+    def next_turn(self):
+        flags = 0
+        player = self.players[self.current_index]
+        if not player.has_won and player.score >= self.target_score:
+            flags = self._declare_winner(player)
+        if not self.finished:
+            self.current_index = (self.current_index + 1) % len(self.players)
+            flags |= TURN_CHANGED
+        return flags
+
+    def apply(self, event, value=None):
+        if event == EVENT_HIT:
+            return self.hit(value)
+        if event == EVENT_NEXT_TURN:
+            return self.next_turn()
+        raise ValueError(f"Evento desconocido: {event}")
+
+    def _declare_winner(self, player):
+        player.has_won = True
+        self.winners.append(player)
+        # Con más de 2 jugadores la partida termina con los dos primeros puestos; con 2, cuando ambos llegan
+        if (len(self.winners) >= 2 and len(self.players) > 2) or all(p.has_won for p in self.players):
+            self.finished = True
+            return WINNER | GAME_OVER
+        return WINNER
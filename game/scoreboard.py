@@ -0,0 +1,234 @@
+"""
+Publicador del marcador para pantallas externas y monitoreo remoto.
+
+Un servidor asyncio corre en su propio hilo junto a Game.run. El hilo principal solo pasa cada evento
+(tipo, argumento) al loop con call_soon_threadsafe. El hilo del servidor lo aplica sobre su propio
+rules.Match, así cada golpe de un lote publica los puntos que de verdad sumó y el puntaje justo después de
+él, aunque Game ya haya aplicado el lote completo con hit_many. En ese mismo hilo se arman los mensajes, la
+instantánea y se envían. Protocolo: una línea JSON por mensaje, cada una con un número de secuencia `seq`.
+
+  Deltas (servidor -> cliente):
+    {"seq": 12, "t": "start", "players": 4, "target": 3000}
+    {"seq": 13, "t": "hit", "p": 0, "key": "1", "pts": 500, "score": 1500}
+    {"seq": 14, "t": "turn", "p": 1}
+    {"seq": 15, "t": "winner", "p": 0, "rank": 1}
+    {"seq": 16, "t": "state", "state": "GameOverState"}
+    {"seq": 17, "t": "end"}
+  Instantánea: el cliente envía la línea `snapshot` y recibe el estado completo en un solo mensaje:
+    {"seq": 17, "t": "snapshot", "state": "MenuState", "target": 3000, "turn": 1,
+     "players": [["Jugador 1", 1500, true], ...], "winners": [0]}
+  Los deltas con `seq` menor o igual al de la instantánea ya están incluidos en ella.
+
+Cada cliente tiene un buffer de salida acotado; si un cliente lento lo llena se le desconecta, el juego nunca espera.
+
+Uso como cliente de prueba (desde la carpeta game/):
+    python scoreboard.py unix:/tmp/bolirana-scoreboard.sock
+    python scoreboard.py tcp:127.0.0.1:8765
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+
+import rules
+from rules import Match
+
+
+def parse_address(address):
+    # 'unix:/ruta/al.sock' o 'tcp:host:puerto'
+    kind, _, rest = address.partition(':')
+    if kind == 'unix':
+        return 'unix', rest
+    if kind == 'tcp':
+        host, _, port = rest.rpartition(':')
+        return 'tcp', (host or '127.0.0.1', int(port))
+    raise ValueError(f"Dirección de marcador no válida: {address}")
+
+
+def match_snapshot(match, state_name, seq):
+    snapshot = {'seq': seq, 't': 'snapshot', 'state': state_name}
+    if match is not None:
+        snapshot.update({
+            'target': match.target_score,
+            'turn': match.current_index,
+            'players': [[p.name, p.score, p.has_won] for p in match.players],
+            'winners': [match.players.index(w) for w in match.winners],
+        })
+    return snapshot
+
+
+class ScoreboardPublisher:
+    """
+    Observador de Game (on_match_event / on_state_changed) que publica los cambios a los suscriptores.
+    """
+
+    def __init__(self, address, score_mapping, client_buffer_bytes=256 * 1024):
+        self.address = address
+        self.score_mapping = score_mapping
+        self.client_buffer_bytes = client_buffer_bytes
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self._clients = set()
+        self._live_match = None  # Última partida de Game vista desde el hilo principal (solo para detectar restauradas)
+        # Estado del hilo del servidor
+        self._seq = 0
+        self._state_name = None
+        self._match = None
+        self.dropped = 0
+
+    def start(self):
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="scoreboard", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self._server is not None
+
+    def stop(self):
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+            self._loop = None
+
+    def stats(self):
+        return {'clients': len(self._clients), 'messages': self._seq, 'dropped': self.dropped}
+
+    # --- Hilo principal ---
+    def on_match_event(self, kind, arg, match):
+        if kind == rules.EVENT_START:
+            self._live_match = match
+            arg = (len(match.players), match.target_score)
+        self._post(self._apply_event, kind, arg)
+
+    def on_state_changed(self, state_name, match):
+        restored = None
+        if match is not None and match is not self._live_match:
+            restored = match.copy()  # Partida restaurada del registro, sin EVENT_START
+        self._live_match = match
+        self._post(self._apply_state, state_name, match is not None, restored)
+
+    def _post(self, callback, *args):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(callback, *args)
+
+    # --- Hilo del servidor ---
+    def _run(self, ready):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(self._listen())
+            print(f"Marcador: publicando en {self.address}")
+        except (OSError, ValueError) as e:
+            print(f"Advertencia: No se pudo iniciar el marcador en '{self.address}'. Error: {e}")
+            self._loop.close()
+            self._loop = None
+            ready.set()
+            return
+        ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    async def _listen(self):
+        kind, target = parse_address(self.address)
+        if kind == 'unix':
+            if os.path.exists(target):
+                os.remove(target)  # Socket de una ejecución anterior
+            return await asyncio.start_unix_server(self._handle_client, path=target)
+        return await asyncio.start_server(self._handle_client, *target)
+
+    def _apply_event(self, kind, arg):
+        match = self._match
+        if kind == rules.EVENT_START:
+            num_players, target_score = arg
+            self._match = Match(num_players, target_score, self.score_mapping)
+            delta = {'t': 'start', 'players': num_players, 'target': target_score}
+        elif match is None:
+            return
+        elif kind == rules.EVENT_HIT:
+            player = match.current_player
+            before = player.score
+            match.hit(arg)
+            delta = {'t': 'hit', 'p': match.current_index, 'key': arg, 'pts': player.score - before, 'score': player.score}
+        elif kind == rules.EVENT_NEXT_TURN:
+            match.next_turn()
+            delta = {'t': 'turn', 'p': match.current_index}
+        elif kind == rules.EVENT_WINNER:
+            delta = {'t': 'winner', 'p': arg, 'rank': len(match.winners)}
+        elif kind == rules.EVENT_END:
+            delta = {'t': 'end'}
+        else:
+            return  # Pausa y reanudación se ven como cambios de estado
+        self._broadcast(delta)
+
+    def _apply_state(self, state_name, has_match, restored):
+        self._state_name = state_name
+        if restored is not None:
+            self._match = restored
+        elif not has_match:
+            self._match = None
+        self._broadcast({'t': 'state', 'state': state_name})
+
+    def _broadcast(self, delta):
+        self._seq += 1
+        delta['seq'] = self._seq
+        line = (json.dumps(delta, separators=(',', ':')) + "\n").encode()
+        for client in list(self._clients):
+            self._send(client, line)
+
+    def _send(self, writer, line):
+        # write() nunca bloquea: lo que el socket no acepta queda en el buffer del transporte
+        writer.write(line)
+        if writer.transport.get_write_buffer_size() > self.client_buffer_bytes:
+            # Cliente lento: se le desconecta en lugar de acumular o frenar al juego
+            self.dropped += 1
+            self._clients.discard(writer)
+            writer.transport.abort()
+
+    async def _handle_client(self, reader, writer):
+        self._clients.add(writer)
+        try:
+            while True:
+                request = await reader.readline()
+                if not request:
+                    break
+                if request.strip() == b"snapshot" and writer in self._clients:
+                    snapshot = match_snapshot(self._match, self._state_name, self._seq)
+                    self._send(writer, (json.dumps(snapshot, separators=(',', ':')) + "\n").encode())
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+
+async def _print_messages(address):
+    kind, target = parse_address(address)
+    if kind == 'unix':
+        reader, writer = await asyncio.open_unix_connection(target)
+    else:
+        reader, writer = await asyncio.open_connection(*target)
+    writer.write(b"snapshot\n")
+    await writer.drain()
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        print(line.decode().rstrip())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    try:
+        asyncio.run(_print_messages(sys.argv[1]))
+    except KeyboardInterrupt:
+        pass
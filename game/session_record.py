@@ -0,0 +1,194 @@
+"""
+Grabación de las entradas de una ejecución del juego, para reproducirla después con replay.py.
+
+Game le pasa cada tecla que consume su bucle (presionada o liberada, con el estado en que estaba el juego) y
+SessionRecorder la agrega como un registro binario de 8 bytes: milisegundos desde el inicio de la sesión, tipo,
+estado e índice de la tecla en la tabla de la cabecera. Los registros se juntan en memoria y se escriben cada
+Config.SESSION_RECORD_FLUSH_MS, así el hilo principal no hace una escritura por tecla. Un registro END marca
+el cierre limpio; una sesión cortada por una caída se lee igual hasta su último registro completo.
+
+Cada ejecución crea su propio archivo `session_AAAAMMDD_HHMMSS_PID.rec` (el pid separa dos juegos arrancados en
+el mismo segundo, y el archivo se abre en modo exclusivo para no pisar nunca uno existente) y al abrir uno nuevo se borran los más
+antiguos por encima de Config.SESSION_RECORD_KEEP.
+
+Uso (desde la carpeta game/):
+    python session_record.py data/sessions           # resumen de cada sesión
+    python session_record.py data/sessions/session_20250101_120000_4242.rec --events
+"""
+import os
+import struct
+import sys
+import time
+
+SESSION_MAGIC = b"BLRSESS\x00"
+SESSION_VERSION = 1
+SESSION_HEADER = struct.Struct("<8sHdB")  # marca, versión, inicio (hora de pared), cantidad de teclas
+RECORD = struct.Struct("<IBBH")  # ms desde el inicio, tipo, estado del juego, índice de la tecla
+SESSION_PREFIX = "session_"
+SESSION_EXTENSION = ".rec"
+
+# Tipos de registro
+KEY_UP = 0
+KEY_DOWN = 1
+END = 2
+
+
+class Session:
+    __slots__ = ('path', 'started_at', 'events', 'duration_ms', 'complete')
+
+    def __init__(self, path, started_at):
+        self.path = path
+        self.started_at = started_at
+        self.events = []  # (ms, presionada, tecla, estado)
+        self.duration_ms = 0
+        self.complete = False  # Tiene registro END: el juego se cerró limpiamente
+
+
+def session_filename(started_at, pid, attempt=0):
+    suffix = f"_{pid}" if attempt == 0 else f"_{pid}_{attempt}"
+    return time.strftime(f"{SESSION_PREFIX}%Y%m%d_%H%M%S", time.localtime(started_at)) + suffix + SESSION_EXTENSION
+
+
+def list_sessions(paths):
+    """
+    Expande carpetas en sus archivos de sesión (en orden de nombre, que es el de grabación) y deja los
+    archivos tal cual.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, f) for f in sorted(os.listdir(path))
+                         if f.startswith(SESSION_PREFIX) and f.endswith(SESSION_EXTENSION))
+        else:
+            files.append(path)
+    return files
+
+
+def read_session(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < SESSION_HEADER.size:
+        raise ValueError(f"Sesión truncada: {path}")
+    magic, version, started_at, key_count = SESSION_HEADER.unpack_from(data)
+    if magic != SESSION_MAGIC or version != SESSION_VERSION:
+        raise ValueError(f"Formato de sesión no soportado: {path}")
+    offset = SESSION_HEADER.size
+    key_names = []
+    for _ in range(key_count):
+        length = data[offset]
+        key_names.append(data[offset + 1:offset + 1 + length].decode('utf-8'))
+        offset += 1 + length
+
+    session = Session(path, started_at)
+    # Un registro incompleto al final (caída a mitad de una escritura) se descarta
+    end = offset + (len(data) - offset) // RECORD.size * RECORD.size
+    for at_ms, kind, state, key_index in RECORD.iter_unpack(data[offset:end]):
+        session.duration_ms = at_ms
+        if kind == END:
+            session.complete = True
+            break
+        if key_index < len(key_names):
+            session.events.append((at_ms, kind == KEY_DOWN, key_names[key_index], state))
+    return session
+
+
+class SessionRecorder:
+    """
+    Escribe las entradas de una sesión. Se usa solo desde el hilo principal.
+    """
+
+    def __init__(self, directory, key_names, flush_ms=1000, keep=500):
+        os.makedirs(directory, exist_ok=True)
+        self._prune(directory, keep - 1)
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self._key_index = {name: i for i, name in enumerate(key_names)}
+        self._flush_s = flush_ms / 1000
+        self._last_flush = self._start
+        self._buffer = bytearray(SESSION_HEADER.pack(SESSION_MAGIC, SESSION_VERSION, self.started_at, len(key_names)))
+        for name in key_names:
+            encoded = name.encode('utf-8')
+            self._buffer += bytes([len(encoded)]) + encoded
+        self.path, self._file = self._create(directory, self.started_at)
+        self.records = 0
+        self.bytes_written = 0
+        self._flush()
+
+    def record(self, pressed, key_name, state):
+        key_index = self._key_index.get(key_name)
+        if key_index is None:
+            return
+        now = time.monotonic()
+        self._buffer += RECORD.pack(int((now - self._start) * 1000), KEY_DOWN if pressed else KEY_UP, state, key_index)
+        self.records += 1
+        if now - self._last_flush >= self._flush_s:
+            self._flush()
+
+    def close(self):
+        if self._file is None:
+            return
+        self._buffer += RECORD.pack(int((time.monotonic() - self._start) * 1000), END, 0, 0)
+        self._flush()
+        self._file.close()
+        self._file = None
+
+    def stats(self):
+        return {'records': self.records, 'bytes': self.bytes_written, 'path': self.path}
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        self._file.write(self._buffer)
+        self._file.flush()
+        self.bytes_written += len(self._buffer)
+        self._buffer.clear()
+
+    @staticmethod
+    def _create(directory, started_at):
+        # 'xb' falla si el archivo ya existe: una sesión nunca reemplaza a otra
+        attempt = 0
+        while True:
+            path = os.path.join(directory, session_filename(started_at, os.getpid(), attempt))
+            try:
+                return path, open(path, 'xb')
+            except FileExistsError:
+                attempt += 1
+
+    @staticmethod
+    def _prune(directory, keep):
+        sessions = list_sessions([directory])
+        for path in sessions[:max(0, len(sessions) - keep)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def main(argv):
+    show_events = '--events' in argv
+    paths = [arg for arg in argv if arg != '--events']
+    if not paths:
+        paths = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sessions')]
+    files = list_sessions(paths)
+    if not files:
+        print(f"No hay sesiones en {', '.join(paths)}.")
+        return 1
+    for path in files:
+        try:
+            session = read_session(path)
+        except (OSError, ValueError) as e:
+            print(f"{path}: no se pudo leer ({e})")
+            continue
+        presses = sum(1 for _, pressed, _, _ in session.events if pressed)
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(session.started_at))
+        print(f"{os.path.basename(path)}: {started}, {session.duration_ms / 1000:.0f} s, {presses} teclas"
+              f"{'' if session.complete else ' (sin cierre limpio)'}")
+        if show_events:
+            for at_ms, pressed, key_name, state in session.events:
+                print(f"  {at_ms:>9} ms  {'v' if pressed else '^'} {key_name:<6} estado {state}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,85 @@
+"""
+Reproducción en streaming de las animaciones de fondo (Config.STREAM_BACKGROUNDS).
+
+En lugar de decodificar y guardar todos los fotogramas de un estado, un hilo decodifica solo los que
+vienen justo después del cabezal de reproducción y los guarda en un buffer circular de tamaño fijo. Para
+los estados la secuencia se indexa como una lista; si el hilo se atrasa se repite el último fotograma.
+
+    frames = StreamingBackground(rutas, (1280, 720), 6, decode_background_frame)
+    surface = frames[i]
+    frames.close()  # al salir del estado
+"""
+import threading
+
+import pygame
+
+from frame_pack import surface_nbytes
+
+
+class StreamingBackground:
+    """
+    Secuencia de fondo que se decodifica en un hilo justo por delante del cabezal de reproducción,
+    guardando como máximo `capacity` fotogramas en un buffer circular. Se indexa como una lista.
+    `decode_frame(ruta, tamaño)` devuelve la Surface de un fotograma ya escalada.
+    """
+
+    def __init__(self, img_paths, size, capacity, decode_frame):
+        self.img_paths = img_paths
+        self.size = size
+        self.capacity = capacity
+        self.decode_frame = decode_frame
+        self._slots = [None] * capacity  # (indice, surface)
+        self._playhead = 0
+        self._next_to_decode = 1
+        self._closed = False
+        self._cond = threading.Condition()
+        # El primer fotograma se decodifica aquí para no mostrar un cuadro negro al entrar al estado
+        self._slots[0] = (0, decode_frame(img_paths[0], size))
+        self._last_frame = self._slots[0][1]
+        self._thread = threading.Thread(target=self._decode_worker, name="stream-decoder", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self.img_paths)
+
+    def __getitem__(self, index):
+        with self._cond:
+            if index != self._playhead:
+                self._playhead = index
+                self._cond.notify()
+            slot = self._slots[index % self.capacity]
+            if slot is not None and slot[0] == index:
+                self._last_frame = slot[1]
+        # Si el decodificador va atrasado se repite el último fotograma mostrado
+        return self._last_frame
+
+    def is_ready(self, index):
+        slot = self._slots[index % self.capacity]
+        return slot is not None and slot[0] == index
+
+    def nbytes(self):
+        return sum(surface_nbytes(slot[1]) for slot in list(self._slots) if slot is not None)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _decode_worker(self):
+        while True:
+            with self._cond:
+                while not self._closed and (self._next_to_decode >= len(self.img_paths)
+                                            or self._next_to_decode >= self._playhead + self.capacity):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                index = max(self._next_to_decode, self._playhead)
+            try:
+                frame = self.decode_frame(self.img_paths[index], self.size)
+            except pygame.error as e:
+                print(f"Advertencia: No se pudo decodificar '{self.img_paths[index]}'. Error: {e}")
+                frame = None
+            with self._cond:
+                if frame is not None:
+                    self._slots[index % self.capacity] = (index, frame)
+                self._next_to_decode = index + 1
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Los módulos del juego se importan igual que al ejecutar desde game/, sin instalar un paquete
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'game'))
+
+# Prueba manual del driver: necesita el teclado arcade conectado y a alguien presionando las teclas
+collect_ignore = ["driver_test.py"]
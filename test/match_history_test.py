@@ -0,0 +1,111 @@
+"""
+Historial de partidas: golpes que no suman, partidas restauradas del registro y filas abiertas al arrancar.
+"""
+import sqlite3
+
+import rules
+from match_history import MatchHistory
+from rules import Match
+
+SCORE_MAPPING = {
+    "1": 500, "2": 300, "3": 200, "4": 150,
+    "5": 100, "6": 50, "7": 30, "8": 15
+}
+
+
+def play(history, match, keys):
+    # Lo que hace Game: aplica cada tecla sobre su Match y avisa el evento al historial
+    for key in keys:
+        if key == "TAB":
+            match.next_turn()
+            history.on_match_event(rules.EVENT_NEXT_TURN, 0, match)
+        else:
+            match.hit(key)
+            history.on_match_event(rules.EVENT_HIT, key, match)
+
+
+def start_match(history, num_players=2, target_score=1000):
+    match = Match(num_players, target_score, SCORE_MAPPING)
+    history.on_match_event(rules.EVENT_START, 0, match)
+    return match
+
+
+def query(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_every_hit_is_stored(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    history = MatchHistory(db_path, SCORE_MAPPING, batch_ms=0)
+    history.start()
+    match = start_match(history)
+    play(history, match, ["1", "1", "8", "TAB", "2"])  # El 8 llega cuando el jugador 1 ya ganó
+    history.on_match_event(rules.EVENT_END, 0, match)
+    history.close()
+
+    assert query(db_path, "SELECT player_index, sensor_key, points FROM hits ORDER BY rowid") == [
+        (0, "1", 500), (0, "1", 500), (0, "8", 0), (1, "2", 300)]
+    assert dict((key, (hits, points)) for key, hits, points in query(db_path, "SELECT * FROM sensor_stats")) == {
+        "1": (2, 1000), "8": (1, 0), "2": (1, 300)}
+
+
+def test_restored_match_continues_its_row(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    history = MatchHistory(db_path, SCORE_MAPPING, batch_ms=0)
+    history.start()
+    match = start_match(history)
+    play(history, match, ["2", "TAB", "3"])
+    history.close()  # Caída: sin EVENT_END
+
+    # Al arrancar Game restaura la partida del registro y se la pasa al historial
+    restored = match.copy()
+    history = MatchHistory(db_path, SCORE_MAPPING, batch_ms=0)
+    history.start(restored)
+    play(history, restored, ["1", "1", "TAB", "1", "1"])
+    assert restored.finished
+    history.on_match_event(rules.EVENT_END, 0, restored)
+    history.close()
+
+    assert query(db_path, "SELECT id, finished FROM matches") == [(1, 1)]
+    assert query(db_path, "SELECT player_index, score, rank, has_won FROM player_results ORDER BY player_index") == [
+        (0, 1300, 2, 1), (1, 1200, 1, 1)]
+    assert query(db_path, "SELECT COUNT(*) FROM hits WHERE match_id = 1") == [(6,)]
+
+
+def test_open_rows_without_log_are_closed_on_startup(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    history = MatchHistory(db_path, SCORE_MAPPING, batch_ms=0)
+    history.start()
+    match = start_match(history, num_players=3)
+    play(history, match, ["4", "TAB", "5", "5"])
+    history.close()  # Salida con S a mitad de partida: no hay EVENT_END ni partida para restaurar
+
+    history = MatchHistory(db_path, SCORE_MAPPING, batch_ms=0)
+    history.start()
+    history.close()
+
+    ((ended_at, duration_ms, finished),) = query(db_path, "SELECT ended_at, duration_ms, finished FROM matches")
+    assert ended_at is not None and duration_ms >= 0 and finished == 0
+    assert query(db_path, "SELECT player_index, score, rank FROM player_results ORDER BY player_index") == [
+        (0, 150, None), (1, 200, None), (2, 0, None)]
+    assert history.summary['matches'] == 0  # Las abandonadas no cuentan para los récords
+
+
+def test_discarded_restore_is_closed_as_abandoned(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    history = MatchHistory(db_path, SCORE_MAPPING, batch_ms=0)
+    history.start()
+    match = start_match(history)
+    play(history, match, ["3"])
+    history.close()
+
+    history = MatchHistory(db_path, SCORE_MAPPING, batch_ms=0)
+    history.start(match.copy())
+    history.on_match_event(rules.EVENT_END, 0, None)  # RestoreMatchState: descartar
+    history.close()
+    assert query(db_path, "SELECT finished FROM matches WHERE ended_at IS NOT NULL") == [(0,)]
+    assert query(db_path, "SELECT score FROM player_results ORDER BY player_index") == [(200,), (0,)]
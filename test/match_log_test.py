@@ -0,0 +1,180 @@
+"""
+Recuperación de la partida desde el registro (match_log.load_state) después de escribirla con MatchLog.
+"""
+import os
+import threading
+
+import pytest
+
+import match_log
+import rules
+from match_log import RECORD, SNAPSHOT_NAME, MatchLog, list_segments, load_state, segment_filename
+from rules import Match
+
+SCORE_MAPPING = {
+    "1": 500, "2": 300, "3": 200, "4": 150,
+    "5": 100, "6": 50, "7": 30, "8": 15
+}
+
+
+class LoggedGame:
+    """
+    Lo que hace Game: juega sobre un Match y avisa cada evento a MatchLog.
+    """
+
+    def __init__(self, log, num_players=3, target_score=3000):
+        self.log = log
+        self.match = Match(num_players, target_score, SCORE_MAPPING)
+        self.event(rules.EVENT_START)
+
+    def event(self, kind, arg=0):
+        self.log.on_match_event(kind, arg, self.match)
+
+    def play(self, keys):
+        for key in keys:
+            if key == "TAB":
+                self.match.next_turn()
+                self.event(rules.EVENT_NEXT_TURN)
+            else:
+                self.match.hit(key)
+                self.event(rules.EVENT_HIT, key)
+
+
+def match_state(match):
+    return ([p.score for p in match.players], [p.has_won for p in match.players], match.current_index,
+            [match.players.index(w) for w in match.winners], match.finished, match.target_score)
+
+
+def open_log(directory, **kwargs):
+    log = MatchLog(str(directory), SCORE_MAPPING, **kwargs)
+    recovered = log.recover()
+    log.start()
+    return log, recovered
+
+
+KEYS = ["1", "2", "TAB", "3", "8", "TAB", "1", "1", "TAB", "5", "6", "7", "TAB"] * 3
+
+
+def test_unfinished_match_is_recovered(tmp_path):
+    log, recovered = open_log(tmp_path)
+    assert recovered is None
+    game = LoggedGame(log)
+    game.play(KEYS)
+    log.close()  # Sin EVENT_END: como si el juego se hubiera cortado
+
+    state = load_state(str(tmp_path), SCORE_MAPPING)
+    assert state is not None
+    assert match_state(state.match) == match_state(game.match)
+    assert not state.paused
+
+
+def test_snapshot_and_later_segments_are_combined(tmp_path):
+    log, _ = open_log(tmp_path, snapshot_every=4)
+    game = LoggedGame(log)
+    game.play(KEYS)
+    log.close()
+
+    assert log.stats()['snapshots'] > 0
+    assert os.path.isfile(tmp_path / SNAPSHOT_NAME)
+    assert len(list_segments(str(tmp_path))) == 1  # Los segmentos compactados se borran
+    assert match_state(load_state(str(tmp_path), SCORE_MAPPING).match) == match_state(game.match)
+
+
+def test_pause_is_recovered(tmp_path):
+    log, _ = open_log(tmp_path)
+    game = LoggedGame(log)
+    game.play(["1", "TAB"])
+    game.event(rules.EVENT_PAUSE)
+    log.close()
+    assert load_state(str(tmp_path), SCORE_MAPPING).paused
+
+
+def test_truncated_record_is_discarded_and_overwritten(tmp_path):
+    log, _ = open_log(tmp_path)
+    game = LoggedGame(log)
+    game.play(["1", "2", "TAB"])
+    log.close()
+    segment = tmp_path / segment_filename(list_segments(str(tmp_path))[-1])
+    with open(segment, 'ab') as f:
+        f.write(RECORD.pack(match_log.RECORD_TAG, rules.EVENT_HIT, 0, 1234)[:5])  # Corte a mitad de un registro
+
+    log, recovered = open_log(tmp_path)
+    assert match_state(recovered.match) == match_state(game.match)
+    log.resume(recovered)
+    game.log, game.match = log, recovered.match
+    game.play(["4", "TAB"])
+    log.close()
+
+    assert os.path.getsize(segment) % RECORD.size == 0
+    assert match_state(load_state(str(tmp_path), SCORE_MAPPING).match) == match_state(game.match)
+
+
+def test_end_clears_the_log(tmp_path):
+    log, _ = open_log(tmp_path)
+    game = LoggedGame(log)
+    game.play(KEYS)
+    game.event(rules.EVENT_END)
+    log.close()
+    assert load_state(str(tmp_path), SCORE_MAPPING) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_new_match_replaces_leftovers(tmp_path):
+    log, _ = open_log(tmp_path, snapshot_every=4)
+    LoggedGame(log).play(KEYS)
+    game = LoggedGame(log, num_players=2, target_score=1000)
+    game.play(["8", "TAB"])
+    log.close()
+    assert match_state(load_state(str(tmp_path), SCORE_MAPPING).match) == match_state(game.match)
+
+
+def test_writer_does_not_share_the_restored_match(tmp_path):
+    log, _ = open_log(tmp_path)
+    LoggedGame(log).play(["1", "TAB"])
+    log.close()
+
+    # Game juega sobre recovered.match; el hilo escritor aplica los mismos eventos sobre su propia copia
+    log, recovered = open_log(tmp_path)
+    log.resume(recovered)
+    match = recovered.match
+    match.hit("2")
+    log.on_match_event(rules.EVENT_HIT, "2", match)
+    log.close()
+    assert [p.score for p in match.players] == [500, 300, 0]
+    assert [p.score for p in load_state(str(tmp_path), SCORE_MAPPING).match.players] == [500, 300, 0]
+
+
+def test_recover_reads_the_disk_once(tmp_path, monkeypatch):
+    calls = []
+    original = match_log.load_state
+    monkeypatch.setattr(match_log, 'load_state', lambda *args: calls.append(args) or original(*args))
+    log, _ = open_log(tmp_path)
+    log.close()
+    assert len(calls) == 1
+
+
+def test_writer_reports_recovery_errors(tmp_path, monkeypatch, capsys):
+    called = threading.Event()
+
+    def broken(*args):
+        called.set()
+        raise OSError("disco ilegible")
+
+    monkeypatch.setattr(match_log, 'load_state', broken)
+    log = MatchLog(str(tmp_path), SCORE_MAPPING)
+    log.start()  # Sin recover(): el hilo escritor lee el disco
+    assert called.wait(5)
+    monkeypatch.undo()
+    game = LoggedGame(log, num_players=2)
+    game.play(["3", "TAB"])
+    log.close()
+
+    assert "disco ilegible" in capsys.readouterr().out
+    assert match_state(load_state(str(tmp_path), SCORE_MAPPING).match) == match_state(game.match)
+
+
+@pytest.mark.parametrize("garbage", [b"", b"\x00" * RECORD.size])
+def test_segments_without_start_are_ignored(tmp_path, garbage):
+    with open(tmp_path / segment_filename(0), 'wb') as f:
+        f.write(garbage + RECORD.pack(match_log.RECORD_TAG, rules.EVENT_HIT, 0, 10))
+    assert load_state(str(tmp_path), SCORE_MAPPING) is None
@@ -0,0 +1,164 @@
+"""
+Paridad de rules.Match con la lógica de GameplayState.handle_input anterior a rules.py, donde los jugadores
+eran diccionarios dentro de Game.
+"""
+import random
+
+import pytest
+
+from rules import GAME_OVER, SCORED, TURN_CHANGED, WINNER, Match
+
+SCORE_MAPPING = {
+    "1": 500, "2": 300, "3": 200, "4": 150,
+    "5": 100, "6": 50, "7": 30, "8": 15
+}
+KEYS = list(SCORE_MAPPING) + ["TAB", "TAB"]
+
+
+class LegacyGame:
+    """
+    handle_input y _check_for_winner tal como estaban en game.py, sin sonidos ni pygame.
+    """
+
+    def __init__(self, num_players, target_score):
+        self.players = [{"name": f"Jugador {i + 1}", "score": 0, "has_won": False} for i in range(num_players)]
+        self.game_target_score = target_score
+        self.current_player_index = 0
+        self.winners = []
+        self.game_over = False
+
+    def handle_input(self, key_name):
+        if self.game_over:
+            return  # El juego pasaba a STATE_GAME_OVER y GameplayState dejaba de recibir teclas
+        current_player = self.players[self.current_player_index]
+        if key_name == "TAB":
+            self._check_for_winner(current_player)
+            if not self.game_over:
+                self.current_player_index = (self.current_player_index + 1) % len(self.players)
+        elif key_name in SCORE_MAPPING:
+            if not current_player['has_won']:
+                current_player['score'] += SCORE_MAPPING[key_name]
+                self._check_for_winner(current_player)
+
+    def _check_for_winner(self, player):
+        if not player['has_won'] and player['score'] >= self.game_target_score:
+            player['has_won'] = True
+            self.winners.append(player)
+            if (len(self.winners) >= 2 and len(self.players) > 2) or all(p['has_won'] for p in self.players):
+                self.game_over = True
+
+    def state(self):
+        return ([p['score'] for p in self.players], [p['has_won'] for p in self.players], self.current_player_index,
+                [self.players.index(w) for w in self.winners], self.game_over)
+
+
+def match_state(match):
+    return ([p.score for p in match.players], [p.has_won for p in match.players], match.current_index,
+            [match.players.index(w) for w in match.winners], match.finished)
+
+
+def random_batches(rng, count):
+    # Golpes del mismo jugador agrupados como los junta SensorHitBatch en un cuadro, separados por TAB
+    batches = []
+    for _ in range(count):
+        if rng.random() < 0.3:
+            batches.append("TAB")
+        else:
+            batches.append([rng.choice(list(SCORE_MAPPING)) for _ in range(rng.randint(0, 4))])
+    return batches
+
+
+@pytest.mark.parametrize("num_players", [2, 3, 4, 6])
+@pytest.mark.parametrize("seed", range(20))
+def test_hit_and_next_turn_match_legacy(num_players, seed):
+    rng = random.Random(seed)
+    target = rng.choice([1000, 2000, 3000])
+    legacy = LegacyGame(num_players, target)
+    match = Match(num_players, target, SCORE_MAPPING)
+    for _ in range(500):
+        if match.finished:
+            break
+        key = rng.choice(KEYS)
+        legacy.handle_input(key)
+        if key == "TAB":
+            match.next_turn()
+        else:
+            match.hit(key)
+        assert match_state(match) == legacy.state()
+    assert match.finished == legacy.game_over
+
+
+@pytest.mark.parametrize("num_players", [2, 4])
+@pytest.mark.parametrize("seed", range(20))
+def test_hit_many_matches_hit_one_by_one(num_players, seed):
+    rng = random.Random(seed)
+    target = rng.choice([1000, 2000])
+    legacy = LegacyGame(num_players, target)
+    batched = Match(num_players, target, SCORE_MAPPING)
+    single = Match(num_players, target, SCORE_MAPPING)
+    for batch in random_batches(rng, 300):
+        if batched.finished:
+            break
+        if batch == "TAB":
+            legacy.handle_input("TAB")
+            assert batched.next_turn() == single.next_turn()
+        else:
+            before = batched.current_player.score
+            flags, points = batched.hit_many(batch)
+            single_flags = 0
+            for key in batch:
+                legacy.handle_input(key)
+                single_flags |= single.hit(key)
+            assert flags == single_flags
+            assert points == batched.current_player.score - before
+        assert match_state(batched) == match_state(single) == legacy.state()
+
+
+def test_flags():
+    match = Match(2, 600, SCORE_MAPPING)
+    assert match.hit("2") == SCORED
+    assert match.hit("2") == SCORED | WINNER
+    assert match.hit("1") == 0  # Ya ganó: no suma, pero conserva el turno hasta el TAB
+    assert match.players[0].score == 600
+    assert match.next_turn() == TURN_CHANGED
+    assert match.hit_many(["1", "1", "1"]) == (SCORED | WINNER | GAME_OVER, 1000)
+    assert match.finished
+    assert match.next_turn() == 0
+    assert match.current_index == 1
+
+
+def test_winner_declared_on_tab_when_score_was_set_directly():
+    match = Match(2, 1000, SCORE_MAPPING)
+    match.players[0].score = 1000
+    assert match.next_turn() == WINNER | TURN_CHANGED
+    assert match.winners == [match.players[0]]
+
+
+@pytest.mark.parametrize("num_players, winners_to_finish", [(2, 2), (3, 2), (5, 2)])
+def test_game_over_after_podium(num_players, winners_to_finish):
+    match = Match(num_players, 500, SCORE_MAPPING)
+    for _ in range(winners_to_finish):
+        assert not match.finished
+        flags = match.hit("1")
+        assert flags & WINNER
+        match.next_turn()
+    assert match.finished
+    assert len(match.winners) == winners_to_finish
+
+
+def test_hit_many_without_keys_changes_nothing():
+    match = Match(2, 1000, SCORE_MAPPING)
+    assert match.hit_many([]) == (0, 0)
+    assert match_state(match) == ([0, 0], [False, False], 0, [], False)
+
+
+def test_copy_is_independent():
+    match = Match(3, 1000, SCORE_MAPPING)
+    match.hit_many(["1", "1"])
+    match.next_turn()
+    match.hit("3")
+    copy = match.copy()
+    assert match_state(copy) == match_state(match)
+    assert copy.winners[0] is copy.players[0]
+    copy.hit("1")
+    assert match.players[1].score == 200
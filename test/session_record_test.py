@@ -0,0 +1,167 @@
+"""
+Grabación de una sesión con SessionRecorder, lectura con read_session y comprobación con el ReplayChecker de
+replay.py.
+"""
+import os
+import time
+
+import pytest
+
+from replay import ReplayChecker
+from session_record import END, RECORD, SessionRecorder, list_sessions, read_session
+
+KEY_NAMES = ["1", "2", "ENTER", "S", "TAB", "UP"]
+INPUTS = [
+    (True, "UP", 0), (False, "UP", 0), (True, "ENTER", 0), (False, "ENTER", 1),
+    (True, "1", 3), (True, "2", 3), (False, "1", 3), (False, "2", 3), (True, "TAB", 3), (False, "TAB", 3),
+]
+
+
+def record_session(directory, inputs=INPUTS, close=True, **kwargs):
+    recorder = SessionRecorder(str(directory), KEY_NAMES, **kwargs)
+    for pressed, key_name, state in inputs:
+        recorder.record(pressed, key_name, state)
+    if close:
+        recorder.close()
+    return recorder
+
+
+def test_round_trip(tmp_path):
+    recorder = record_session(tmp_path)
+    session = read_session(recorder.path)
+    assert session.complete
+    assert [event[1:] for event in session.events] == INPUTS
+    times = [event[0] for event in session.events]
+    assert times == sorted(times)
+    assert session.duration_ms >= times[-1]
+    assert abs(session.started_at - recorder.started_at) < 1e-6
+    assert recorder.stats()['bytes'] == os.path.getsize(recorder.path)
+
+
+def test_unknown_keys_are_not_recorded(tmp_path):
+    recorder = record_session(tmp_path, [(True, "F12", 0), (True, "S", 0)])
+    assert [event[1:] for event in read_session(recorder.path).events] == [(True, "S", 0)]
+    assert recorder.records == 1
+
+
+def test_session_cut_mid_record_keeps_complete_records(tmp_path):
+    recorder = record_session(tmp_path, close=False, flush_ms=0)
+    recorder._file.close()  # Caída: sin registro END
+    with open(recorder.path, 'ab') as f:
+        f.write(RECORD.pack(123, END, 0, 0)[:3])
+    session = read_session(recorder.path)
+    assert not session.complete
+    assert [event[1:] for event in session.events] == INPUTS
+
+
+def test_sessions_started_together_do_not_overwrite_each_other(tmp_path):
+    first = record_session(tmp_path, INPUTS[:2])
+    second = record_session(tmp_path, INPUTS[2:])
+    assert first.path != second.path
+    assert list_sessions([str(tmp_path)]) == sorted([first.path, second.path])
+    assert [event[1:] for event in read_session(first.path).events] == INPUTS[:2]
+    assert [event[1:] for event in read_session(second.path).events] == INPUTS[2:]
+
+
+def test_oldest_sessions_are_pruned(tmp_path):
+    paths = [record_session(tmp_path, keep=3).path for _ in range(5)]
+    assert list_sessions([str(tmp_path)]) == sorted(paths)[-3:]
+
+
+def test_replay_checker_accepts_the_recorded_inputs(tmp_path):
+    session = read_session(record_session(tmp_path).path)
+    checker = ReplayChecker()
+    checker.start(session)
+    for pressed, key_name, state in INPUTS:
+        checker.record(pressed, key_name, state)
+    assert checker.keys == len(INPUTS)
+    assert checker.desynced == []
+
+
+def test_replay_checker_reports_the_first_difference(tmp_path):
+    session = read_session(record_session(tmp_path).path)
+    checker = ReplayChecker()
+    checker.start(session)
+    replayed = list(INPUTS)
+    replayed[4] = (True, "1", 5)  # El juego estaba en otro estado al recibir la tecla
+    replayed[6] = (False, "2", 3)
+    for pressed, key_name, state in replayed:
+        checker.record(pressed, key_name, state)
+    assert checker.desynced == [(session.path, session.events[4], (True, "1", 5))]
+
+
+def test_game_session_replays_without_desync(tmp_path, monkeypatch):
+    # Graba una partida corta pasando teclas por la cola de pygame y la reproduce con replay.py sin esperas
+    monkeypatch.setenv("SDL_VIDEODRIVER", "dummy")
+    monkeypatch.setenv("SDL_AUDIODRIVER", "dummy")
+    pygame = pytest.importorskip("pygame")
+    import game as game_module
+    import replay
+    from game import Config
+
+    for name, value in (('MATCH_LOG', False), ('MATCH_HISTORY', False), ('SCOREBOARD', False),
+                        ('INPUT_BACKEND', 'keyboard'), ('FIXED_TIMESTEP', True), ('SESSION_RECORD', True),
+                        ('SESSION_RECORD_DIR', str(tmp_path))):
+        monkeypatch.setattr(Config, name, value)
+    keys = {name: key for key, name in Config.KEY_MAPPING.items()}
+    game = game_module.Game()
+
+    def press(name, frames=3):
+        for event_type in (pygame.KEYDOWN, pygame.KEYUP):
+            pygame.event.post(pygame.event.Event(event_type, key=keys[name]))
+            for _ in range(frames):
+                game.run_frame()
+
+    # Menú -> 2 jugadores -> puntaje -> partida, unos golpes, cambios de turno y pausa
+    for name in ["DOWN", "ENTER", "DOWN", "ENTER", "DOWN", "ENTER", "1", "2", "TAB", "3", "TAB", "ENTER"]:
+        press(name)
+    path = game.recorder.path
+    game.close()
+
+    session = read_session(path)
+    assert session.complete
+    assert Config.STATE_GAMEPLAY in {state for _, _, _, state in session.events}
+    assert replay.main([path, '--speed', '0']) == 0
+
+
+def test_bounced_sensor_press_is_not_recorded(tmp_path, monkeypatch):
+    # Un rebote que el juego descarta por la marca del kernel no puede llegar al replay, que no tiene esa marca
+    monkeypatch.setenv("SDL_VIDEODRIVER", "dummy")
+    monkeypatch.setenv("SDL_AUDIODRIVER", "dummy")
+    pygame = pytest.importorskip("pygame")
+    import game as game_module
+    import replay
+    from game import Config
+
+    for name, value in (('MATCH_LOG', False), ('MATCH_HISTORY', False), ('SCOREBOARD', False),
+                        ('INPUT_BACKEND', 'keyboard'), ('FIXED_TIMESTEP', True), ('SESSION_RECORD', True),
+                        ('SESSION_RECORD_DIR', str(tmp_path))):
+        monkeypatch.setattr(Config, name, value)
+    keys = {name: key for key, name in Config.KEY_MAPPING.items()}
+    game = game_module.Game()
+
+    def post(event, frames=3):
+        pygame.event.post(event)
+        for _ in range(frames):
+            game.run_frame()
+
+    for name in ["DOWN", "ENTER", "DOWN", "ENTER", "DOWN", "ENTER"]:
+        for event_type in (pygame.KEYDOWN, pygame.KEYUP):
+            post(pygame.event.Event(event_type, key=keys[name]))
+    assert game.current_game_state == Config.STATE_GAMEPLAY
+
+    # Presión, liberación y una segunda presión 10 ms después según el kernel: la segunda es un rebote
+    kernel_time = time.time()
+    for pressed, at in ((True, kernel_time), (False, kernel_time + 0.005), (True, kernel_time + 0.010),
+                        (False, kernel_time + 0.015)):
+        post(pygame.event.Event(Config.EVENT_ARCADE_INPUT, key="1", pressed=pressed, timestamp=time.monotonic(),
+                                kernel_timestamp=at))
+    score = game.match.players[0].score
+    assert game.hit_batch.bounces == 1
+    assert score == Config.SCORE_MAPPING["1"]
+    path = game.recorder.path
+    game.close()
+
+    session = read_session(path)
+    assert [pressed for _, pressed, key_name, _ in session.events if key_name == "1"] == [True, False, False]
+    assert replay.main([path, '--speed', '0']) == 0